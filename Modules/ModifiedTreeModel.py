@@ -14,15 +14,53 @@ This subclass of TreeModel is providing specialised functionality in order to wo
 # ----------------------------------------
 import logging
 
+from jsonschema.validators import validator_for
+from referencing.exceptions import Unresolvable
 from PySide6.QtCore import Qt, QModelIndex
+from PySide6.QtGui import QBrush, QColor
 from PySide6.QtWidgets import QMessageBox, QWidget
 
 from Modules.TreeModel import TreeClass
+from Modules.schemaregistry_lib import schema_registry
 
 # ----------------------------------------
 # Variables and Functions
 # ----------------------------------------
 
+# validators for the schema fragments attached to the tree items, keyed by the id of the fragment
+_node_validators = {}
+
+# background of items violating the schema after a validation run
+ERROR_BRUSH = QBrush(QColor(255, 190, 190))
+
+
+def node_validator(node_schema, root_schema = None):
+    """
+    Retrieves the validator for the schema fragment of a single node. Validators are built once per fragment and
+    resolve references with the offline schema registry. The fragment is validated with the draft of the schema it was
+    taken from, like the whole document is.
+
+    Args:
+        node_schema (dict): the schema fragment governing a node, as stored in the metadata of a TreeItem
+        root_schema (dict): the schema the fragment was taken from. Without it, the latest draft is used, unless the
+            fragment names its own.
+
+    Returns:
+        jsonschema.protocols.Validator: the validator of the fragment
+    """
+    registry = schema_registry.registry()
+    validator_class = validator_for(node_schema, default = validator_for(root_schema if isinstance(root_schema, dict)
+                                                                           else {}))
+    entry = _node_validators.get(id(node_schema))
+    if entry is None or entry[0] is not node_schema or entry[2] != schema_registry.generation or \
+            type(entry[1]) is not validator_class:
+        if len(_node_validators) > 4096:  # fragments of schemas that are not loaded anymore
+            _node_validators.clear()
+        entry = (node_schema, validator_class(node_schema, registry = registry), schema_registry.generation)
+        _node_validators[id(node_schema)] = entry
+    return entry[1]
+
+
 class ModifiedTreeClass(TreeClass):
     """
     This modified TreeClass provides an adapted routine to set data by trying to cast entered information to the
@@ -30,6 +68,78 @@ class ModifiedTreeClass(TreeClass):
     gets overwritten in order to provide the proper item roles to prevent users from editing data other than
     the JSON values to be.
     """
+    def __init__(self, parent = None, data = None, root_schema = None):
+        """
+        Constructor
+
+        Args:
+            parent: the parent object. Most of the time, this will be None.
+            data: the list of data that shall be used by the root node and determine the column count
+            root_schema (dict): the schema the tree was built from, its draft is used to validate edited values
+        """
+        super(ModifiedTreeClass, self).__init__(parent, data)
+        self.root_schema = root_schema
+        self.node_errors = {}  # id of a flagged item -> (item, list of messages)
+
+    def item_at_path(self, path):
+        """
+        Resolves the path of a validation error (the keys and array indexes of a JSON pointer) to the item holding
+        the value. Errors of values missing from the tree resolve to the closest existing ancestor.
+
+        Args:
+            path (list): the keys and array indexes leading to the value
+
+        Returns:
+            TreeItem: the item, None for the document itself
+        """
+        item = None
+        children = self.root_node.childItems
+        for part in path:
+            if isinstance(part, int):
+                child = children[part] if 0 <= part < len(children) else None
+            else:
+                child = next((c for c in children if c.get_data(0) == part), None)
+            if child is None:
+                break
+            item = child
+            children = child.childItems
+        return item
+
+    def mark_errors(self, errors):
+        """
+        Flags the items referenced by validation errors so the view can highlight them. Flags of a previous run are
+        dropped.
+
+        Args:
+            errors (list): error records as returned by jsonio_lib.validate_tree
+        """
+        self.node_errors = {}
+        for error in errors:
+            item = self.item_at_path(error.get("path", []))
+            if item is None:
+                continue
+            self.node_errors.setdefault(id(item), (item, []))[1].append(error["message"])
+        self.layoutChanged.emit()
+
+    def data(self, index: QModelIndex, role: int = ...):
+        """
+        Extends the data function by highlighting items flagged by the last validation run. The tool tip shows the
+        messages of the violations.
+
+        Args:
+            index (QModelIndex): the index of the item to be fetched the data from
+            role (int): the item role of the item located at the index
+
+        Returns:
+            the data value at given index, the highlight brush or the error messages of a flagged item
+        """
+        if index.isValid() and (role == Qt.BackgroundRole or role == Qt.ToolTipRole) and self.node_errors:
+            flagged = self.node_errors.get(id(self.getItem(index)))
+            if flagged is None:
+                return None
+            return ERROR_BRUSH if role == Qt.BackgroundRole else "\n".join(flagged[1])
+        return super(ModifiedTreeClass, self).data(index, role)
+
     def flags(self, index):
         """
         Adapted flag function to provide the proper flags for our table-like structure in the TreeView
@@ -46,9 +156,66 @@ class ModifiedTreeClass(TreeClass):
             case _:
                 return Qt.ItemIsEnabled
 
+    @staticmethod
+    def node_schema(item):
+        """
+        Fetches the schema fragment governing an item. Array items carry no metadata, so the "items" fragment of the
+        parent array is used for them.
+
+        Args:
+            item (TreeItem): the item to be checked
+
+        Returns:
+            dict: the schema fragment. Empty, if the schema does not describe the item.
+        """
+        metadata = item.all_metadata()
+        if not metadata and item.get_parent() is not None and item.get_parent().get_data(3) == "array":
+            items = item.get_parent().all_metadata().get("items")
+            if isinstance(items, dict):
+                return items
+        return metadata
+
+    def validate_node(self, item, value):
+        """
+        Casts an entered value to the type proposed by the schema and validates it against the schema fragment of the
+        item only, e.g. minimum, maximum, pattern, enum or maxLength. The rest of the document is not touched.
+
+        Args:
+            item (TreeItem): the edited item
+            value (object): the entered value. Should almost always be a string, except for boolean values.
+
+        Returns:
+            str: a message describing the first violation. None, if the value is valid.
+
+        Raises:
+            ValueError: if the value cannot be cast to the type proposed by the schema
+        """
+        match item.get_data(3):
+            case "integer":
+                typed_value = int(value)
+            case "number":
+                typed_value = float(value)
+            case "boolean":# TODO: BOOLS ARE STORED DIRECTLY IN THE MODEL - A TYPE CAST WILL NOT FIND AN ERROR!
+                typed_value = bool(value)
+            case "array" | "object":
+                return None
+            case _:
+                typed_value = value
+        node_schema = self.node_schema(item)
+        if not node_schema:
+            return None
+        try:
+            error = next(node_validator(node_schema, self.root_schema).iter_errors(typed_value), None)
+        except Unresolvable as err:
+            logging.debug("[ModifiedTreeModel.ModifiedTreeClass.validate_node/DEBUG]: Reference of the node " +
+                          "cannot be resolved locally, only the type got checked: " + str(err))
+            return None
+        return error.message if error is not None else None
+
     def setData(self, index: QModelIndex, value, role: int = Qt.EditRole) -> bool:
         """
-        An overwritten setData-function to check the data type via type casting.
+        An overwritten setData-function to check the data type via type casting and the entered value against the
+        schema fragment of the edited node.
 
         Args:
             index (QModelIndex): the index of the data to edit.
@@ -62,36 +229,28 @@ class ModifiedTreeClass(TreeClass):
             return False
 
         item = self.getItem(index)
-        item_type = item.get_data_array()[3]
 
         try:
             if value != '':
-                match item_type:
-                    case "integer":
-                        int(value)
-                    case "number":
-                        float(value)
-                    case "boolean":# TODO: BOOLS ARE STORED DIRECTLY IN THE MODEL - A TYPE CAST WILL NOT FIND AN ERROR!
-                        bool(value)
-                    case "array":
-                        pass
-                    case _:
-                        pass
+                message = self.validate_node(item, value)
+                if message is not None:
+                    raise ValueError(message)
             else:
                 logging.warning("[ModifiedTreeModel.ModifiedTreeClass.setData/WARN]: " +
                            "Empty value set - type validation bypassed.")
             result = item.set_data(column = index.column(), data = value)
             if result:
+                self.node_errors.pop(id(item), None)
                 self.dataChanged.emit(index, index)
                 logging.info("\n----------\n[ModifiedTreeModel.ModifiedTreeClass.setData/INFO]: Data got replaced! New Data is:\n" +
                         str(item.get_data_array()) + "\n----------")
             return result
         except ValueError as err:
             logging.error("[ModifiedTreeModel.ModifiedTreeClass.setData/ERROR]: " +
-                     "Input could not be validated against type proposed from Schema!")
+                     "Input could not be validated against the schema! " + str(err))
             QMessageBox.critical(
                 QWidget(),
                 "[ModifiedTreeModel.ModifiedTreeClass.setData/ERROR]",
-                "Input could not be validated against type proposed from Schema!"
+                "Input could not be validated against the schema!\n" + str(err)
             )
-            return False
\ No newline at end of file
+            return False
@@ -101,7 +101,23 @@ def deploy_config(path):
         "last_schema": "default.json",
         "last_JSON": None,
         "verbose_logging": False,
-        "show_error_representation": True
+        "show_error_representation": True,
+        "search_workers": None,
+        "max_validation_errors": 100,
+        "index_include": ["*.json"],
+        "index_exclude": [],
+        "index_max_depth": None,
+        "scan_workers": None,
+        "watchdog_interval": 30,
+        "watchdog_workers": 4,
+        "watchdog_per_device": 2,
+        "watchdog_timeout": 600,
+        "live_index": False,
+        "live_index_debounce": 2.0,
+        "live_index_poll_interval": 60,
+        "index_values": True,
+        "index_key_filter_bits": 256,
+        "index_trigrams": True
     }
     try:
         with open(os.path.join(path, "pyJSON_conf.json"), "w", encoding = 'utf8') as out:
@@ -131,7 +147,8 @@ def save_config(path, config):
 # indexes
 def save_main_index(path, index_dict):
     """
-    Writes the main index containing information about all indexed directories to the harddrive
+    Writes the main index containing information about all indexed directories to the harddrive. The indexes are kept
+    in the index store, this JSON layout is an export format.
 
     Args:
         path (str): the path, in which the main index shall be saved or overwritten
@@ -144,19 +161,25 @@ def save_main_index(path, index_dict):
         lg.error("[deploy_files.saveMainIndex/ERROR]: Could not save config.")
 
 
-def save_index(path, index, count):
+def save_index(path, index, count, scan = None):
     """
-    Writes the index of a directory to the harddrive
+    Writes the index of a directory to the harddrive, in the JSON export format of the index store
 
     Args:
         path (str): the path the index shall be written or overwritten to
         index (list): the directory index as a list
         count (int): the current index number, since the indexes are numbered
+        scan (dict): the scan result the index was built from, see dirscan_lib.scan_tree. Its stat records of files
+            and directories are stored along with the index, so it can be refreshed incrementally.
     """
     index_d = {"files": index}
+    if scan is not None:
+        index_d["file_stats"] = scan["files"]
+        index_d["dirs"] = scan["dirs"]
     try:
         with open(os.path.join(path, "Indexes/index" + str(count) + ".json"), "w", encoding ='utf8') as out:
-            json.dump(index_d, out, indent = 4, ensure_ascii = False)
+            # the stat records make large indexes huge, the C encoder is only used without indentation
+            json.dump(index_d, out, indent = None if scan is not None else 4, ensure_ascii = False)
     except OSError as err:
         lg.error("[deploy_files.saveIndex/ERROR]: Could not save index for " + path + ".")
 
@@ -0,0 +1,379 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Parallel Directory Scanner
+# author: N. Plathe
+# ----------------------------------------
+"""
+A directory scanner for the indexer. Subdirectories are listed concurrently on a thread pool with os.scandir, so the
+latency of listing directories on network file systems overlaps. The stat data of every matching file is collected in
+the same pass.
+"""
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+import fnmatch
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+lg = logging.getLogger(__name__)
+lg.setLevel("DEBUG")
+
+# options used when a scan does not pass its own, set from the configuration on start up
+scan_defaults = {
+    "include": ["*.json"],
+    "exclude": [],
+    "max_depth": None,
+    "workers": None
+}
+
+
+def _compile(patterns):
+    """
+    Compiles glob patterns into regular expressions once per scan. Patterns containing a slash are matched against the
+    path relative to the scanned root, all others against the name only.
+
+    Args:
+        patterns (list): the glob patterns
+
+    Returns:
+        tuple: the expression for names and the one for relative paths, each None if there are no such patterns
+    """
+    name_patterns = [fnmatch.translate(pattern) for pattern in patterns if "/" not in pattern]
+    path_patterns = [fnmatch.translate(pattern) for pattern in patterns if "/" in pattern]
+    return (re.compile("|".join(name_patterns)) if name_patterns else None,
+            re.compile("|".join(path_patterns)) if path_patterns else None)
+
+
+def _matches(name, rel_path, compiled):
+    """
+    Checks a file or directory against compiled glob patterns, see _compile.
+
+    Args:
+        name (str): the name of the file or directory
+        rel_path (str): the path relative to the scanned root, using "/" as separator
+        compiled (tuple): the compiled patterns
+
+    Returns:
+        bool: whetever one of the patterns matches
+    """
+    return (compiled[0] is not None and compiled[0].match(name) is not None) or \
+        (compiled[1] is not None and compiled[1].match(rel_path) is not None)
+
+
+def is_included(root, path, include = None, exclude = None, max_depth = None):
+    """
+    Checks whetever a scan of root would collect a file, e.g. for files reported by a file system watcher.
+
+    Args:
+        root (str): the root of the scan
+        path (str): the file
+        include (list): glob patterns of files to collect. Defaults to scan_defaults["include"].
+        exclude (list): glob patterns of files and directories to skip. Defaults to scan_defaults["exclude"].
+        max_depth (int): the maximum depth of listed subdirectories. Defaults to scan_defaults["max_depth"].
+
+    Returns:
+        bool: whetever the file is below root, matches the include patterns and neither it nor one of its directories
+            is excluded
+    """
+    include, exclude, max_depth, _ = _options(include, exclude, max_depth, 1)
+    rel_path = os.path.relpath(os.path.normpath(path), os.path.normpath(root))
+    if rel_path == "." or rel_path.startswith(os.pardir + os.sep) or rel_path == os.pardir:
+        return False
+    parts = rel_path.split(os.sep)
+    if max_depth is not None and len(parts) - 1 > max_depth:
+        return False
+    for count in range(1, len(parts) + 1):
+        if _matches(parts[count - 1], "/".join(parts[:count]), exclude):
+            return False
+    return _matches(parts[-1], "/".join(parts), include)
+
+
+def _list_dir(root, path, include, exclude):
+    """
+    Lists a single directory.
+
+    Args:
+        root (str): the scanned root
+        path (str): the directory to be listed
+        include (tuple): compiled patterns of files to collect, see _compile
+        exclude (tuple): compiled patterns of files and directories to skip
+
+    Returns:
+        tuple: the mtime of the directory, the file records (path, size, mtime_ns, inode) and the subdirectories
+
+    Raises:
+        OSError: if the directory cannot be listed
+    """
+    files = []
+    subdirs = []
+    dir_mtime = os.stat(path).st_mtime_ns
+    rel_dir = os.path.relpath(path, root).replace(os.sep, "/")
+    prefix = "" if rel_dir == "." else rel_dir + "/"
+    with os.scandir(path) as entries:
+        for entry in entries:
+            rel_path = prefix + entry.name
+            if _matches(entry.name, rel_path, exclude):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks = False):
+                    subdirs.append(os.path.normpath(entry.path))
+                elif entry.is_file() and _matches(entry.name, rel_path, include):
+                    stat = entry.stat()
+                    files.append((os.path.normpath(entry.path), stat.st_size, stat.st_mtime_ns, stat.st_ino))
+            except OSError as err:  # e.g. a dangling symlink or a file removed while listing
+                lg.debug("[dirscan_lib._list_dir/DEBUG]: Skipping " + entry.path + ": " + str(err))
+    return dir_mtime, files, subdirs
+
+
+def _options(include, exclude, max_depth, workers):
+    """
+    Fills in the scan options not passed by the caller from scan_defaults.
+
+    Returns:
+        tuple: the compiled include and exclude patterns, max_depth and workers
+    """
+    include = scan_defaults["include"] if include is None else include
+    exclude = scan_defaults["exclude"] if exclude is None else exclude
+    max_depth = scan_defaults["max_depth"] if max_depth is None else max_depth
+    workers = scan_defaults["workers"] if workers is None else workers
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) * 4)  # listing is bound by IO latency, not by the CPU
+    return _compile(include), _compile(exclude), max_depth, max(1, workers)
+
+
+def _depth(root, path):
+    """
+    Computes the depth of a directory below the scanned root.
+
+    Args:
+        root (str): the scanned root
+        path (str): the directory
+
+    Returns:
+        int: 0 for the root itself
+    """
+    rel_dir = os.path.relpath(path, root)
+    return 0 if rel_dir == "." else rel_dir.count(os.sep) + 1
+
+
+def _list_tree(pool, root, starts, include, exclude, max_depth, result, known_dirs = None, progress = None):
+    """
+    Lists directories concurrently and descends into their subdirectories.
+
+    Args:
+        pool (ThreadPoolExecutor): the pool listing the directories
+        root (str): the scanned root
+        starts (list): the directories to be listed
+        include (tuple): compiled patterns of files to collect
+        exclude (tuple): compiled patterns of files and directories to skip
+        max_depth (int): the maximum depth of listed subdirectories. None for no limit.
+        result (dict): the scan result to be filled, see scan_tree
+        known_dirs (dict): subdirectories in here are not descended into, they are checked on their own
+        progress (function): called with the scan result after every listed directory
+
+    Raises:
+        OSError: if the root cannot be listed
+    """
+    pending = {pool.submit(_list_dir, root, start, include, exclude): (start, _depth(root, start)) for start in starts}
+    while pending:
+        done, _ = wait(pending, return_when = FIRST_COMPLETED)
+        for future in done:
+            dir_path, depth = pending.pop(future)
+            try:
+                dir_mtime, files, subdirs = future.result()
+            except OSError as err:
+                if dir_path == root:
+                    raise
+                lg.warning("[dirscan_lib.scan_tree/WARN]: Directory " + dir_path + " is not accessible: " + str(err))
+                result["errors"][dir_path] = str(err)
+                continue
+            result["dirs"][dir_path] = dir_mtime
+            for file_path, size, mtime_ns, inode in files:
+                result["files"][file_path] = (size, mtime_ns, inode)
+            if progress is not None:
+                progress(result)
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for subdir in subdirs:
+                if known_dirs is None or subdir not in known_dirs:
+                    pending[pool.submit(_list_dir, root, subdir, include, exclude)] = (subdir, depth + 1)
+
+
+def list_root(path, include = None, exclude = None, max_depth = None):
+    """
+    Lists the root of a directory tree only, e.g. to scan its subdirectories one after another with start.
+
+    Args:
+        path (str): the root of the scan
+        include (list): glob patterns of files to collect. Defaults to scan_defaults["include"].
+        exclude (list): glob patterns of files and directories to skip. Defaults to scan_defaults["exclude"].
+        max_depth (int): the maximum depth of listed subdirectories. Defaults to scan_defaults["max_depth"].
+
+    Returns:
+        tuple: the scan result of the root alone (see scan_tree) and the sorted subdirectories not excluded. No
+            subdirectories, if max_depth is 0.
+
+    Raises:
+        OSError: if the root cannot be listed
+    """
+    include, exclude, max_depth, _ = _options(include, exclude, max_depth, 1)
+    root = os.path.normpath(path)
+    dir_mtime, files, subdirs = _list_dir(root, root, include, exclude)
+    result = {"files": {file_path: (size, mtime_ns, inode) for file_path, size, mtime_ns, inode in files},
+              "dirs": {root: dir_mtime}, "errors": {}}
+    return result, [] if max_depth == 0 else sorted(subdirs)
+
+
+def scan_tree(path, include = None, exclude = None, max_depth = None, workers = None, start = None, progress = None):
+    """
+    Scans a directory tree for files matching the include patterns. Directory symlinks are not followed, like os.walk
+    does by default.
+
+    Args:
+        path (str): the root of the scan
+        include (list): glob patterns of files to collect. Defaults to scan_defaults["include"].
+        exclude (list): glob patterns of files and directories to skip. Defaults to scan_defaults["exclude"].
+        max_depth (int): the maximum depth of listed subdirectories, 0 lists the root only. None for no limit.
+        workers (int): amount of threads listing directories concurrently. Defaults to scan_defaults["workers"] or
+            a value suitable for network file systems.
+        start (str): only scan this subdirectory of the root. Depths and patterns still count from the root.
+        progress (function): called with the scan result so far after every listed directory. Exceptions raised by it
+            stop the scan.
+
+    Returns:
+        dict: "files" maps the path of every matching file to its (size, mtime_ns, inode), "dirs" maps every listed
+            directory to its mtime_ns and "errors" maps directories that could not be listed to the error message.
+
+    Raises:
+        OSError: if the root itself cannot be listed
+    """
+    include, exclude, max_depth, workers = _options(include, exclude, max_depth, workers)
+    root = os.path.normpath(path)
+    result = {"files": {}, "dirs": {}, "errors": {}}
+    if not os.path.isdir(root):
+        raise OSError("Not a directory: " + root)
+
+    with ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "pyJSON-scan") as pool:
+        try:
+            _list_tree(pool, root, [root if start is None else os.path.normpath(start)], include, exclude, max_depth,
+                       result, progress = progress)
+        except BaseException:
+            pool.shutdown(cancel_futures = True)  # do not list the queued directories anymore
+            raise
+    lg.debug("[dirscan_lib.scan_tree/DEBUG]: Scanned " + str(len(result["dirs"])) + " directories, found " +
+             str(len(result["files"])) + " files.")
+    return result
+
+
+def _stat_dir(path):
+    """
+    Fetches the mtime of a directory.
+
+    Args:
+        path (str): the directory
+
+    Returns:
+        int: the mtime in nanoseconds. None, if the directory does not exist anymore.
+    """
+    try:
+        return os.stat(path).st_mtime_ns if os.path.isdir(path) else None
+    except OSError:
+        return None
+
+
+def _stat_files(paths):
+    """
+    Fetches the signatures of files.
+
+    Args:
+        paths (list): the files
+
+    Returns:
+        list: tuples of size, mtime_ns and inode. None for files that do not exist anymore.
+    """
+    signatures = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signatures.append((stat.st_size, stat.st_mtime_ns, stat.st_ino))
+        except OSError:
+            signatures.append(None)
+    return signatures
+
+
+def refresh_tree(path, previous, include = None, exclude = None, max_depth = None, workers = None, start = None):
+    """
+    Updates an earlier scan result of a directory tree. Only directories whose mtime changed are listed again, new
+    subdirectories are scanned completely. Files in unchanged directories are checked with a stat call, concurrently.
+
+    Args:
+        path (str): the root of the scan
+        previous (dict): the earlier scan result, see scan_tree. Only "files" and "dirs" are used.
+        include (list): glob patterns of files to collect. Defaults to scan_defaults["include"].
+        exclude (list): glob patterns of files and directories to skip. Defaults to scan_defaults["exclude"].
+        max_depth (int): the maximum depth of listed subdirectories. None for no limit.
+        workers (int): amount of threads. Defaults to scan_defaults["workers"].
+        start (str): only refresh this subdirectory of the root, previous has to hold its part of the tree only.
+            Depths and patterns still count from the root.
+
+    Returns:
+        tuple: the new scan result and the delta, a dict holding the sorted lists "added", "removed" and "modified"
+
+    Raises:
+        OSError: if the root itself cannot be listed
+    """
+    include, exclude, max_depth, workers = _options(include, exclude, max_depth, workers)
+    root = os.path.normpath(path)
+    if not os.path.isdir(root):
+        raise OSError("Not a directory: " + root)
+    old_dirs = previous.get("dirs", {})
+    old_files = previous.get("files", {})
+    result = {"files": {}, "dirs": {}, "errors": {}}
+
+    with ThreadPoolExecutor(max_workers = workers, thread_name_prefix = "pyJSON-scan") as pool:
+        dir_paths = list(old_dirs)
+        changed = set()
+        unchanged = set()
+        for dir_path, mtime in zip(dir_paths, pool.map(_stat_dir, dir_paths, chunksize = 256)):
+            if mtime is None:
+                continue  # removed, its files are dropped
+            if mtime != old_dirs[dir_path]:
+                changed.add(dir_path)
+            else:
+                unchanged.add(dir_path)
+                result["dirs"][dir_path] = mtime
+        start = root if start is None else os.path.normpath(start)
+        if start not in old_dirs:
+            changed.add(start)
+        _list_tree(pool, root, sorted(changed), include, exclude, max_depth, result, old_dirs)
+        for dir_path in result["errors"]:  # keep what is known about directories that failed to list this time
+            if dir_path in old_dirs:
+                unchanged.add(dir_path)
+                result["dirs"][dir_path] = old_dirs[dir_path]
+
+        # files of unchanged directories are only checked for modifications
+        kept = [file_path for file_path in old_files if os.path.dirname(file_path) in unchanged]
+        chunks = [kept[i:i + 512] for i in range(0, len(kept), 512)]
+        for chunk, signatures in zip(chunks, pool.map(_stat_files, chunks)):
+            for file_path, signature in zip(chunk, signatures):
+                if signature is not None:
+                    result["files"][file_path] = signature
+
+    new_files = result["files"]
+    delta = {
+        "added": sorted(file_path for file_path in new_files if file_path not in old_files),
+        "removed": sorted(file_path for file_path in old_files if file_path not in new_files),
+        "modified": sorted(file_path for file_path, signature in new_files.items()
+                           if file_path in old_files and tuple(old_files[file_path]) != signature)
+    }
+    lg.debug("[dirscan_lib.refresh_tree/DEBUG]: Listed " + str(len(changed)) + " changed directories. " +
+             str(len(delta["added"])) + " added, " + str(len(delta["removed"])) + " removed, " +
+             str(len(delta["modified"])) + " modified files.")
+    return result, delta
@@ -0,0 +1,980 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - SQLite Index Store
+# author: N. Plathe
+# ----------------------------------------
+"""
+The index store keeps all indexes in Indexes/pyJSON_index.sqlite: the indexed directories (roots), the listed
+directories and files with their stat data and the flattened values of the JSON documents. The values form an inverted
+index - every distinct pair of flattened key and value is a term holding the postings of the files containing it - so
+searches are answered without opening the documents. Optionally, the trigrams of all values are indexed as well, so a
+substring search only compares the values sharing all trigrams of the search term. For every file and stored schema, the
+store also records whetever the file is valid against the schema, so filtering an index by schema is a lookup. Every
+file also holds a Bloom filter of its flattened keys, which lets a search skip documents lacking a searched key without
+opening them. The directories and files of a root are split into shards, one per top level subdirectory, with a manifest
+holding a stat summary per shard. Indexing and refreshing work shard by shard, so only one shard is held in memory at a
+time. Updates are applied in transactions, so an interrupted refresh never leaves a half written index behind. The
+former layout of pyJSON_S_index.json and indexN.json files is migrated on first use and remains available as an export
+format.
+"""
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+
+from Modules.deploy_files import save_index, save_main_index
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+lg = logging.getLogger(__name__)
+lg.setLevel("DEBUG")
+
+STORE_VERSION = 1
+
+# options used when a write does not pass its own, set from the configuration on start up
+store_defaults = {
+    "values": True,
+    "key_filter_bits": 256,
+    "trigrams": True
+}
+
+# open stores, keyed by the script directory
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(script_dir):
+    """
+    Retrieves the index store of a script directory, opening (and migrating) it on first use.
+
+    Args:
+        script_dir (str): The directory in which the tool is executed
+
+    Returns:
+        IndexStore: the shared store of the directory
+    """
+    key = os.path.abspath(script_dir)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = IndexStore(script_dir)
+        return _stores[key]
+
+
+def shard_of(root, path, is_dir = False):
+    """
+    Determines the shard of a file or directory: the name of the top level subdirectory of the root it is located in.
+    Files directly in the root and the root itself belong to the shard "".
+
+    Args:
+        root (str): the indexed directory
+        path (str): the file or directory
+        is_dir (bool): whetever path is a directory
+
+    Returns:
+        str: the name of the shard
+    """
+    rel_path = os.path.relpath(path, root)
+    if rel_path == "." or (not is_dir and os.sep not in rel_path):
+        return ""
+    return rel_path.split(os.sep, 1)[0]
+
+
+def _key_positions(key, hashes, bits):
+    """
+    Computes the bits of a key in a key filter by double hashing. A stable hash is used, so filters stay valid across
+    runs.
+
+    Args:
+        key (str): the flattened key
+        hashes (int): the amount of hash functions
+        bits (int): the size of the filter in bits
+
+    Returns:
+        list: the positions of the bits
+    """
+    digest = hashlib.blake2b(key.encode("utf8"), digest_size = 16).digest()
+    first = int.from_bytes(digest[:8], "little")
+    second = int.from_bytes(digest[8:], "little") | 1
+    return [(first + i * second) % bits for i in range(hashes)]
+
+
+def key_filter(keys, bits = None):
+    """
+    Builds a Bloom filter of the flattened keys of a document. The amount of hash functions is chosen for the amount
+    of keys, so small documents get a lower false positive rate.
+
+    Args:
+        keys (iterable): the flattened keys, see jsonsearch_lib.dict_flatten_dict
+        bits (int): the size of the filter in bits. Defaults to store_defaults["key_filter_bits"].
+
+    Returns:
+        bytes: the amount of hash functions, followed by the bits of the filter
+    """
+    keys = set(keys)
+    size = max(1, ((store_defaults["key_filter_bits"] if bits is None else bits) + 7) // 8)
+    hashes = max(1, min(16, round(size * 8 / max(1, len(keys)) * math.log(2))))
+    filter_bits = bytearray(size)
+    for key in keys:
+        for position in _key_positions(key, hashes, size * 8):
+            filter_bits[position // 8] |= 1 << (position % 8)
+    return bytes([hashes]) + bytes(filter_bits)
+
+
+def may_contain(filter_bytes, keys):
+    """
+    Checks a key filter for keys. False positives are possible, false negatives are not.
+
+    Args:
+        filter_bytes (bytes): the filter, see key_filter
+        keys (iterable): the flattened keys to look for
+
+    Returns:
+        bool: False, if the document lacks at least one of the keys
+    """
+    hashes = filter_bytes[0]
+    bits = (len(filter_bytes) - 1) * 8
+    for key in keys:
+        for position in _key_positions(key, hashes, bits):
+            if not filter_bytes[1 + position // 8] & (1 << (position % 8)):
+                return False
+    return True
+
+
+def false_positive_rate(filter_bytes):
+    """
+    Estimates the probability of a key filter reporting a key the document does not hold, from the share of set bits.
+
+    Args:
+        filter_bytes (bytes): the filter, see key_filter
+
+    Returns:
+        float: the estimated false positive rate
+    """
+    set_bits = sum(bin(byte).count("1") for byte in filter_bytes[1:])
+    return (set_bits / ((len(filter_bytes) - 1) * 8)) ** filter_bytes[0]
+
+
+def trigrams(value):
+    """
+    Splits a value into its trigrams, the substrings of three characters.
+
+    Args:
+        value (str): the value
+
+    Returns:
+        set: the distinct trigrams. Empty, if the value is shorter than three characters.
+    """
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def close_stores():
+    """
+    Closes all open stores.
+    """
+    with _stores_lock:
+        for store in _stores.values():
+            store.close()
+        _stores.clear()
+
+
+class IndexStore(object):
+    """
+    The IndexStore holds the indexes of all indexed directories. A root is identified by the same number that names
+    its indexN.json file in the JSON layout.
+    """
+    def __init__(self, script_dir):
+        """
+        Constructor. Opens or creates the database and migrates the JSON layout, if the database is new.
+
+        Args:
+            script_dir (str): The directory in which the tool is executed
+        """
+        self.script_dir = script_dir
+        os.makedirs(os.path.join(script_dir, "Indexes"), exist_ok = True)
+        self.db_path = os.path.join(script_dir, "Indexes", "pyJSON_index.sqlite")
+        self._lock = threading.RLock()
+        self._con = sqlite3.connect(self.db_path, check_same_thread = False)
+        self._con.execute("PRAGMA journal_mode = WAL")
+        self._con.execute("PRAGMA foreign_keys = ON")
+        with self._con:
+            self._con.executescript(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+                "CREATE TABLE IF NOT EXISTS roots ("
+                "id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, rebuild INTEGER NOT NULL DEFAULT 0);"
+                "CREATE TABLE IF NOT EXISTS dirs ("
+                "root_id INTEGER NOT NULL REFERENCES roots(id) ON DELETE CASCADE, path TEXT NOT NULL, "
+                "mtime_ns INTEGER, shard TEXT NOT NULL DEFAULT '', PRIMARY KEY (root_id, path));"
+                "CREATE TABLE IF NOT EXISTS files ("
+                "id INTEGER PRIMARY KEY, root_id INTEGER NOT NULL REFERENCES roots(id) ON DELETE CASCADE, "
+                "path TEXT NOT NULL, size INTEGER, mtime_ns INTEGER, inode INTEGER, extracted INTEGER DEFAULT 0, "
+                "shard TEXT NOT NULL DEFAULT '', key_filter BLOB, UNIQUE (root_id, path));"
+                "CREATE TABLE IF NOT EXISTS shards ("
+                "root_id INTEGER NOT NULL REFERENCES roots(id) ON DELETE CASCADE, shard TEXT NOT NULL, "
+                "dirs INTEGER, files INTEGER, bytes INTEGER, max_mtime_ns INTEGER, PRIMARY KEY (root_id, shard));"
+                "CREATE TABLE IF NOT EXISTS terms ("
+                "id INTEGER PRIMARY KEY, key TEXT NOT NULL, value TEXT NOT NULL, UNIQUE (key, value));"
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "term_id INTEGER NOT NULL REFERENCES terms(id) ON DELETE CASCADE, "
+                "file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE, "
+                "PRIMARY KEY (term_id, file_id)) WITHOUT ROWID;"
+                "CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);"
+                "CREATE TABLE IF NOT EXISTS trigrams ("
+                "gram TEXT NOT NULL, term_id INTEGER NOT NULL REFERENCES terms(id) ON DELETE CASCADE, "
+                "PRIMARY KEY (gram, term_id)) WITHOUT ROWID;"
+                "CREATE INDEX IF NOT EXISTS trigrams_term ON trigrams (term_id);"
+                "CREATE TABLE IF NOT EXISTS compat ("
+                "schema_name TEXT NOT NULL, file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE, "
+                "schema_hash TEXT NOT NULL, valid INTEGER NOT NULL, PRIMARY KEY (schema_name, file_id)) WITHOUT ROWID;"
+                "CREATE INDEX IF NOT EXISTS compat_file ON compat (file_id);"
+                "CREATE INDEX IF NOT EXISTS files_shard_path ON files (root_id, shard, path);"
+                "CREATE INDEX IF NOT EXISTS dirs_shard ON dirs (root_id, shard);"
+            )
+        self._root_paths = {}
+        if self._meta("version") is None:  # a new store
+            with self._con:
+                self._con.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(STORE_VERSION),))
+                self._con.execute("INSERT OR REPLACE INTO meta VALUES ('cur_index', '0')")
+            self.migrate_json()
+
+    def _sync_trigrams(self):
+        """
+        Builds or drops the trigram index of all terms, if store_defaults["trigrams"] changed since the index was last
+        written. Has to be called inside a transaction.
+
+        Returns:
+            bool: whetever the trigram index is kept
+        """
+        wanted = bool(store_defaults["trigrams"])
+        if wanted != (self._meta("trigrams") == "1"):
+            self._con.execute("DELETE FROM trigrams")
+            if wanted:
+                for term_id, value in self._con.execute("SELECT id, value FROM terms").fetchall():
+                    self._write_trigrams(term_id, value)
+            self._con.execute("INSERT OR REPLACE INTO meta VALUES ('trigrams', ?)", (str(int(wanted)),))
+            lg.info("[indexstore_lib.IndexStore._sync_trigrams/INFO]: " + ("Built" if wanted else "Dropped") +
+                    " the trigram index.")
+        return wanted
+
+    def sync_trigrams(self):
+        """
+        Builds or drops the trigram index to follow store_defaults["trigrams"], in one transaction. Searches never do
+        so, they only use the trigram index while it is current. Called by the watchdog, writes do it on their own.
+
+        Returns:
+            bool: whetever the trigram index is kept
+        """
+        with self._lock, self._con:
+            return self._sync_trigrams()
+
+    def _write_trigrams(self, term_id, value):
+        """
+        Adds the trigrams of a term to the trigram index. Has to be called inside a transaction.
+
+        Args:
+            term_id (int): the id of the term
+            value (str): the value of the term
+        """
+        self._con.executemany("INSERT OR IGNORE INTO trigrams VALUES (?, ?)",
+                              [(gram, term_id) for gram in trigrams(value)])
+
+    def _meta(self, key):
+        """
+        Reads a value of the meta table.
+
+        Args:
+            key (str): the key
+
+        Returns:
+            str: the value. None, if the key is not set.
+        """
+        with self._lock:
+            row = self._con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    # roots
+
+    def main_index(self):
+        """
+        Builds the main index in the format of pyJSON_S_index.json.
+
+        Returns:
+            dict: "cur_index" holding the last assigned number and the path of every root mapped to its number
+        """
+        with self._lock:
+            rows = self._con.execute("SELECT path, id FROM roots ORDER BY id").fetchall()
+        main_index = {"cur_index": int(self._meta("cur_index") or 0)}
+        main_index.update({path: root_id for path, root_id in rows})
+        return main_index
+
+    def root_id(self, path):
+        """
+        Looks up the number of a root.
+
+        Args:
+            path (str): the indexed directory
+
+        Returns:
+            int: the number of the root. None, if the directory is not registered.
+        """
+        with self._lock:
+            row = self._con.execute("SELECT id FROM roots WHERE path = ?", (path,)).fetchone()
+        return None if row is None else row[0]
+
+    def _root_path(self, root_id):
+        """
+        Looks up the directory of a root, needed to assign paths to shards.
+        """
+        if root_id not in self._root_paths:
+            self._root_paths[root_id] = self._con.execute("SELECT path FROM roots WHERE id = ?",
+                                                          (root_id,)).fetchone()[0]
+        return self._root_paths[root_id]
+
+    def add_root(self, path):
+        """
+        Registers a directory, assigning the next free number.
+
+        Args:
+            path (str): the indexed directory
+
+        Returns:
+            int: the number of the root. The existing one, if the directory is registered already.
+        """
+        with self._lock, self._con:
+            row = self._con.execute("SELECT id FROM roots WHERE path = ?", (path,)).fetchone()
+            if row is not None:
+                return row[0]
+            root_id = int(self._meta("cur_index") or 0) + 1
+            self._con.execute("INSERT INTO roots (id, path) VALUES (?, ?)", (root_id, path))
+            self._con.execute("UPDATE meta SET value = ? WHERE key = 'cur_index'", (str(root_id),))
+        return root_id
+
+    def needs_rebuild(self, root_id):
+        """
+        Tells whether a root was imported without stat records, so it cannot be refreshed incrementally.
+
+        Args:
+            root_id (int): the number of the root
+
+        Returns:
+            bool: True until the whole index of the root was scanned again, see mark_rebuilt
+        """
+        with self._lock:
+            row = self._con.execute("SELECT rebuild FROM roots WHERE id = ?", (root_id,)).fetchone()
+        return bool(row and row[0])
+
+    def mark_rebuilt(self, root_id):
+        """
+        Clears the rebuild flag of a root, after all of its shards were replaced by a new scan.
+
+        Args:
+            root_id (int): the number of the root
+        """
+        with self._lock, self._con:
+            self._con.execute("UPDATE roots SET rebuild = 0 WHERE id = ?", (root_id,))
+
+    def remove_root(self, root_id):
+        """
+        Removes a root together with its directories, files and values.
+
+        Args:
+            root_id (int): the number of the root
+        """
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM roots WHERE id = ?", (root_id,))
+            self._drop_orphaned_terms()
+        self._root_paths.pop(root_id, None)
+
+    # files
+
+    def files(self, root_id, shard = None):
+        """
+        Lists the indexed files of a root.
+
+        Args:
+            root_id (int): the number of the root
+            shard (str): only list the files of this shard
+
+        Returns:
+            list: the paths of the files, sorted
+        """
+        query = "SELECT path FROM files WHERE root_id = ?" + (" AND shard = ?" if shard is not None else "")
+        with self._lock:
+            rows = self._con.execute(query + " ORDER BY path",
+                                     (root_id,) if shard is None else (root_id, shard)).fetchall()
+        return [row[0] for row in rows]
+
+    def dirs(self, root_id):
+        """
+        Lists the indexed directories of a root.
+
+        Args:
+            root_id (int): the number of the root
+
+        Returns:
+            dict: the directories mapped to their mtime_ns
+        """
+        with self._lock:
+            return dict(self._con.execute("SELECT path, mtime_ns FROM dirs WHERE root_id = ?", (root_id,)).fetchall())
+
+    def shards(self, root_id):
+        """
+        Reads the manifest of a root.
+
+        Args:
+            root_id (int): the number of the root
+
+        Returns:
+            dict: the names of the shards mapped to their stat summary, a dict holding the amount of "dirs" and
+                "files", the total size of the files in "bytes" and their latest modification in "max_mtime_ns"
+        """
+        with self._lock:
+            rows = self._con.execute("SELECT shard, dirs, files, bytes, max_mtime_ns FROM shards WHERE root_id = ?",
+                                     (root_id,)).fetchall()
+        return {row[0]: {"dirs": row[1], "files": row[2], "bytes": row[3], "max_mtime_ns": row[4]} for row in rows}
+
+    def load_shard(self, root_id, shard):
+        """
+        Reads a single shard of a root, in the format of a scan result, see dirscan_lib.scan_tree.
+
+        Args:
+            root_id (int): the number of the root
+            shard (str): the name of the shard
+
+        Returns:
+            dict: "files" mapping paths to (size, mtime_ns, inode) and "dirs" mapping directories to their mtime_ns
+        """
+        with self._lock:
+            file_rows = self._con.execute("SELECT path, size, mtime_ns, inode FROM files WHERE root_id = ? AND "
+                                          "shard = ? AND size IS NOT NULL", (root_id, shard)).fetchall()
+            dir_rows = self._con.execute("SELECT path, mtime_ns FROM dirs WHERE root_id = ? AND shard = ?",
+                                         (root_id, shard)).fetchall()
+        return {"files": {row[0]: (row[1], row[2], row[3]) for row in file_rows}, "dirs": dict(dir_rows)}
+
+    def load_index(self, root_id):
+        """
+        Reads the index of a root in the format of indexN.json.
+
+        Args:
+            root_id (int): the number of the root
+
+        Returns:
+            dict: "files" holding the sorted paths, "file_stats" mapping paths to (size, mtime_ns, inode) and "dirs"
+                mapping directories to their mtime_ns. None, if the root is unknown.
+        """
+        with self._lock:
+            if self._con.execute("SELECT 1 FROM roots WHERE id = ?", (root_id,)).fetchone() is None:
+                return None
+            file_rows = self._con.execute(
+                "SELECT path, size, mtime_ns, inode FROM files WHERE root_id = ? ORDER BY path", (root_id,)).fetchall()
+            dir_rows = self._con.execute("SELECT path, mtime_ns FROM dirs WHERE root_id = ?", (root_id,)).fetchall()
+        return {
+            "files": [row[0] for row in file_rows],
+            "file_stats": {row[0]: (row[1], row[2], row[3]) for row in file_rows if row[1] is not None},
+            "dirs": {row[0]: row[1] for row in dir_rows}
+        }
+
+    def values(self, path, root_id = None):
+        """
+        Reads the extracted values of a file.
+
+        Args:
+            path (str): the path of the file
+            root_id (int): the number of the root. If None, the file is looked up in all roots.
+
+        Returns:
+            dict: the flattened keys mapped to their values as strings. None, if the values were not extracted.
+        """
+        with self._lock:
+            query = "SELECT id, extracted FROM files WHERE path = ?" + (" AND root_id = ?" if root_id else "")
+            row = self._con.execute(query, (path, root_id) if root_id else (path,)).fetchone()
+            if row is None or not row[1]:
+                return None
+            rows = self._con.execute("SELECT terms.key, terms.value FROM postings JOIN terms ON terms.id = postings.term_id "
+                                     "WHERE postings.file_id = ?", (row[0],)).fetchall()
+        return dict(rows)
+
+    def file_ids(self, root_id):
+        """
+        Maps the files of a root to their ids in the store.
+
+        Args:
+            root_id (int): the number of the root
+
+        Returns:
+            dict: paths mapped to a tuple of the file id and whetever its values were extracted
+        """
+        with self._lock:
+            rows = self._con.execute("SELECT path, id, extracted FROM files WHERE root_id = ?", (root_id,)).fetchall()
+        return {row[0]: (row[1], bool(row[2])) for row in rows}
+
+    def key_filters(self, root_id):
+        """
+        Reads the key filters of the files of a root.
+
+        Args:
+            root_id (int): the number of the root
+
+        Returns:
+            dict: paths mapped to their key filter, see key_filter. Files that were not read while indexing are missing.
+        """
+        with self._lock:
+            rows = self._con.execute("SELECT path, key_filter FROM files WHERE root_id = ? AND key_filter IS NOT NULL",
+                                     (root_id,)).fetchall()
+        return dict(rows)
+
+    def stats(self, root_id):
+        """
+        Summarizes the index of a root.
+
+        Args:
+            root_id (int): the number of the root
+
+        Returns:
+            dict: the amount of "files", of files with "extracted" values and with a key filter ("filtered"), the
+                "key_filter_bytes" in total and the mean estimated "false_positive_rate" of the key filters
+        """
+        with self._lock:
+            files, extracted = self._con.execute("SELECT COUNT(*), SUM(extracted) FROM files WHERE root_id = ?",
+                                                 (root_id,)).fetchone()
+            filters = [row[0] for row in self._con.execute(
+                "SELECT key_filter FROM files WHERE root_id = ? AND key_filter IS NOT NULL", (root_id,))]
+        return {
+            "files": files,
+            "extracted": extracted or 0,
+            "filtered": len(filters),
+            "key_filter_bytes": sum(len(filter_bytes) for filter_bytes in filters),
+            "false_positive_rate": sum(map(false_positive_rate, filters)) / len(filters) if filters else 0.0
+        }
+
+    def match_terms(self, key, term):
+        """
+        Looks up the distinct values of a flattened key containing a search term. With a current trigram index, only
+        the values holding all trigrams of the term are compared. Terms shorter than three characters are compared
+        against all values of the key, as are all terms while the trigram index is not current (see sync_trigrams).
+        Only reads the store.
+
+        Args:
+            key (str): the flattened key, see jsonsearch_lib.dict_flatten_dict
+            term (str): the search term, matched as a case-sensitive substring like f_search does
+
+        Returns:
+            list: the ids of the matching terms
+        """
+        with self._lock:
+            grams = sorted(trigrams(term))[:32]  # a few grams narrow the candidates enough, values are compared anyway
+            if grams and self._meta("trigrams") != "1":
+                grams = []
+            if grams:
+                rows = self._con.execute(
+                    "SELECT id, value FROM terms WHERE key = ? AND id IN (" +
+                    " INTERSECT ".join(["SELECT term_id FROM trigrams WHERE gram = ?"] * len(grams)) + ")", [key] + grams)
+            else:
+                rows = self._con.execute("SELECT id, value FROM terms WHERE key = ?", (key,))
+            return [row[0] for row in rows if term in row[1]]
+
+    def term_files(self, term_ids, root_id = None, shard = None):
+        """
+        Looks up the files holding any of the given terms, see match_terms.
+
+        Args:
+            term_ids (list): the ids of the terms
+            root_id (int): only look up the files of this root
+            shard (str): only look up the files of this shard of the root
+
+        Returns:
+            set: the ids of the files
+        """
+        query = "SELECT postings.file_id FROM postings"
+        if root_id is not None:
+            query += " JOIN files ON files.id = postings.file_id AND files.root_id = " + str(int(root_id))
+            if shard is not None:
+                query += " AND files.shard = ?"
+        file_ids = set()
+        with self._lock:
+            for i in range(0, len(term_ids), 500):  # stay below the limit of SQL variables
+                chunk = list(term_ids[i:i + 500])
+                file_ids.update(row[0] for row in self._con.execute(
+                    query + " WHERE postings.term_id IN (" + ",".join("?" * len(chunk)) + ")",
+                    ([shard] if root_id is not None and shard is not None else []) + chunk))
+        return file_ids
+
+    def match_files(self, key, term):
+        """
+        Looks up the files holding a value containing a search term under a flattened key. Only the distinct values of
+        the key are compared, the files are taken from the postings of the matching terms, see match_terms.
+
+        Args:
+            key (str): the flattened key, see jsonsearch_lib.dict_flatten_dict
+            term (str): the search term, matched as a case-sensitive substring like f_search does
+
+        Returns:
+            set: the ids of the matching files, in all roots
+        """
+        return self.term_files(self.match_terms(key, term))
+
+    def iter_files(self, root_id, shard, schema_name, schema_hash, page_size = 10000):
+        """
+        Reads the files of a shard for a search, page by page in the order of their paths. The store is only locked
+        while a page is read, so the rows may be worked on and the store written in between.
+
+        Args:
+            root_id (int): the number of the root
+            shard (str): the name of the shard
+            schema_name (str): the file name of the schema to look up the compatibility with
+            schema_hash (str): the content hash of the schema, see resultcache_lib.schema_hash
+            page_size (int): the amount of rows read at once
+
+        Returns:
+            generator: tuples of the path, the file id, whetever the values were extracted, the key filter (None, if
+                the file was not read while indexing) and the compatibility with the schema (see compatibility)
+        """
+        after = ""
+        while True:
+            with self._lock:
+                rows = self._con.execute(
+                    "SELECT files.path, files.id, files.extracted, files.key_filter, compat.valid FROM files "
+                    "LEFT JOIN compat ON compat.file_id = files.id AND compat.schema_name = ? "
+                    "AND compat.schema_hash = ? WHERE files.root_id = ? AND files.shard = ? AND files.path > ? "
+                    "ORDER BY files.path LIMIT ?",
+                    (schema_name, schema_hash, root_id, shard, after, page_size)).fetchall()
+            for row in rows:
+                yield row[0], row[1], bool(row[2]), row[3], None if row[4] is None else bool(row[4])
+            if len(rows) < page_size:
+                return
+            after = rows[-1][0]
+
+    def _write_files(self, root_id, file_stats, extract):
+        """
+        Inserts or updates files and replaces their values and key filters. The values are only kept, if
+        store_defaults["values"] is set. Has to be called inside a transaction.
+
+        Args:
+            root_id (int): the number of the root
+            file_stats (dict): paths mapped to (size, mtime_ns, inode)
+            extract (function): takes a path and returns the flattened values of the document, None skips extraction
+        """
+        root = self._root_path(root_id)
+        self._con.executemany(
+            "INSERT INTO files (root_id, path, size, mtime_ns, inode, extracted, shard) VALUES (?, ?, ?, ?, ?, 0, ?) "
+            "ON CONFLICT (root_id, path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+            "inode = excluded.inode, extracted = 0, key_filter = NULL",
+            [(root_id, path, stat[0], stat[1], stat[2], shard_of(root, path)) for path, stat in file_stats.items()]
+        )
+        self._con.executemany("DELETE FROM compat WHERE file_id = (SELECT id FROM files WHERE root_id = ? AND path = ?)",
+                              [(root_id, path) for path in file_stats])
+        if extract is None:
+            return
+        use_trigrams = store_defaults["values"] and self._sync_trigrams()
+        for path in file_stats:
+            file_id = self._con.execute("SELECT id FROM files WHERE root_id = ? AND path = ?",
+                                        (root_id, path)).fetchone()[0]
+            self._con.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+            values = extract(path)
+            if values is None:
+                continue
+            self._con.execute("UPDATE files SET key_filter = ? WHERE id = ?", (key_filter(values), file_id))
+            if not store_defaults["values"]:
+                continue
+            pairs = list(values.items())
+            if use_trigrams:
+                for key, value in pairs:
+                    cursor = self._con.execute("INSERT OR IGNORE INTO terms (key, value) VALUES (?, ?)", (key, value))
+                    if cursor.rowcount:  # a new term
+                        self._write_trigrams(cursor.lastrowid, value)
+            else:
+                self._con.executemany("INSERT OR IGNORE INTO terms (key, value) VALUES (?, ?)", pairs)
+            self._con.executemany("INSERT OR IGNORE INTO postings SELECT id, ? FROM terms WHERE key = ? AND value = ?",
+                                  [(file_id, key, value) for key, value in pairs])
+            self._con.execute("UPDATE files SET extracted = 1 WHERE id = ?", (file_id,))
+
+    def _drop_orphaned_terms(self, term_ids = None):
+        """
+        Removes terms no file holds anymore. Has to be called inside a transaction.
+
+        Args:
+            term_ids (list): the terms to check. None checks all terms.
+        """
+        orphaned = "NOT EXISTS (SELECT 1 FROM postings WHERE postings.term_id = terms.id)"
+        if term_ids is None:
+            self._con.execute("DELETE FROM terms WHERE " + orphaned)
+            return
+        for i in range(0, len(term_ids), 500):
+            chunk = term_ids[i:i + 500]
+            self._con.execute("DELETE FROM terms WHERE id IN (" + ",".join("?" * len(chunk)) + ") AND " + orphaned,
+                              chunk)
+
+    def _write_dirs(self, root_id, dirs):
+        """
+        Inserts or updates directories. Has to be called inside a transaction.
+
+        Args:
+            root_id (int): the number of the root
+            dirs (dict): directories mapped to their mtime_ns
+        """
+        root = self._root_path(root_id)
+        self._con.executemany("INSERT INTO dirs VALUES (?, ?, ?, ?) ON CONFLICT (root_id, path) DO UPDATE SET "
+                              "mtime_ns = excluded.mtime_ns",
+                              [(root_id, path, mtime, shard_of(root, path, True)) for path, mtime in dirs.items()])
+
+    def _update_manifest(self, root_id, shards = None):
+        """
+        Recomputes the stat summaries of shards. Has to be called inside a transaction.
+
+        Args:
+            root_id (int): the number of the root
+            shards (iterable): the shards to update. None updates all shards of the root.
+        """
+        if shards is None:
+            self._con.execute("DELETE FROM shards WHERE root_id = ?", (root_id,))
+            shards = [row[0] for row in self._con.execute(
+                "SELECT shard FROM dirs WHERE root_id = ? UNION SELECT shard FROM files WHERE root_id = ?",
+                (root_id, root_id)).fetchall()]
+        for shard in set(shards):
+            dir_count = self._con.execute("SELECT COUNT(*) FROM dirs WHERE root_id = ? AND shard = ?",
+                                          (root_id, shard)).fetchone()[0]
+            file_count, size, mtime = self._con.execute(
+                "SELECT COUNT(*), SUM(size), MAX(mtime_ns) FROM files WHERE root_id = ? AND shard = ?",
+                (root_id, shard)).fetchone()
+            if dir_count or file_count:
+                self._con.execute("INSERT OR REPLACE INTO shards VALUES (?, ?, ?, ?, ?, ?)",
+                                  (root_id, shard, dir_count, file_count, size or 0, mtime))
+            else:
+                self._con.execute("DELETE FROM shards WHERE root_id = ? AND shard = ?", (root_id, shard))
+
+    def replace_shard(self, root_id, shard, scan, extract = None):
+        """
+        Replaces a single shard of a root with a new scan of its subdirectory, in one transaction.
+
+        Args:
+            root_id (int): the number of the root
+            shard (str): the name of the shard
+            scan (dict): the scan result of the shard, see dirscan_lib.scan_tree
+            extract (function): takes a path and returns the flattened values of the document. None skips extraction.
+        """
+        with self._lock, self._con:
+            term_ids = [row[0] for row in self._con.execute(
+                "SELECT DISTINCT postings.term_id FROM postings JOIN files ON files.id = postings.file_id "
+                "WHERE files.root_id = ? AND files.shard = ?", (root_id, shard))]
+            self._con.execute("DELETE FROM files WHERE root_id = ? AND shard = ?", (root_id, shard))
+            self._con.execute("DELETE FROM dirs WHERE root_id = ? AND shard = ?", (root_id, shard))
+            self._write_dirs(root_id, scan["dirs"])
+            self._write_files(root_id, scan["files"], extract)
+            self._drop_orphaned_terms(term_ids)
+            self._update_manifest(root_id, [shard])
+
+    def remove_shard(self, root_id, shard):
+        """
+        Removes a shard, e.g. because its subdirectory is gone.
+
+        Args:
+            root_id (int): the number of the root
+            shard (str): the name of the shard
+        """
+        self.replace_shard(root_id, shard, {"files": {}, "dirs": {}})
+
+    def replace_index(self, root_id, scan, extract = None):
+        """
+        Replaces the whole index of a root with a new scan, in one transaction.
+
+        Args:
+            root_id (int): the number of the root
+            scan (dict): the scan result, see dirscan_lib.scan_tree
+            extract (function): takes a path and returns the flattened values of the document. None skips extraction.
+        """
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM files WHERE root_id = ?", (root_id,))
+            self._con.execute("DELETE FROM dirs WHERE root_id = ?", (root_id,))
+            self._write_dirs(root_id, scan["dirs"])
+            self._write_files(root_id, scan["files"], extract)
+            self._drop_orphaned_terms()
+            self._update_manifest(root_id)
+            self.mark_rebuilt(root_id)
+
+    def apply_delta(self, root_id, scan, delta, extract = None, shard = None):
+        """
+        Applies the result of an incremental refresh, in one transaction. Only added and modified files are written
+        and extracted again.
+
+        Args:
+            root_id (int): the number of the root
+            scan (dict): the new scan result, see dirscan_lib.refresh_tree
+            delta (dict): the lists "added", "removed" and "modified"
+            extract (function): takes a path and returns the flattened values of the document. None skips extraction.
+            shard (str): the shard the scan covers. None, if it covers the whole root.
+        """
+        with self._lock, self._con:
+            self._con.executemany("DELETE FROM files WHERE root_id = ? AND path = ?",
+                                  [(root_id, path) for path in delta["removed"]])
+            if shard is None:
+                self._con.execute("DELETE FROM dirs WHERE root_id = ?", (root_id,))
+            else:
+                self._con.execute("DELETE FROM dirs WHERE root_id = ? AND shard = ?", (root_id, shard))
+            self._write_dirs(root_id, scan["dirs"])
+            self._write_files(root_id, {path: scan["files"][path] for path in delta["added"] + delta["modified"]},
+                              extract)
+            if delta["removed"] or delta["modified"]:
+                self._drop_orphaned_terms()
+            self._update_manifest(root_id, None if shard is None else [shard])
+
+    def apply_changes(self, root_id, file_stats, removed, dirs, extract = None):
+        """
+        Applies changes of single files and directories, e.g. reported by a file system watcher, in one transaction.
+        Unlike apply_delta, the rest of the index is left untouched.
+
+        Args:
+            root_id (int): the number of the root
+            file_stats (dict): added or modified files mapped to (size, mtime_ns, inode)
+            removed (list): the removed files
+            dirs (dict): directories mapped to their new mtime_ns
+            extract (function): takes a path and returns the flattened values of the document. None skips extraction.
+        """
+        paths = list(file_stats) + list(removed)
+        with self._lock, self._con:
+            term_ids = []
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                term_ids.extend(row[0] for row in self._con.execute(
+                    "SELECT DISTINCT postings.term_id FROM postings JOIN files ON files.id = postings.file_id "
+                    "WHERE files.root_id = ? AND files.path IN (" + ",".join("?" * len(chunk)) + ")",
+                    [root_id] + chunk))
+            self._con.executemany("DELETE FROM files WHERE root_id = ? AND path = ?",
+                                  [(root_id, path) for path in removed])
+            self._write_dirs(root_id, dirs)
+            self._write_files(root_id, file_stats, extract)
+            self._drop_orphaned_terms(term_ids)
+            root = self._root_path(root_id)
+            self._update_manifest(root_id, [shard_of(root, path) for path in paths] +
+                                  [shard_of(root, path, True) for path in dirs])
+
+    # schema compatibility
+
+    def compatibility(self, root_id, schema_name, schema_hash, shard = None):
+        """
+        Looks up whetever the files of a root are valid against a schema.
+
+        Args:
+            root_id (int): the number of the root
+            schema_name (str): the file name of the schema
+            schema_hash (str): the content hash of the schema, see resultcache_lib.schema_hash
+            shard (str): only look up the files of this shard
+
+        Returns:
+            dict: the paths of all files of the root mapped to True or False. None for files that were not validated
+                against this content of the schema yet or changed since.
+        """
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT files.path, compat.valid FROM files LEFT JOIN compat ON compat.file_id = files.id "
+                "AND compat.schema_name = ? AND compat.schema_hash = ? WHERE files.root_id = ?" +
+                (" AND files.shard = ?" if shard is not None else ""),
+                (schema_name, schema_hash, root_id) + ((shard,) if shard is not None else ())).fetchall()
+        return {row[0]: None if row[1] is None else bool(row[1]) for row in rows}
+
+    def set_compatibility(self, root_id, schema_name, schema_hash, results):
+        """
+        Records validation outcomes of files against a schema. Outcomes recorded for other contents of the schema are
+        dropped.
+
+        Args:
+            root_id (int): the number of the root
+            schema_name (str): the file name of the schema
+            schema_hash (str): the content hash of the schema the files were validated against
+            results (dict): paths mapped to whetever the file is valid
+        """
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM compat WHERE schema_name = ? AND schema_hash != ?", (schema_name, schema_hash))
+            self._con.executemany(
+                "INSERT OR REPLACE INTO compat SELECT ?, id, ?, ? FROM files WHERE root_id = ? AND path = ?",
+                [(schema_name, schema_hash, int(valid), root_id, path) for path, valid in results.items()])
+
+    def compatibility_counts(self, root_id, schema_hashes):
+        """
+        Counts the valid files of a root per schema.
+
+        Args:
+            root_id (int): the number of the root
+            schema_hashes (dict): the file names of the schemas mapped to their current content hash
+
+        Returns:
+            dict: the file names of the schemas mapped to the amount of valid files and the amount of files validated
+                against the current content of the schema
+        """
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT compat.schema_name, compat.schema_hash, SUM(compat.valid), COUNT(*) FROM compat "
+                "JOIN files ON files.id = compat.file_id WHERE files.root_id = ? "
+                "GROUP BY compat.schema_name, compat.schema_hash", (root_id,)).fetchall()
+        counts = {schema_name: (0, 0) for schema_name in schema_hashes}
+        for schema_name, schema_hash, valid, checked in rows:
+            if schema_hashes.get(schema_name) == schema_hash:
+                counts[schema_name] = (valid, checked)
+        return counts
+
+    # JSON layout
+
+    def migrate_json(self):
+        """
+        Imports the indexes of former versions (pyJSON_S_index.json and indexN.json) into the store. Those only list
+        the files of a directory, so every root is flagged for a rebuild, which the next check carries out.
+        """
+        main_path = os.path.join(self.script_dir, "Indexes", "pyJSON_S_index.json")
+        try:
+            with open(main_path, encoding = "utf8") as main_file:
+                main_index = json.load(main_file)
+        except (OSError, json.JSONDecodeError):
+            return
+        with self._lock, self._con:
+            for path, root_id in main_index.items():
+                if path == "cur_index":
+                    continue
+                self._con.execute("INSERT OR IGNORE INTO roots VALUES (?, ?, 1)", (root_id, path))
+                try:
+                    with open(os.path.join(self.script_dir, "Indexes", "index" + str(root_id) + ".json"),
+                              encoding = "utf8") as index_file:
+                        index = json.load(index_file)
+                except (OSError, json.JSONDecodeError):
+                    lg.warning("[indexstore_lib.IndexStore.migrate_json/WARN]: Index number " + str(root_id) +
+                               " could not be read, it is rebuilt on the next check.")
+                    continue
+                self._con.executemany("INSERT OR IGNORE INTO files (root_id, path, shard) VALUES (?, ?, ?)",
+                                      [(root_id, file_path, shard_of(path, file_path))
+                                       for file_path in index.get("files", [])])
+                self._update_manifest(root_id)
+            self._con.execute("UPDATE meta SET value = ? WHERE key = 'cur_index'",
+                              (str(max([main_index.get("cur_index", 0)] +
+                                       [v for k, v in main_index.items() if k != "cur_index"])),))
+        lg.info("[indexstore_lib.IndexStore.migrate_json/INFO]: Migrated " + str(len(main_index) - 1) +
+                " indexes from the JSON layout.")
+
+    def export_json(self, target_dir = None):
+        """
+        Writes all indexes in the JSON layout, pyJSON_S_index.json and one indexN.json per root.
+
+        Args:
+            target_dir (str): the directory holding the Indexes directory to write to. Defaults to the script directory.
+        """
+        target_dir = self.script_dir if target_dir is None else target_dir
+        os.makedirs(os.path.join(target_dir, "Indexes"), exist_ok = True)
+        main_index = self.main_index()
+        save_main_index(target_dir, main_index)
+        for path, root_id in main_index.items():
+            if path == "cur_index":
+                continue
+            index = self.load_index(root_id)
+            save_index(target_dir, index["files"], root_id, {"files": index["file_stats"], "dirs": index["dirs"]})
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._con.close()
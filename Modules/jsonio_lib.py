@@ -13,12 +13,18 @@ for Python and QT.
 # ----------------------------------------
 # Libraries
 # ----------------------------------------
+import itertools
 import logging
+import os
+import threading
+from collections import OrderedDict
 
 import json
 import jsonschema
-from jsonschema import validate
+from jsonschema.validators import validator_for
 
+from Modules import schemacompiler_lib
+from Modules.schemaregistry_lib import schema_registry
 from Modules.ModifiedTreeModel import ModifiedTreeClass as TreeClass
 from Modules.TreeItem import TreeItem
 
@@ -31,6 +37,146 @@ lg = logging.getLogger(__name__)
 lg.setLevel("DEBUG")
 
 
+def fallback_check(validator):
+    """
+    Wraps a jsonschema validator into the check function signature of compiled schemas.
+
+    Args:
+        validator (jsonschema.protocols.Validator): the validator of the schema
+
+    Returns:
+        function: a function taking an instance, returning None if it is valid or a tuple holding the message and the
+            schema path of the best matching error
+    """
+    def check(instance):
+        error = jsonschema.exceptions.best_match(validator.iter_errors(instance))
+        return None if error is None else (error.message, list(error.schema_path))
+    return check
+
+
+class SchemaValidatorCache(object):
+    """
+    A small LRU cache for compiled schema validators. Loading a schema, checking it against its meta schema and building
+    the validator only happens once per schema file version - the key is the schema path together with the mtime and
+    the size of the file, so replacing a schema in the storage invalidates its entry on the next lookup.
+    Next to the jsonschema validator, each entry holds a check function generated by schemacompiler_lib, if the schema
+    can be compiled, or a wrapper around the validator otherwise. References are resolved with the offline schema
+    registry, so changes to the schema storage invalidate all entries as well.
+    """
+    def __init__(self, max_size = 16, compiled_dir = None):
+        """
+        Constructor
+
+        Args:
+            max_size (int): the amount of validators to keep before the least recently used one gets evicted
+            compiled_dir (str): the directory for sidecar modules of compiled schemas. If None, schemas are compiled in
+                memory only.
+        """
+        self.max_size = max_size
+        self.compiled_dir = compiled_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_entry(self, json_schema_path):
+        """
+        Retrieves the cache entry for a schema file, building it if the file is not cached or changed on disk.
+
+        Args:
+            json_schema_path (str): path to the JSON schema
+
+        Returns:
+            dict: the entry holding the "validator", the "check" function and the "source" of the compiled schema. The
+                source is None, if the schema could not be compiled.
+
+        Raises:
+            OSError: if the schema is not accessible
+            json.JSONDecodeError: if the schema is not a JSON document
+            jsonschema.exceptions.SchemaError: if the schema is not valid against its meta schema
+        """
+        path = os.path.abspath(json_schema_path)
+        stat = os.stat(path)
+        registry = schema_registry.registry()
+        key = (path, stat.st_mtime_ns, stat.st_size, schema_registry.generation)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        with open(path, encoding = "utf8") as loaded_schema:
+            ds_schema = json.load(loaded_schema)
+        validator_class = validator_for(ds_schema)
+        validator_class.check_schema(ds_schema)
+        validator = validator_class(ds_schema, registry = registry)
+        check, source = schemacompiler_lib.compiled_validator(ds_schema, os.path.basename(path), self.compiled_dir)
+        if check is None:
+            lg.info("[jsonio_lib.SchemaValidatorCache/INFO]: Schema " + os.path.basename(path) +
+                    " cannot be compiled, falling back to jsonschema.")
+            check = fallback_check(validator)
+        entry = {"validator": validator, "check": check, "source": source}
+        with self._lock:
+            for old_key in [k for k in self._entries if k[0] == path]:  # drop outdated versions of the same file
+                del self._entries[old_key]
+            self._entries[key] = entry
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last = False)
+        return entry
+
+    def get(self, json_schema_path):
+        """
+        Retrieves the jsonschema validator for a schema file, see get_entry.
+
+        Args:
+            json_schema_path (str): path to the JSON schema
+
+        Returns:
+            jsonschema.protocols.Validator: a validator instance for the schema
+        """
+        return self.get_entry(json_schema_path)["validator"]
+
+    def info(self):
+        """
+        Reports the current state of the cache.
+
+        Returns:
+            dict: hits, misses, current size and maximum size of the cache
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "max_size": self.max_size}
+
+    def clear(self):
+        """
+        Drops all cached validators and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# module wide cache used by the validator functions
+validator_cache = SchemaValidatorCache()
+
+
+def _validate_cached(instance, json_schema_path):
+    """
+    Validates an instance with the cached validator of a schema. Raises the same error jsonschema.validate would raise.
+    The compiled check is tried first, jsonschema is only needed to report the error of an invalid instance.
+
+    Args:
+        instance (object): the deserialized JSON document
+        json_schema_path (str): path to the JSON schema
+    """
+    entry = validator_cache.get_entry(json_schema_path)
+    if entry["check"](instance) is None:
+        return
+    error = jsonschema.exceptions.best_match(entry["validator"].iter_errors(instance))
+    if error is not None:
+        raise error
+
+
 def validator_files(json_path, json_schema_path):
     """
     The validator function shall wrap around json.load and validate a JSON file against a Schema file.
@@ -42,12 +188,10 @@ def validator_files(json_path, json_schema_path):
     Returns:
         int: 0 for success, 1 for failed validation, 2 for invalid schema, -999 for IO issues.
     """
-    try:  # open JSON and schema, deserialize both and validate
-        loaded_schema = open(json_schema_path, encoding = "utf8")
-        loaded_json = open(json_path, encoding = "utf8")
-        ds_json = json.load(loaded_json)
-        ds_schema = json.load(loaded_schema)
-        validate(instance = ds_json, schema = ds_schema)
+    try:  # open JSON, deserialize it and validate with the cached validator of the schema
+        with open(json_path, encoding = "utf8") as loaded_json:
+            ds_json = json.load(loaded_json)
+        _validate_cached(ds_json, json_schema_path)
     except jsonschema.exceptions.ValidationError as err:
         lg.error("[jsonio_lib.validator_files/ERROR]: JSON is not valid against selected Schema!")
         lg.error(err)
@@ -73,11 +217,9 @@ def validator_vars(json_str, json_schema_path):
     Returns:
         int: 0 for success, 1 for failed validation, 2 for invalid schema, -999 for IO issues.
     """
-    try:  # open JSON and schema, deserialize both and validate
-        loaded_schema = open(json_schema_path, encoding = "utf8")
+    try:  # deserialize the JSON and validate with the cached validator of the schema
         ds_json = json.loads(json_str)
-        ds_schema = json.load(loaded_schema)
-        validate(instance = ds_json, schema = ds_schema)
+        _validate_cached(ds_json, json_schema_path)
     except json.decoder.JSONDecodeError as err:
         lg.error("[jsonio_lib.validator_vars/ERROR]: JSON string could not be parsed!")
         lg.error(err)
@@ -98,6 +240,116 @@ def validator_vars(json_str, json_schema_path):
     return 0
 
 
+def json_pointer(path):
+    """
+    Converts a path inside a JSON document into a JSON pointer (RFC 6901).
+
+    Args:
+        path (iterable): the keys and array indexes leading to a value
+
+    Returns:
+        str: the JSON pointer, an empty string for the document itself
+    """
+    return "".join("/" + str(part).replace("~", "~0").replace("/", "~1") for part in path)
+
+
+def _error_record(kind, message, error = None):
+    """
+    Builds a structured error record as returned by validate_object.
+
+    Args:
+        kind (str): "validation", "schema", "json" or "io"
+        message (str): a human-readable message
+        error (jsonschema.exceptions.ValidationError): the validation error, if any
+
+    Returns:
+        dict: the error record
+    """
+    path = list(error.absolute_path) if error is not None else []
+    return {
+        "kind": kind,
+        "message": message,
+        "path": path,
+        "pointer": json_pointer(path),
+        "schema_path": list(error.absolute_schema_path) if error is not None else [],
+        "validator": error.validator if error is not None else None
+    }
+
+
+def validate_object(instance, json_schema_path, max_errors = None):
+    """
+    Validates an already deserialized JSON document (e.g. the result of tree_to_py) against a schema file without
+    serializing it again. Valid documents are detected with the compiled check of the schema, errors are collected
+    lazily and the collection stops as soon as the cap is reached.
+
+    Args:
+        instance (object): the Python representation of the JSON document
+        json_schema_path (str): path to the JSON schema
+        max_errors (int): the maximum amount of errors to collect. None collects all errors.
+
+    Returns:
+        list: structured error records, see _error_record. An empty list means the document is valid. Records of the
+            kind "schema" or "io" report a schema that is invalid or not accessible.
+    """
+    try:
+        entry = validator_cache.get_entry(json_schema_path)
+    except jsonschema.exceptions.SchemaError as err:
+        lg.error("[jsonio_lib.validate_object/ERROR]: The JSON schema is not valid against its selected meta schema!")
+        return [_error_record("schema", err.message)]
+    except json.decoder.JSONDecodeError as err:
+        lg.error("[jsonio_lib.validate_object/ERROR]: The JSON schema could not be parsed!")
+        return [_error_record("schema", str(err))]
+    except OSError as err:
+        lg.error("[jsonio_lib.validate_object/ERROR]: Schema is not accessible anymore!")
+        return [_error_record("io", str(err))]
+    if entry["check"](instance) is None:
+        lg.info("[jsonio_lib.validate_object/INFO]: Validation of JSON successful!")
+        return []
+    errors = [_error_record("validation", err.message, err)
+              for err in itertools.islice(entry["validator"].iter_errors(instance), max_errors)]
+    lg.error("[jsonio_lib.validate_object/ERROR]: JSON is not valid against selected Schema!")
+    return errors
+
+
+def validate_file(json_path, json_schema_path, max_errors = None):
+    """
+    Reads a JSON document and collects its validation errors, see validate_object.
+
+    Args:
+        json_path (str): path to the JSON document
+        json_schema_path (str): path to the JSON schema
+        max_errors (int): the maximum amount of errors to collect. None collects all errors.
+
+    Returns:
+        list: structured error records. Records of the kind "json" or "io" report a document that cannot be read.
+    """
+    try:
+        with open(json_path, encoding = "utf8") as loaded_json:
+            ds_json = json.load(loaded_json)
+    except (json.decoder.JSONDecodeError, UnicodeDecodeError) as err:
+        lg.error("[jsonio_lib.validate_file/ERROR]: JSON could not be parsed!")
+        return [_error_record("json", str(err))]
+    except OSError as err:
+        lg.error("[jsonio_lib.validate_file/ERROR]: JSON is not accessible anymore!")
+        return [_error_record("io", str(err))]
+    return validate_object(ds_json, json_schema_path, max_errors)
+
+
+def validate_tree(array_of_tree_nodes, json_schema_path, max_errors = None):
+    """
+    Validates the content of the tree model directly, converting it only once into its Python representation.
+
+    Args:
+        array_of_tree_nodes (iterable): the childItems of the root node of the tree
+        json_schema_path (str): path to the JSON schema
+        max_errors (int): the maximum amount of errors to collect. None collects all errors.
+
+    Returns:
+        list: structured error records, see validate_object
+    """
+    return validate_object(tree_to_py(array_of_tree_nodes), json_schema_path, max_errors)
+
+
 def decode_function(json_path):
     """
     Wrapper for the JSONDecoder function.
@@ -130,6 +382,20 @@ def schema_to_py_gen(decoded_schema, mode: str = "keys"):
         decoded_schema (dict): a parsed JSON schema, represented as a nested dictionary
         mode (str): The mode decides which tree is returned - "keys", "meta"
 
+    Returns:
+        dict: a nested dictionary representation of a JSON document, generated from the schema
+    """
+    return _schema_to_py_gen(schema_registry.resolve(decoded_schema), mode)
+
+
+def _schema_to_py_gen(decoded_schema, mode):
+    """
+    Recursion of schema_to_py_gen on a schema without references.
+
+    Args:
+        decoded_schema (dict): a parsed JSON schema with all references inlined
+        mode (str): The mode decides which tree is returned - "keys", "meta"
+
     Returns:
         dict: a nested dictionary representation of a JSON document, generated from the schema
     """
@@ -145,7 +411,7 @@ def schema_to_py_gen(decoded_schema, mode: str = "keys"):
                     else:
                         return_dict[element] = decoded_schema["properties"][element][mode]
                 case "object":
-                    return_dict[element] = schema_to_py_gen(decoded_schema["properties"][element], mode)
+                    return_dict[element] = _schema_to_py_gen(decoded_schema["properties"][element], mode)
                 case _:
                     match mode:
                         case "keys":
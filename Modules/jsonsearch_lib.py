@@ -16,33 +16,227 @@ import logging as lg
 import regex
 import os
 import json
+import sys
+import time
 import jsonschema
-from jsonschema import validate
+from concurrent.futures import ProcessPoolExecutor
+from jsonschema.validators import validator_for
 from PySide6.QtWidgets import QMessageBox, QWidget
 
 # custom imports
-from Modules.deploy_files import save_index, save_main_index
+from Modules import dirscan_lib, indexstore_lib, jsonio_lib, progress_lib, resultcache_lib, scheduler_lib, \
+    schemacompiler_lib
+from Modules.schemaregistry_lib import schema_registry
 
 # ----------------------------------------
 # Variables and Functions
 # ----------------------------------------
 
 # WATCHDOG FUNCTION
-def watchdog(script_dir, main_index):
+def watchdog(script_dir, main_index, store = None, progress = None, workers = 4, per_device = 2, timeout = 600.0):
     """
-    The watchdog function is supposed to be called every other intervall of time to check all indexes of the tool
+    The watchdog function is supposed to be called every other intervall of time to check all indexes of the tool.
+    The indexes are checked concurrently, see scheduler_lib.refresh_all.
 
     Args:
         script_dir (str): The directory in which the tool is executed
         main_index (dict): The dictionary holding all indexes
+        store (indexstore_lib.IndexStore): the store to update. Defaults to the shared store of script_dir.
+        progress (function): called with the amount of checked indexes, the total amount and the path checked next
+        workers (int): the maximum amount of indexes checked at once
+        per_device (int): the maximum amount of indexes on the same storage device checked at once
+        timeout (float): the time in seconds a single check may take, before it counts as failed
+
+    Returns:
+        dict: the indexed directories mapped to the "seconds" their check took and the "error" that stopped it (None,
+            if it succeeded)
     """
     selection_list = list(main_index.keys())
     selection_list.remove("cur_index")
-    for i in selection_list:
-        check_index(script_dir, i, main_index)
+    if store is None:
+        store = indexstore_lib.open_store(script_dir)
+    store.sync_trigrams()  # after a change of the configuration, off the search thread
+
+    def refresh(path):
+        if not os.path.isdir(path):
+            raise FileNotFoundError("Directory is not accessible.")
+        return check_index(script_dir, path, main_index, store, raise_errors = True)
+
+    report = scheduler_lib.refresh_all(selection_list, refresh, workers, per_device, progress, timeout = timeout)
+    for path in selection_list:
+        if report[path]["error"] is None:
+            lg.info("[jsonsearch_lib.watchdog/INFO]: Checked " + path + " in " +
+                    str(round(report[path]["seconds"], 3)) + " s.")
+        else:
+            lg.error("[jsonsearch_lib.watchdog/ERROR]: Checking " + path + " failed after " +
+                     str(round(report[path]["seconds"], 3)) + " s: " + report[path]["error"])
+    return {path: {"seconds": entry["seconds"], "error": entry["error"]} for path, entry in report.items()}
 
 # SCHEMA MATCHER FUNCTIONS
-def schema_matching_search(index, schema, script_dir):
+
+# check function of a worker process, set up once by _init_validation_worker
+_worker_check = None
+
+
+def _init_validation_worker(schema, source, schema_dir):
+    """
+    Initializer of the validation worker processes. Builds the check function once per process.
+
+    Args:
+        schema (dict): the already checked JSON schema
+        source (str): the source of the compiled schema. None, if the schema could not be compiled.
+        schema_dir (str): the schema storage references are resolved from
+    """
+    global _worker_check
+    if source is not None:
+        _worker_check = schemacompiler_lib.load_source(source)
+    else:
+        schema_registry.schema_dir = schema_dir
+        _worker_check = jsonio_lib.fallback_check(validator_for(schema)(schema, registry = schema_registry.registry()))
+
+
+def _validate_path(check, path):
+    """
+    Reads a single JSON document and validates it.
+
+    Args:
+        check (function): the check function of the schema, see jsonio_lib.SchemaValidatorCache
+        path (str): path to the JSON document
+
+    Returns:
+        dict: the result record holding path, status, message and schema path of the error and the file size. The status
+            is one of "valid", "invalid", "decode_error", "json_error" or "io_error".
+    """
+    result = {"path": path, "status": "valid", "message": None, "schema_path": None, "bytes": 0}
+    try:
+        with open(path, encoding = "utf8") as json_file:
+            result["bytes"] = os.fstat(json_file.fileno()).st_size
+            instance = json.load(json_file)
+    except UnicodeDecodeError as err:
+        result["status"] = "decode_error"
+        result["message"] = str(err)
+        return result
+    except json.decoder.JSONDecodeError as err:
+        result["status"] = "json_error"
+        result["message"] = str(err)
+        return result
+    except OSError as err:
+        result["status"] = "io_error"
+        result["message"] = str(err)
+        return result
+    error = check(instance)
+    if error is not None:
+        result["status"] = "invalid"
+        result["message"], result["schema_path"] = error
+    return result
+
+
+def _validate_chunk(paths):
+    """
+    Validates a chunk of JSON documents inside a worker process.
+
+    Args:
+        paths (list): the paths of the JSON documents
+
+    Returns:
+        list: the result records in the order of the paths
+    """
+    return [_validate_path(_worker_check, path) for path in paths]
+
+
+def _iter_validated(index, entry, workers, chunk_size):
+    """
+    Validates JSON documents with a checked schema, spread over a process pool in chunks.
+
+    Args:
+        index (list): the paths of the JSON documents
+        entry (dict): the cache entry of the schema, see jsonio_lib.SchemaValidatorCache.get_entry
+        workers (int): amount of worker processes. Defaults to the CPU count, 1 validates in the calling process.
+        chunk_size (int): amount of documents handed to a worker at once
+
+    Returns:
+        generator: the result records as described in _validate_path, in the order of the index
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunk_size = max(1, chunk_size)
+    chunks = [index[i:i + chunk_size] for i in range(0, len(index), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        for path in index:
+            yield _validate_path(entry["check"], path)
+        return
+    pool = ProcessPoolExecutor(max_workers = min(workers, len(chunks)), initializer = _init_validation_worker,
+                               initargs = (entry["validator"].schema, entry["source"], schema_registry.schema_dir))
+    try:
+        for chunk_result in pool.map(_validate_chunk, chunks):
+            yield from chunk_result
+    finally:
+        pool.shutdown(cancel_futures = True)  # a closed generator does not wait for the chunks not started yet
+
+
+def iter_validation_results(index, schema_path, workers = None, chunk_size = 64, result_cache = None):
+    """
+    Validates all JSON documents of an index against a schema, spread over a process pool in chunks. The schema is
+    loaded and checked once, the results are yielded in the order of the index. If a result cache is handed over, only
+    documents that changed since their last validation against the same schema content are validated again.
+
+    Args:
+        index (list): the index list holding all paths of JSON documents
+        schema_path (str): path to the JSON schema
+        workers (int): amount of worker processes. Defaults to the CPU count, 1 validates in the calling process.
+        chunk_size (int): amount of documents handed to a worker at once
+        result_cache (resultcache_lib.ValidationResultCache): the persistent result cache to use, if any
+
+    Returns:
+        generator: the result records as described in _validate_path, with an additional "cached" flag
+
+    Raises:
+        OSError: if the schema is not accessible
+        jsonschema.exceptions.SchemaError: if the schema is not valid against its meta schema
+    """
+    entry = jsonio_lib.validator_cache.get_entry(schema_path)
+    if result_cache is None:
+        for result in _iter_validated(index, entry, workers, chunk_size):
+            result["cached"] = False
+            yield result
+        return
+
+    schema_name = os.path.basename(schema_path)
+    digest = resultcache_lib.schema_hash(schema_path)
+    cached = result_cache.lookup(schema_name, digest)
+    signatures = {}
+    pending = []
+    for path in index:
+        signature = resultcache_lib.file_signature(path)
+        cached_entry = cached.get(path)
+        if cached_entry is None or signature is None or cached_entry[0] != signature:
+            signatures[path] = signature
+            pending.append(path)
+    lg.info("[jsonsearch_lib.iter_validation_results/INFO]: " + str(len(index) - len(pending)) + " of " +
+            str(len(index)) + " results taken from the result cache.")
+
+    fresh = _iter_validated(pending, entry, workers, chunk_size)
+    new_entries = []
+    try:
+        for path in index:
+            if path in signatures:
+                result = next(fresh)
+                result["cached"] = False
+                new_entries.append((path, signatures[path], result["status"], result["message"]))
+                if len(new_entries) >= 1000:
+                    result_cache.store(schema_name, digest, new_entries)
+                    new_entries = []
+            else:
+                signature, status, message = cached[path]
+                result = {"path": path, "status": status, "message": message, "schema_path": None,
+                          "bytes": signature[0], "cached": True}
+            yield result
+    finally:
+        fresh.close()
+        result_cache.store(schema_name, digest, new_entries)
+
+
+def schema_matching_search(index, schema, script_dir, workers = None, chunk_size = 64, use_cache = True):
     """
     Takes an index and matches all entries against the selected schema. Non-compliant entries are omitted.
 
@@ -50,6 +244,9 @@ def schema_matching_search(index, schema, script_dir):
         index (list): the index list holding all paths of JSON documents
         schema (str): the file name of the schema.
         script_dir (str): The directory in which the tool is executed
+        workers (int): amount of worker processes, see iter_validation_results
+        chunk_size (int): amount of documents handed to a worker at once
+        use_cache (bool): reuse results of unchanged documents from the persistent result cache in Indexes
 
     Returns:
         list: the new index containing all retained entries
@@ -58,47 +255,369 @@ def schema_matching_search(index, schema, script_dir):
     lg.info("Matching against schema: " + schema)
     lg.info("----------")
     return_index = []
-    for i in index:
-        try:
-            validate(
-                instance=json.load(open(i, encoding = "utf8")),
-                schema=json.load(open(os.path.join(script_dir, "Schemas", schema), encoding = "utf8"))
-            )
-            return_index.append(i)
-        except UnicodeDecodeError as err:
-            lg.error(i)
-            lg.error(err)
-            lg.error("[jsonsearch_lib.schema_matching_search/ERROR]: The JSON file cannot be decoded properly" +
-                     " because it seems to use a different charset than expected.")
-            lg.error("----------")
-        except json.decoder.JSONDecodeError as err:
-            lg.error(i)
-            lg.error(err)
-            lg.error("[jsonsearch_lib.schema_matching_search/ERROR]: Invalid JSON structure. Skipping!")
-            lg.error("----------")
-        except jsonschema.ValidationError as err:
-            lg.info(i)
-            lg.info(err.message)
-            lg.info(err.schema_path)
-            lg.info("[jsonsearch_lib.schema_matching_search/INFO]: JSON not valid against schema.")
-            lg.info("----------")
-        except jsonschema.SchemaError as err:
-            lg.critical(err)
-            lg.critical("[jsonsearch_lib.schema_matching_search/CRITICAL]: The schema is invalid!")
-            QMessageBox(
-                QWidget(),
-                "[jsonsearch_lib.schema_matching_search/CRITICAL]",
-                "[jsonsearch_lib.schema_matching_search/CRITICAL]: The schema does not validate against ." +
-                "its metaschema. Please check your selected schema!"
-            )
-            break
+    result_cache = resultcache_lib.ValidationResultCache(script_dir) if use_cache else None
+    try:
+        for result in iter_validation_results(index, os.path.join(script_dir, "Schemas", schema), workers, chunk_size,
+                                              result_cache):
+            i = result["path"]
+            match result["status"]:
+                case "valid":
+                    return_index.append(i)
+                case "decode_error":
+                    lg.error(i)
+                    lg.error(result["message"])
+                    lg.error("[jsonsearch_lib.schema_matching_search/ERROR]: The JSON file cannot be decoded properly" +
+                             " because it seems to use a different charset than expected.")
+                    lg.error("----------")
+                case "json_error":
+                    lg.error(i)
+                    lg.error(result["message"])
+                    lg.error("[jsonsearch_lib.schema_matching_search/ERROR]: Invalid JSON structure. Skipping!")
+                    lg.error("----------")
+                case "io_error":
+                    lg.error(i)
+                    lg.error(result["message"])
+                    lg.error("[jsonsearch_lib.schema_matching_search/ERROR]: The JSON file is not accessible. Skipping!")
+                    lg.error("----------")
+                case "invalid":
+                    lg.info(i)
+                    lg.info(result["message"])
+                    lg.info(result["schema_path"])
+                    lg.info("[jsonsearch_lib.schema_matching_search/INFO]: JSON not valid against schema.")
+                    lg.info("----------")
+    except jsonschema.SchemaError as err:
+        lg.critical(err)
+        lg.critical("[jsonsearch_lib.schema_matching_search/CRITICAL]: The schema is invalid!")
+        QMessageBox.critical(
+            QWidget(),
+            "[jsonsearch_lib.schema_matching_search/CRITICAL]",
+            "[jsonsearch_lib.schema_matching_search/CRITICAL]: The schema does not validate against ." +
+            "its metaschema. Please check your selected schema!"
+        )
+    except (OSError, json.decoder.JSONDecodeError) as err:
+        lg.critical(err)
+        lg.critical("[jsonsearch_lib.schema_matching_search/CRITICAL]: The schema is not accessible or not a JSON document!")
+    finally:
+        if result_cache is not None:
+            result_cache.close()
     return return_index
 
 
+def update_compatibility(script_dir, root_id, schema_names = None, store = None, workers = None, chunk_size = 64):
+    """
+    Validates the files of an index against stored schemas and records the outcomes in the index store. Only pairs of
+    file and schema that were not validated yet, or whose file or schema changed since, are validated.
+
+    Args:
+        script_dir (str): The directory in which the tool is executed
+        root_id (int): the number of the index
+        schema_names (list): the file names of the schemas. Defaults to all schemas of the schema storage.
+        store (indexstore_lib.IndexStore): the store holding the index. Defaults to the shared store of script_dir.
+        workers (int): amount of worker processes, see iter_validation_results
+        chunk_size (int): amount of documents handed to a worker at once
+
+    Returns:
+        dict: the file names of the schemas mapped to the content hash their outcomes are recorded with, see
+            indexstore_lib.IndexStore.compatibility. Schemas that cannot be used are left out.
+    """
+    if store is None:
+        store = indexstore_lib.open_store(script_dir)
+    schema_dir = os.path.join(script_dir, "Schemas")
+    if schema_names is None:
+        schema_names = sorted(name for name in os.listdir(schema_dir) if name.endswith(".json")) \
+            if os.path.isdir(schema_dir) else []
+    digests = {}
+    shards = sorted(store.shards(root_id))
+    for schema_name in schema_names:
+        schema_path = os.path.join(schema_dir, schema_name)
+        try:
+            digest = resultcache_lib.schema_hash(schema_path)
+            validated = 0
+            for shard in shards:  # shard by shard, to bound the memory needed
+                stale = [path for path, valid in store.compatibility(root_id, schema_name, digest, shard).items()
+                         if valid is None]
+                if not stale:
+                    continue
+                results = {}
+                for result in iter_validation_results(stale, schema_path, workers, chunk_size):
+                    if result["status"] in resultcache_lib.CACHEABLE_STATES:  # unreadable files stay stale
+                        results[result["path"]] = result["status"] == "valid"
+                store.set_compatibility(root_id, schema_name, digest, results)
+                validated += len(stale)
+            if validated:
+                lg.info("[jsonsearch_lib.update_compatibility/INFO]: Validated " + str(validated) +
+                        " files against " + schema_name + ".")
+        except (OSError, json.decoder.JSONDecodeError, jsonschema.SchemaError) as err:
+            lg.debug(err)
+            lg.error("[jsonsearch_lib.update_compatibility/ERROR]: Schema " + schema_name + " cannot be used.")
+            continue
+        digests[schema_name] = digest
+    return digests
+
+
+def indexed_schema_match(index, schema, script_dir, root_id, store = None, workers = None, chunk_size = 64):
+    """
+    Filters an index by schema like schema_matching_search does, using the compatibility recorded in the index store.
+    Only files without a current record are validated.
+
+    Args:
+        index (list): the index list holding all paths of JSON documents
+        schema (str): the file name of the schema
+        script_dir (str): The directory in which the tool is executed
+        root_id (int): the number of the index
+        store (indexstore_lib.IndexStore): the store holding the index. Defaults to the shared store of script_dir.
+        workers (int): amount of worker processes, see iter_validation_results
+        chunk_size (int): amount of documents handed to a worker at once
+
+    Returns:
+        list: the new index containing all retained entries
+    """
+    if store is None:
+        store = indexstore_lib.open_store(script_dir)
+    digest = update_compatibility(script_dir, root_id, [schema], store, workers, chunk_size).get(schema)
+    if digest is None:  # reports the unusable schema
+        return schema_matching_search(index, schema, script_dir, workers, chunk_size)
+    compat = store.compatibility(root_id, schema, digest)
+    unknown = [path for path in index if path not in compat]
+    matched = set(schema_matching_search(unknown, schema, script_dir, workers, chunk_size)) if unknown else set()
+    return [path for path in index if compat.get(path) or path in matched]
+
+
+def iter_search(index, schema, script_dir, root_id, search_dict, store = None, workers = None, chunk_size = 64,
+                cancel = None, timings = None, page_size = 10000, progress = None):
+    """
+    Searches an index like indexed_schema_match followed by indexed_search, but yields the matching files as soon as
+    they are found. Files whose compatibility with the schema is recorded come first. The others follow as they pass
+    the search pipeline (see iter_pipeline), which parses them once and validates only those holding the search terms.
+    Their outcomes get recorded in the store. The index is read shard by shard and page by page (see
+    indexstore_lib.IndexStore.iter_files), so the memory needed does not grow with the size of the index. Within a
+    shard, the files come in the order of their paths.
+
+    Args:
+        index (list): the paths of the JSON documents to search. None searches all indexed files of the root. Files
+            that are not part of the index are left out either way.
+        schema (str): the file name of the schema
+        script_dir (str): The directory in which the tool is executed
+        root_id (int): the number of the index
+        search_dict (dict): flattened keys mapped to the terms to search for, see f_search
+        store (indexstore_lib.IndexStore): the store holding the index. Defaults to the shared store of script_dir.
+        workers (int): amount of worker processes, see iter_validation_results
+        chunk_size (int): amount of documents handed to a worker at once
+        cancel (progress_lib.CancelToken): stops the search, if cancelled
+        timings (dict): filled with the stage timings of the files passing the search pipeline, see iter_pipeline
+        page_size (int): the amount of files read from the store and validated at once
+        progress (function): called without arguments after every file looked at, whether it matches or not. Lets the
+            caller act on time while no matches come along, e.g. hand over the matches found so far.
+
+    Returns:
+        generator: the paths of the matching files
+
+    Raises:
+        progress_lib.Cancelled: if the search was cancelled
+        OSError: if the schema is not accessible
+        json.decoder.JSONDecodeError: if the schema is not a JSON document
+        jsonschema.exceptions.SchemaError: if the schema is not valid against its meta schema
+    """
+    if store is None:
+        store = indexstore_lib.open_store(script_dir)
+    if cancel is None:
+        cancel = progress_lib.CancelToken()
+    wanted = set(index) if index is not None else None
+
+    def checkpoint():
+        cancel.check()
+        if progress is not None:
+            progress()
+
+    query = compile_query(search_dict)
+    term_ids = [store.match_terms(key, str(term)) for key, term in search_dict.items()]
+
+    def shard_matches(shard):
+        matches = None
+        for ids in term_ids:
+            key_matches = store.term_files(ids, root_id, shard)
+            matches = key_matches if matches is None else matches & key_matches
+        return matches
+
+    def may_match(row, matches):
+        # files whose values are known or lack a searched key need not be read at all
+        path, file_id, extracted, filter_bytes, _ = row
+        if extracted:
+            return matches is None or file_id in matches
+        return filter_bytes is None or not search_dict or indexstore_lib.may_contain(filter_bytes, search_dict)
+
+    def value_match(row, matches):
+        if not may_match(row, matches):
+            return False
+        if row[2] or not query:
+            return True
+        try:
+            return match_flat(_read_flat(row[0]), query)
+        except OSError as err:
+            lg.error("[jsonsearch_lib.iter_search/ERROR]: " + row[0] + " is not accessible: " + str(err))
+            return False
+
+    def validate(candidates):
+        results = {}
+        try:
+            for result in iter_pipeline(candidates, schema_path, search_dict, workers, chunk_size, timings):
+                checkpoint()
+                if result["status"] in resultcache_lib.CACHEABLE_STATES:
+                    results[result["path"]] = result["status"] == "valid"
+                if result["status"] == "valid":
+                    yield result["path"]
+        finally:
+            if results:
+                store.set_compatibility(root_id, schema, digest, results)
+
+    schema_path = os.path.join(script_dir, "Schemas", schema)
+    digest = resultcache_lib.schema_hash(schema_path)
+    shards = sorted(store.shards(root_id))
+    stale_shards = []
+    for shard in shards:
+        matches = shard_matches(shard)
+        stale = False
+        for row in store.iter_files(root_id, shard, schema, digest, page_size):
+            checkpoint()
+            if wanted is not None and row[0] not in wanted:
+                continue
+            if row[4] is None:
+                stale = True
+            elif row[4] and value_match(row, matches):
+                yield row[0]
+        if stale:
+            stale_shards.append(shard)
+
+    for shard in stale_shards:
+        matches = shard_matches(shard)
+        candidates = []
+        for row in store.iter_files(root_id, shard, schema, digest, page_size):
+            checkpoint()
+            if row[4] is None and (wanted is None or row[0] in wanted) and may_match(row, matches):
+                candidates.append(row[0])
+            if len(candidates) >= page_size:
+                yield from validate(candidates)
+                candidates = []
+        if candidates:
+            yield from validate(candidates)
+
+
+def batch_validate(index, schema_path, workers = None, chunk_size = 64, out = None, result_cache = None):
+    """
+    Headless batch validation. Validates every file of an index on the worker pool and streams one JSON line per file,
+    followed by a summary line holding the throughput. Does not touch any Qt object.
+
+    Args:
+        index (list): the index list holding all paths of JSON documents
+        schema_path (str): path to the JSON schema
+        workers (int): amount of worker processes, see iter_validation_results
+        chunk_size (int): amount of documents handed to a worker at once
+        out (TextIO): the stream the JSON lines are written to. Defaults to stdout.
+        result_cache (resultcache_lib.ValidationResultCache): the persistent result cache to use, if any
+
+    Returns:
+        int: 0 if all files are valid, 1 if at least one file is invalid or unreadable, 2 for an unusable schema.
+    """
+    if out is None:
+        out = sys.stdout
+    counts = {"valid": 0, "invalid": 0, "decode_error": 0, "json_error": 0, "io_error": 0}
+    total_bytes = 0
+    start = time.perf_counter()
+    try:
+        for result in iter_validation_results(index, schema_path, workers, chunk_size, result_cache):
+            counts[result["status"]] += 1
+            total_bytes += result["bytes"]
+            out.write(json.dumps(result, ensure_ascii = False) + "\n")
+            out.flush()
+    except (jsonschema.SchemaError, OSError, json.decoder.JSONDecodeError) as err:
+        lg.critical(err)
+        lg.critical("[jsonsearch_lib.batch_validate/CRITICAL]: The schema is invalid or not accessible!")
+        return 2
+    elapsed = time.perf_counter() - start
+    files = sum(counts.values())
+    summary = {
+        "files": files,
+        "bytes": total_bytes,
+        "seconds": round(elapsed, 3),
+        "files_per_s": round(files / elapsed, 1) if elapsed > 0 else None,
+        "mb_per_s": round(total_bytes / 1048576 / elapsed, 3) if elapsed > 0 else None
+    }
+    summary.update(counts)
+    out.write(json.dumps({"summary": summary}) + "\n")
+    out.flush()
+    return 0 if counts["valid"] == files else 1
+
+
 # VALUE SEARCH
+def compile_query(search_dict):
+    """
+    Compiles the search terms of a search once, for matching many documents with match_flat.
+
+    Args:
+        search_dict: a dictionary containing key-value-pairs to be searched for
+
+    Returns:
+        list: tuples of the flattened key and the compiled pattern of its term, matching it as a substring
+
+    Raises:
+        regex.error: if a term cannot be compiled
+    """
+    return [(key, regex.compile(regex.escape(str(term)))) for key, term in search_dict.items()]
+
+
+def match_flat(flat_dict, query):
+    """
+    Checks a flattened document against a compiled query. Every key of the query has to be present with a non-empty
+    value containing its term.
+
+    Args:
+        flat_dict (dict): the flattened document, see dict_flatten_dict
+        query (list): the compiled query, see compile_query
+
+    Returns:
+        bool: whetever the document matches
+    """
+    for key, pattern in query:
+        value = flat_dict.get(key, "")
+        if value == "" or not pattern.search(str(value)):
+            return False
+    return True
+
+
+def _read_flat(path):
+    """
+    Reads and flattens a JSON document for f_search. Documents that cannot be decoded count as empty.
+
+    Args:
+        path (str): path to the JSON document
+
+    Returns:
+        dict: the flattened document
+
+    Raises:
+        OSError: if the file cannot be read
+    """
+    try:
+        with open(path, encoding = "utf8") as json_file:
+            document = json.load(json_file)
+        if document is None:
+            raise json.decoder.JSONDecodeError("Content of JSON file is Null.", path, 0)
+    except json.decoder.JSONDecodeError as err:
+        lg.error(err)
+        lg.error("[jsonsearch_lib.f_search/ERROR]: JSON file invalid. Skipping!")
+        return {}
+    except UnicodeDecodeError as err:
+        lg.error(err)
+        lg.error("[jsonsearch_lib.f_search/ERROR]: The JSON file cannot be decoded properly" +
+                 " because it seems to use a different charset than expected. Skipping!")
+        return {}
+    return dict_flatten_dict(document)
+
+
 def f_search(search_index, search_dict):
     """
-        A flat search algorithm for values on a regular expression basis
+        A flat search algorithm for values on a regular expression basis. The query is compiled once and every
+        document is read and flattened once.
 
         Args:
             search_index: the list of the index that shall be searched within
@@ -107,47 +626,14 @@ def f_search(search_index, search_dict):
         Returns:
             list: the new index containing all retained entries
         """
-    copy_index = search_index.copy() # because we need to avoid modifying the original list
     result_list = []
     lg.info("==========\nFLAT SEARCH\n==========")
     try:
-        for i in search_index: # for each element in the original handed over list...
-            lg.info("reading: " + i)
-            try: # ... open the file ...
-                json_file = json.load(open(i, encoding = "utf8"))
-                if json_file is None:
-                    raise json.decoder.JSONDecodeError("Content of JSON file is Null.", i, 0)
-            except json.decoder.JSONDecodeError as err:
-                lg.error(err)
-                lg.error("[jsonsearch_lib.f_search/ERROR]: JSON file invalid. Skipping!")
-                json_file = {}
-            except UnicodeDecodeError as err:
-                lg.error(err)
-                lg.error("[jsonsearch_lib.f_search/ERROR]: The JSON file cannot be decoded properly" +
-                         " because it seems to use a different charset than expected. Skipping!")
-                json_file = {}
-            check_list = {} # ... flatten it ...
-            check_list = dict_flatten_dict(json_file, check_list)
-            for j in search_dict.keys(): # ... then match the elements to search against
-                if i not in copy_index: # Skip, if already eliminated
-                    break
-                lg.info("----------")
-                lg.info("Current Search Key: " + j)
-                lg.info("Current Search Term: " + str(search_dict[j]))
-                lg.info("----------")
-                comp_str = regex.compile(regex.escape(str(search_dict[j])))
-                for k in list(check_list.keys()):
-                    if check_list[k] == "":
-                        del check_list[k]
-                for l in list(check_list.keys()):
-                    if l == j and not regex.search(comp_str, str(check_list[l])):
-                        copy_index.remove(i)
-                        lg.debug("\nValue does not match search value for given key.\nRemoved: " + i)
-                if j not in list(check_list.keys()):
-                    copy_index.remove(i)
-                    lg.debug("\nGiven key not present or value for given key was empty.\nRemoved: " + i)
-        result_list = copy_index
-    except (regex.error, OSError, AttributeError) as err:
+        query = compile_query(search_dict)
+        result_list = [path for path in search_index if match_flat(_read_flat(path), query)]
+        lg.debug("[jsonsearch_lib.f_search/DEBUG]: Retained " + str(len(result_list)) + " of " +
+                 str(len(search_index)) + " files.")
+    except (regex.error, OSError, AttributeError, TypeError) as err:
         lg.error(err)
         if isinstance(err, regex.error):
             msg = "Regex Error: At least one search term could not be compiled into a regular expression."
@@ -160,16 +646,301 @@ def f_search(search_index, search_dict):
             "[jsonsearch_lib.f_search/ERROR]",
             msg
         )
+        result_list = []
+    return result_list
+
+
+def indexed_search(search_index, search_dict, store, root_id):
+    """
+        Answers a search like f_search does, but from the inverted index of the index store. Only files whose values
+        were not extracted into the store are opened and searched with f_search, except for those whose key filter
+        shows that they lack a searched key.
+
+        Args:
+            search_index: the list of the index that shall be searched within
+            search_dict: a dictionary containing key-value-pairs to be searched for
+            store (indexstore_lib.IndexStore): the store holding the index
+            root_id (int): the number of the index
+
+        Returns:
+            list: the new index containing all retained entries, in the order of search_index
+        """
+    start = time.perf_counter()
+    known = store.file_ids(root_id)
+    matches = None
+    for key, term in search_dict.items():
+        key_matches = store.match_files(key, str(term))
+        matches = key_matches if matches is None else matches & key_matches
+    result_list = []
+    unindexed = []
+    for path in search_index:
+        entry = known.get(path)
+        if entry is None or not entry[1]:
+            unindexed.append(path)
+        elif matches is None or entry[0] in matches:
+            result_list.append(path)
+    if unindexed:
+        filters = store.key_filters(root_id)
+        candidates = [path for path in unindexed
+                      if path not in filters or indexstore_lib.may_contain(filters[path], search_dict)]
+        lg.info("[jsonsearch_lib.indexed_search/INFO]: " + str(len(unindexed)) + " files are not indexed yet, " +
+                str(len(candidates)) + " of them may hold all search keys and get searched directly.")
+        retained = set(result_list).union(f_search(candidates, search_dict) if candidates else [])
+        result_list = [path for path in search_index if path in retained]
+    lg.debug("[jsonsearch_lib.indexed_search/DEBUG]: Retained " + str(len(result_list)) + " of " +
+             str(len(search_index)) + " files in " + str(round(time.perf_counter() - start, 3)) + " s.")
     return result_list
 
+# SEARCH PIPELINE
+
+# the stages a document passes through in the search pipeline, in their order
+PIPELINE_STAGES = ("read", "parse", "match", "validate")
+
+# compiled query of a search worker process, set up once by _init_search_worker
+_worker_query = None
+
+
+def _init_search_worker(schema, source, schema_dir, search_dict):
+    """
+    Initializer of the search worker processes. Builds the check function and compiles the query once per process.
+
+    Args:
+        schema (dict): the already checked JSON schema
+        source (str): the source of the compiled schema. None, if the schema could not be compiled.
+        schema_dir (str): the schema storage references are resolved from
+        search_dict (dict): flattened keys mapped to the terms to search for, see f_search
+    """
+    global _worker_query
+    _init_validation_worker(schema, source, schema_dir)
+    _worker_query = compile_query(search_dict)
+
+
+def _count_stage(stages, stage, start):
+    """
+    Adds a document and the time since start to a stage.
+
+    Args:
+        stages (dict): the stage names mapped to the amount of documents and the seconds spent
+        stage (str): the stage the document passed
+        start (float): the time the stage began, see time.perf_counter
+
+    Returns:
+        float: the current time, the start of the next stage
+    """
+    now = time.perf_counter()
+    entry = stages.setdefault(stage, [0, 0.0])
+    entry[0] += 1
+    entry[1] += now - start
+    return now
+
 
-def dict_flatten_dict(target_dict, flat_dict = None):
+def _search_path(check, query, path, stages):
+    """
+    Reads and parses a single JSON document once, matches its values and validates it, if they match. Matching comes
+    first, since it is a lot cheaper than validating.
+
+    Args:
+        check (function): the check function of the schema, see jsonio_lib.SchemaValidatorCache
+        query (list): the compiled query, see compile_query. Empty, if every document matches.
+        path (str): path to the JSON document
+        stages (dict): the stage names mapped to the amount of documents and the seconds spent, added to
+
+    Returns:
+        dict: the result record as described in _validate_path. Documents whose values do not match get the status
+            "unmatched" and are not validated.
+    """
+    result = {"path": path, "status": "valid", "message": None, "schema_path": None, "bytes": 0}
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as json_file:
+            content = json_file.read()
+    except OSError as err:
+        _count_stage(stages, "read", start)
+        result["status"] = "io_error"
+        result["message"] = str(err)
+        return result
+    result["bytes"] = len(content)
+    start = _count_stage(stages, "read", start)
+    try:
+        instance = json.loads(content.decode("utf8"))
+    except (UnicodeDecodeError, json.decoder.JSONDecodeError) as err:
+        _count_stage(stages, "parse", start)
+        result["status"] = "decode_error" if isinstance(err, UnicodeDecodeError) else "json_error"
+        result["message"] = str(err)
+        return result
+    start = _count_stage(stages, "parse", start)
+    if query:
+        matched = match_flat(dict_flatten_dict(instance, consume = False), query)
+        start = _count_stage(stages, "match", start)
+        if not matched:
+            result["status"] = "unmatched"
+            return result
+    error = check(instance)
+    _count_stage(stages, "validate", start)
+    if error is not None:
+        result["status"] = "invalid"
+        result["message"], result["schema_path"] = error
+    return result
+
+
+def _search_chunk(paths):
+    """
+    Searches a chunk of JSON documents inside a worker process.
+
+    Args:
+        paths (list): the paths of the JSON documents
+
+    Returns:
+        tuple: the result records in the order of the paths and the stages of the chunk, see _search_path
+    """
+    stages = {}
+    return [_search_path(_worker_check, _worker_query, path, stages) for path in paths], stages
+
+
+def _iter_searched(index, entry, search_dict, workers, chunk_size, timings):
+    """
+    Searches JSON documents with a checked schema, spread over a process pool in chunks like _iter_validated.
+
+    Args:
+        index (list): the paths of the JSON documents
+        entry (dict): the cache entry of the schema, see jsonio_lib.SchemaValidatorCache.get_entry
+        search_dict (dict): flattened keys mapped to the terms to search for, see f_search
+        workers (int): amount of worker processes. Defaults to the CPU count, 1 searches in the calling process.
+        chunk_size (int): amount of documents handed to a worker at once
+        timings (dict): the stage timings to add to, see iter_pipeline
+
+    Returns:
+        generator: the result records as described in _search_path, in the order of the index
+    """
+    def add(stages):
+        for stage, (files, seconds) in stages.items():
+            timings[stage]["files"] += files
+            timings[stage]["seconds"] += seconds
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunk_size = max(1, chunk_size)
+    chunks = [index[i:i + chunk_size] for i in range(0, len(index), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        query = compile_query(search_dict)
+        for path in index:
+            stages = {}
+            result = _search_path(entry["check"], query, path, stages)
+            add(stages)
+            yield result
+        return
+    pool = ProcessPoolExecutor(max_workers = min(workers, len(chunks)), initializer = _init_search_worker,
+                               initargs = (entry["validator"].schema, entry["source"], schema_registry.schema_dir,
+                                           search_dict))
+    try:
+        for chunk_result, stages in pool.map(_search_chunk, chunks):
+            add(stages)
+            yield from chunk_result
+    finally:
+        pool.shutdown(cancel_futures = True)
+
+
+def iter_pipeline(index, schema_path, search_dict, workers = None, chunk_size = 64, timings = None):
+    """
+    Searches JSON documents for values and a schema in a single pass. Every document is read and parsed once, its
+    values are matched against the search terms and only matching documents are validated. Spread over a process pool
+    in chunks like iter_validation_results, the results are yielded in the order of the index.
+
+    Args:
+        index (list): the index list holding all paths of JSON documents
+        schema_path (str): path to the JSON schema
+        search_dict (dict): flattened keys mapped to the terms to search for, see f_search
+        workers (int): amount of worker processes. Defaults to the CPU count, 1 searches in the calling process.
+        chunk_size (int): amount of documents handed to a worker at once
+        timings (dict): filled with the stages (see PIPELINE_STAGES) mapped to the amount of "files" that passed
+            them and the "seconds" spent on them, summed over all worker processes
+
+    Returns:
+        generator: the result records as described in _search_path
+
+    Raises:
+        OSError: if the schema is not accessible
+        jsonschema.exceptions.SchemaError: if the schema is not valid against its meta schema
+    """
+    if timings is None:
+        timings = {}
+    for stage in PIPELINE_STAGES:
+        timings.setdefault(stage, {"files": 0, "seconds": 0.0})
+    entry = jsonio_lib.validator_cache.get_entry(schema_path)
+    yield from _iter_searched(index, entry, search_dict, workers, chunk_size, timings)
+
+
+def format_timings(timings):
+    """
+    Describes the stage timings of a search in one line.
+
+    Args:
+        timings (dict): see iter_pipeline
+
+    Returns:
+        str: e.g. "read 1200 files in 0.081 s, parse 1200 files in 0.412 s, match 1200 files in 0.05 s, validate 37
+            files in 0.009 s"
+    """
+    return ", ".join(stage + " " + str(timings[stage]["files"]) + " files in " +
+                     str(round(timings[stage]["seconds"], 3)) + " s" for stage in PIPELINE_STAGES if stage in timings)
+
+
+def pipeline_search(index, schema, script_dir, search_dict, workers = None, chunk_size = 64, timings = None):
+    """
+    Retains the files of an index that are valid against the schema and hold the search terms, like
+    schema_matching_search followed by f_search, but parses every file only once, see iter_pipeline. The persistent
+    result cache is not used, since files whose values do not match are never validated.
+
+    Args:
+        index (list): the index list holding all paths of JSON documents
+        schema (str): the file name of the schema
+        script_dir (str): The directory in which the tool is executed
+        search_dict (dict): flattened keys mapped to the terms to search for, see f_search
+        workers (int): amount of worker processes, see iter_pipeline
+        chunk_size (int): amount of documents handed to a worker at once
+        timings (dict): filled with the stage timings, see iter_pipeline
+
+    Returns:
+        list: the new index containing all retained entries
+    """
+    if timings is None:
+        timings = {}
+    return_index = []
+    start = time.perf_counter()
+    try:
+        for result in iter_pipeline(index, os.path.join(script_dir, "Schemas", schema), search_dict, workers,
+                                    chunk_size, timings):
+            if result["status"] == "valid":
+                return_index.append(result["path"])
+            elif result["status"] in ("decode_error", "json_error", "io_error"):
+                lg.error("[jsonsearch_lib.pipeline_search/ERROR]: Skipping " + result["path"] + " (" +
+                         result["status"] + "): " + result["message"])
+    except jsonschema.SchemaError as err:
+        lg.critical(err)
+        lg.critical("[jsonsearch_lib.pipeline_search/CRITICAL]: The schema is invalid!")
+        QMessageBox.critical(
+            QWidget(),
+            "[jsonsearch_lib.pipeline_search/CRITICAL]",
+            "[jsonsearch_lib.pipeline_search/CRITICAL]: The schema does not validate against its metaschema. " +
+            "Please check your selected schema!"
+        )
+    except (OSError, json.decoder.JSONDecodeError) as err:
+        lg.critical(err)
+        lg.critical("[jsonsearch_lib.pipeline_search/CRITICAL]: The schema is not accessible or not a JSON document!")
+    lg.info("[jsonsearch_lib.pipeline_search/INFO]: Retained " + str(len(return_index)) + " of " + str(len(index)) +
+            " files in " + str(round(time.perf_counter() - start, 3)) + " s: " + format_timings(timings) + ".")
+    return return_index
+
+
+def dict_flatten_dict(target_dict, flat_dict = None, consume = True):
     """
     a recursive structural flattener to simplify a search
 
     Args:
         target_dict (dict): the dictionary to be flattened
         flat_dict (dict): the flat dictionary to use. Might be filled already.
+        consume (bool): remove the flattened entries from target_dict. False leaves it intact, e.g. for validating it
+            afterwards.
 
     Returns:
         dict: the (partly) flattened dictionary
@@ -187,37 +958,116 @@ def dict_flatten_dict(target_dict, flat_dict = None):
                         alt_name = str_name + str(iterator)
                         iterator += 1
                     flat_dict[alt_name] = target_dict[str_name]
-                    del target_dict[str_name]
+                    if consume:
+                        del target_dict[str_name]
                 except KeyError as err:
                     flat_dict[alt_name] = target_dict[str_name]
-                    del target_dict[str_name]
+                    if consume:
+                        del target_dict[str_name]
                     continue
             else:
                 iterator = 0
                 if type(target_dict[str_name]) is dict:
-                    flat_dict = dict_flatten_dict(target_dict[str_name], flat_dict)
+                    flat_dict = dict_flatten_dict(target_dict[str_name], flat_dict, consume)
                 else:
                     for element in target_dict[str_name]:
                         if type(element) is not dict:
                             alt_name = str_name + str(iterator)
                             iterator += 1
                             flat_dict[alt_name] = element
-                del target_dict[str_name]
+                if consume:
+                    del target_dict[str_name]
     return flat_dict
 
 # INDEXER FUNCTION
-def start_index(script_dir, path, index_dict, show_boxes = True):
+def collect_json_files(path):
+    """
+    Collects the paths of all JSON documents below a directory with the parallel scanner, using the include and exclude
+    patterns and the maximum depth of the configuration.
+
+    Args:
+        path (str): the directory to be scanned
+
+    Returns:
+        list: the normalized paths of all JSON documents, sorted
+
+    Raises:
+        OSError: if the directory is not accessible
+    """
+    return sorted(dirscan_lib.scan_tree(path)["files"])
+
+
+def extract_values(path):
+    """
+    Reads a JSON document and extracts its flattened values for the index store, see dict_flatten_dict. Empty values
+    are omitted, like f_search does.
+
+    Args:
+        path (str): path to the JSON document
+
+    Returns:
+        dict: the flattened keys mapped to their values as strings. Empty, if the document is not valid JSON. None, if
+            the file cannot be read or decoded, so the store leaves it unextracted and searches open it instead.
+    """
+    try:
+        with open(path, encoding = "utf8") as json_file:
+            document = json.load(json_file)
+    except (OSError, UnicodeDecodeError) as err:
+        lg.warning("[jsonsearch_lib.extract_values/WARN]: " + path + " cannot be read, its values are not indexed: " +
+                   str(err))
+        return None
+    except json.decoder.JSONDecodeError as err:
+        lg.debug("[jsonsearch_lib.extract_values/DEBUG]: " + path + " is not valid JSON: " + str(err))
+        return {}
+    return {key: str(value) for key, value in dict_flatten_dict(document).items() if value != ""}
+
+
+def _iter_shard_scans(path, tracker = None):
     """
-    Creates or overwrites an index file for a given path, containing only paths to JSON documents.
+    Scans a directory tree shard by shard: first the files of the root, then every top level subdirectory.
+
+    Args:
+        path (str): the root of the scan
+        tracker (progress_lib.IndexProgress): takes note of the scan
+
+    Returns:
+        generator: tuples of the name of the shard and its scan result, see dirscan_lib.scan_tree
+
+    Raises:
+        OSError: if the root cannot be listed
+    """
+    root_scan, subdirs = dirscan_lib.list_root(path)
+    if tracker is not None:
+        tracker.shards_total = len(subdirs) + 1
+        tracker.scanned(root_scan)
+    yield "", root_scan
+    for subdir in subdirs:
+        scan = dirscan_lib.scan_tree(path, start = subdir, progress = None if tracker is None else tracker.listed)
+        if tracker is not None:
+            tracker.scanned(scan)
+        yield os.path.basename(subdir), scan
+
+
+def start_index(script_dir, path, index_dict, show_boxes = True, store = None, progress = None, cancel = None):
+    """
+    Creates or overwrites an index file for a given path, containing only paths to JSON documents. A cancelled run
+    keeps the shards indexed so far, the next check of the index completes it.
 
     Args:
         script_dir (str): The directory in which the tool is executed
         path (str): the path to be indexed
         index_dict (dict): the main index
         show_boxes (bool): a parameter to control whetever errors and warnings shall be displayed as message services.
+        store (indexstore_lib.IndexStore): the store to update. Defaults to the shared store of script_dir.
+        progress (function): called with the progress, see progress_lib.IndexProgress.snapshot
+        cancel (progress_lib.CancelToken): stops the indexing, if cancelled
+
+    Returns:
+        dict: the final progress. Its phase is "done", "cancelled" or "failed".
     """
     lg.info("==========\nINDEXER\n==========")
-    indexed_files = []
+    tracker = progress_lib.IndexProgress(path, progress, cancel)
+    cur_index = None
     try:
         if not os.path.exists(path):
             raise OSError
@@ -229,11 +1079,29 @@ def start_index(script_dir, path, index_dict, show_boxes = True):
                 "[jsonsearch_lib.start_index/INFO]",
                 "Start indexing. This can take a while..."
             )
-        for root, dirs, files in os.walk(path, topdown = False):
-            for name in files:
-                if regex.match(r"^.*\.json$", name):
-                    indexed_files.append(os.path.normpath(os.path.join(root, name)))
-        if len(indexed_files) == 0:
+        if store is None:
+            store = indexstore_lib.open_store(script_dir)
+        cur_index = store.root_id(path)
+        if cur_index is not None:
+            tracker.expected_files = sum(summary["files"] for summary in store.shards(cur_index).values())
+        file_count = 0
+        seen = set()
+        for shard, scan in _iter_shard_scans(path, tracker):  # one shard at a time, to bound the memory needed
+            seen.add(shard)
+            file_count += len(scan["files"])
+            if cur_index is None and scan["files"]:
+                cur_index = store.add_root(path)
+            if cur_index is not None:
+                values = {}
+                for file_path, stat in scan["files"].items():  # read before writing, to keep the transaction short
+                    values[file_path] = extract_values(file_path)
+                    tracker.indexed(stat[0])  # may cancel, leaving this shard as it was
+                store.replace_shard(cur_index, shard, scan, values.get)
+        if cur_index is not None:
+            for shard in set(store.shards(cur_index)) - seen:
+                store.remove_shard(cur_index, shard)
+            store.mark_rebuilt(cur_index)
+        if file_count == 0:
             lg.info("[jsonsearch_lib.start_index/INFO]: No JSON files found. Index is empty.")
             if show_boxes:
                 QMessageBox.information(
@@ -242,14 +1110,13 @@ def start_index(script_dir, path, index_dict, show_boxes = True):
                     "No JSON files found. Index is empty."
                 )
         else:
-            if path in index_dict:
-                cur_index = index_dict[path]
-            else:
-                index_dict["cur_index"] += 1
-                cur_index = index_dict["cur_index"]
-                index_dict[path] = cur_index
-                save_main_index(script_dir, index_dict)
-            save_index(script_dir, indexed_files, cur_index)
+            index_dict[path] = cur_index
+            index_dict["cur_index"] = max(index_dict["cur_index"], cur_index)
+            update_compatibility(script_dir, cur_index, store = store)
+            stats = store.stats(cur_index)
+            lg.info("[jsonsearch_lib.start_index/INFO]: " + str(stats["files"]) + " files indexed, key filters of " +
+                    str(stats["key_filter_bytes"]) + " bytes with an estimated false positive rate of " +
+                    str(round(stats["false_positive_rate"] * 100, 2)) + " %.")
         lg.info("jsonsearch_lib.start_index/INFO] Indexing finished.")
         if show_boxes:
             QMessageBox.information(
@@ -257,6 +1124,14 @@ def start_index(script_dir, path, index_dict, show_boxes = True):
                 "[jsonsearch_lib.start_index/INFO]",
                 "Indexing finished!"
             )
+        return tracker.finish("done")
+    except progress_lib.Cancelled:
+        lg.info("[jsonsearch_lib.start_index/INFO]: Indexing of " + path + " cancelled after " + str(tracker.files) +
+                " files.")
+        if cur_index is not None:  # the next check completes the shards indexed so far
+            index_dict[path] = cur_index
+            index_dict["cur_index"] = max(index_dict["cur_index"], cur_index)
+        return tracker.finish("cancelled")
     except OSError as err:
         message2 = "[jsonsearch_lib.start_index/ERROR] Directory (or one of its subdirectories) is not accessible!"
         lg.debug(err)
@@ -267,47 +1142,80 @@ def start_index(script_dir, path, index_dict, show_boxes = True):
                 "[jsonsearch_lib.start_index/ERROR]",
                 message2
             )
+        return tracker.finish("failed")
 
-def check_index(script_dir, path, index_dict):
+def check_index(script_dir, path, index_dict, store = None, raise_errors = False):
     """
-    checks a path for recent changes and updates the index accordingly
+    checks a path for recent changes and updates the index accordingly. Indexes holding stat records are refreshed
+    incrementally in the index store, migrated indexes without stat records are rebuilt once. The changed documents
+    are read before writing to the store, so concurrent checks only wait for each other while writing.
 
     Args:
         script_dir (str): The directory in which the tool is executed
         path (str): the path to be indexed
         index_dict (dict): the main index
+        store (indexstore_lib.IndexStore): the store to update. Defaults to the shared store of script_dir.
+        raise_errors (bool): whetever errors are passed on after logging them, instead of returning None
+
+    Returns:
+        dict: the delta of the refresh holding the lists "added", "removed" and "modified". None, if the index was
+            rebuilt or could not be checked.
     """
     try:
         if os.path.isdir(os.path.normpath(path)) and index_dict[path]:
-            index_nr = str(index_dict[path])
-            index_path = os.path.join(script_dir, "Indexes", "index" + index_nr + ".json")
-
-            last_change_json = os.path.getmtime(index_path)
-            last_change_dir = os.path.getmtime(path)
-            changed = False
-            if last_change_json < last_change_dir:
-                changed = True
-
-            index = json.load(open(index_path, encoding = "utf8"))
+            if store is None:
+                store = indexstore_lib.open_store(script_dir)
+            root_id = index_dict[path]
+            if store.needs_rebuild(root_id):
+                lg.warning("[jsonsearch_lib.check_index/WARN]: Index of " + path + " holds no stat records, " +
+                           "rebuilding it.")
+                start_index(script_dir, path, index_dict, False, store)
+                return None
             lg.info("[jsonsearch_lib.check_index/INFO]: Retrieved index of " + path + ".")
-            i = 0
-            while not changed:
-                i = i + 1
-                if i >= len(index["files"]):
-                    break
-                if not os.path.isfile(index["files"][i]):
-                    changed = True
-                    break
-            if changed:
-                message = "[jsonsearch_lib.check_index/WARN]: One or more indexed files are missing or changed."
-                lg.warning(message)
-                start_index(script_dir, path, index_dict, False)
+            manifest = store.shards(root_id)
+            start = time.perf_counter()
+            delta = {"added": [], "removed": [], "modified": []}
+            root_scan, subdirs = dirscan_lib.list_root(path)
+            shards = [("", None, root_scan)] + [(os.path.basename(subdir), subdir, None) for subdir in subdirs]
+            for shard, subdir, scan in shards:  # only one shard is loaded at a time
+                previous = store.load_shard(root_id, shard)
+                if subdir is None:
+                    shard_delta = {
+                        "added": sorted(p for p in scan["files"] if p not in previous["files"]),
+                        "removed": sorted(p for p in previous["files"] if p not in scan["files"]),
+                        "modified": sorted(p for p, signature in scan["files"].items()
+                                           if p in previous["files"] and tuple(previous["files"][p]) != signature)
+                    }
+                else:
+                    scan, shard_delta = dirscan_lib.refresh_tree(path, previous, start = subdir)
+                if shard_delta["added"] or shard_delta["removed"] or shard_delta["modified"] or \
+                        scan["dirs"] != previous["dirs"]:
+                    values = {p: extract_values(p) for p in shard_delta["added"] + shard_delta["modified"]}
+                    store.apply_delta(root_id, scan, shard_delta, values.get, shard)
+                for kind in delta:
+                    delta[kind].extend(shard_delta[kind])
+            for shard in set(manifest) - {shard for shard, _, _ in shards}:  # subdirectories that are gone
+                delta["removed"].extend(store.files(root_id, shard))
+                store.remove_shard(root_id, shard)
+            delta = {kind: sorted(paths) for kind, paths in delta.items()}
+            if delta["added"] or delta["removed"] or delta["modified"]:
+                lg.warning("[jsonsearch_lib.check_index/WARN]: " + str(len(delta["added"])) + " files added, " +
+                           str(len(delta["removed"])) + " removed and " + str(len(delta["modified"])) +
+                           " modified in " + path + ".")
             else:
-                message = "[jsonsearch_lib.check_index/INFO]: No changes of already existing files detected."
-                lg.info(message)
+                lg.info("[jsonsearch_lib.check_index/INFO]: No changes of already existing files detected.")
+            update_compatibility(script_dir, index_dict[path], store = store)  # also catches changed schemas
+            lg.debug("[jsonsearch_lib.check_index/DEBUG]: Refreshed in " + str(round(time.perf_counter() - start, 3)) +
+                     "s.")
+            return delta
     except OSError as err:
         lg.debug(err)
         lg.error("[jsonsearch_lib.check_index/ERROR] Index file missing oder inaccessible.")
+        if raise_errors:
+            raise
     except KeyError as err:
         lg.debug(err)
-        lg.error("[jsonsearch_lib.checkIndex/ERROR]: No valid index from list selected!")
\ No newline at end of file
+        lg.error("[jsonsearch_lib.checkIndex/ERROR]: No valid index from list selected!")
+        if raise_errors:
+            raise
+    return None
@@ -0,0 +1,416 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Live Index Maintenance
+# author: N. Plathe
+# ----------------------------------------
+"""
+Keeps the indexes up to date while pyJSON is running. On Linux, the indexed directories are watched with inotify and
+changed files are written to the index store shortly after they changed. Events are coalesced per file and applied
+once no further events arrived for a moment. Where inotify is not available (other systems, or too many directories
+for the watch limit), the indexed directories are polled with the incremental refresh of check_index instead. The same
+refresh is used whenever events may have been lost, e.g. on a queue overflow.
+"""
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import sqlite3
+import struct
+import sys
+import threading
+import time
+
+from Modules import dirscan_lib, indexstore_lib, jsonsearch_lib
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+lg = logging.getLogger(__name__)
+lg.setLevel("DEBUG")
+
+# inotify constants, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+    IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify(object):
+    """
+    A minimal inotify binding via ctypes.
+    """
+    def __init__(self):
+        """
+        Constructor
+
+        Raises:
+            OSError: if inotify is not available
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno = True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.paths = {}  # watch descriptor -> directory
+
+    def add_watch(self, path):
+        """
+        Watches a directory. Watching a directory twice keeps the first watch.
+
+        Args:
+            path (str): the directory
+
+        Returns:
+            int: the watch descriptor
+
+        Raises:
+            OSError: e.g. if the directory does not exist or the watch limit is reached (ENOSPC)
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self.paths[wd] = path
+        return wd
+
+    def remove_watch(self, wd):
+        """
+        Stops watching a directory.
+
+        Args:
+            wd (int): the watch descriptor
+        """
+        self.paths.pop(wd, None)
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout):
+        """
+        Waits for events.
+
+        Args:
+            timeout (float): the maximum time to wait in seconds
+
+        Returns:
+            list: tuples of the watched directory, the name within it and the event mask. The directory is None for a
+                queue overflow.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.append((None, "", mask))
+                continue
+            path = self.paths.get(wd)
+            if mask & IN_IGNORED:
+                self.paths.pop(wd, None)
+            if path is not None:
+                events.append((path, name, mask))
+        return events
+
+    def close(self):
+        """
+        Closes the inotify instance, removing all watches.
+        """
+        os.close(self.fd)
+        self.paths = {}
+
+
+class LiveIndexer(threading.Thread):
+    """
+    A thread keeping the indexes of a main index up to date, see the module description.
+    """
+    def __init__(self, script_dir, index_dict, debounce = 2.0, poll_interval = 60.0, use_inotify = True):
+        """
+        Constructor
+
+        Args:
+            script_dir (str): The directory in which the tool is executed
+            index_dict (dict): the main index, the thread keeps its own copy. See set_roots.
+            debounce (float): seconds without further events after which changes are applied. Changes are applied
+                at the latest after ten times this delay, even if events keep arriving.
+            poll_interval (float): seconds between two refreshes of directories that are not watched with inotify
+            use_inotify (bool): False polls all directories
+        """
+        super(LiveIndexer, self).__init__(name = "pyJSON-live-index", daemon = True)
+        self.script_dir = script_dir
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self._roots = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._inotify = None
+        self._watched = {}  # root -> {directory: watch descriptor}, for roots watched with inotify
+        self._polled = {}  # root -> time of the next refresh, for all other roots
+        self._pending = {}  # root -> {"paths": set of changed paths, "rescan": bool}
+        self._first_event = None
+        self._last_event = None
+        self.set_roots(index_dict)
+
+    def set_roots(self, index_dict):
+        """
+        Sets the directories to be watched, e.g. after a directory got indexed. Safe to call from any thread.
+
+        Args:
+            index_dict (dict): the main index
+        """
+        with self._lock:
+            self._roots = {path: root_id for path, root_id in index_dict.items() if path != "cur_index"}
+
+    def stop(self):
+        """
+        Stops the thread after the current batch of changes.
+        """
+        self._stop_event.set()
+
+    # watches
+
+    def _sync_roots(self, store):
+        """
+        Starts and stops watching roots according to set_roots.
+        """
+        with self._lock:
+            roots = dict(self._roots)
+        for root in [root for root in list(self._watched) + list(self._polled) if root not in roots]:
+            self._unwatch(root)
+        for root in roots:
+            if root not in self._watched and root not in self._polled:
+                self._watch(root, store)
+
+    def _watch(self, root, store):
+        """
+        Watches a root with inotify, or schedules it for polling if that is not possible.
+        """
+        if self._inotify is not None:
+            dirs = sorted(store.dirs(self._roots.get(root))) or [os.path.normpath(root)]
+            self._watched[root] = {}
+            try:
+                self._add_watches(root, dirs)
+                lg.info("[livewatch_lib.LiveIndexer/INFO]: Watching " + root + " (" + str(len(dirs)) +
+                        " directories).")
+                return
+            except OSError as err:
+                lg.warning("[livewatch_lib.LiveIndexer/WARN]: Cannot watch " + root + ", polling it instead: " +
+                           str(err))
+                self._unwatch(root)
+        self._polled[root] = time.monotonic() + self.poll_interval
+        lg.info("[livewatch_lib.LiveIndexer/INFO]: Polling " + root + " every " + str(self.poll_interval) + "s.")
+
+    def _add_watches(self, root, dirs):
+        """
+        Adds inotify watches for directories of a root. Directories that vanished in the meantime are skipped.
+
+        Raises:
+            OSError: if the watch limit is reached
+        """
+        watches = self._watched[root]
+        for dir_path in dirs:
+            if dir_path in watches:
+                continue
+            try:
+                watches[dir_path] = self._inotify.add_watch(dir_path)
+            except FileNotFoundError:
+                continue
+
+    def _unwatch(self, root):
+        """
+        Stops watching a root.
+        """
+        for wd in self._watched.pop(root, {}).values():
+            self._inotify.remove_watch(wd)
+        self._polled.pop(root, None)
+        self._pending.pop(root, None)
+
+    def _root_of(self, dir_path):
+        """
+        Finds the watched root a directory belongs to.
+
+        Returns:
+            str: the root. None, if the directory is not watched.
+        """
+        for root, watches in self._watched.items():
+            if dir_path in watches:
+                return root
+        return None
+
+    # events
+
+    def _mark(self, root, path = None):
+        """
+        Records a change of a root. Without a path, the whole root gets refreshed.
+        """
+        pending = self._pending.setdefault(root, {"paths": set(), "rescan": False})
+        if path is None:
+            pending["rescan"] = True
+        else:
+            pending["paths"].add(path)
+        now = time.monotonic()
+        if self._first_event is None:
+            self._first_event = now
+        self._last_event = now
+
+    def _handle_events(self, events):
+        """
+        Coalesces inotify events into the pending changes. Directories that were created, removed or moved are
+        refreshed as a whole, like all roots after a queue overflow.
+        """
+        for dir_path, name, mask in events:
+            if dir_path is None:
+                lg.warning("[livewatch_lib.LiveIndexer/WARN]: Event queue overflow, refreshing all watched roots.")
+                for root in self._watched:
+                    self._mark(root)
+                continue
+            root = self._root_of(dir_path)
+            if root is None:
+                continue
+            if mask & IN_IGNORED:  # the directory is gone, it gets watched again if it reappears
+                self._watched[root].pop(dir_path, None)
+            if mask & (IN_ISDIR | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                self._mark(root)
+            elif name:
+                self._mark(root, os.path.join(dir_path, name))
+
+    def _due(self):
+        """
+        Checks whetever the pending changes are to be applied.
+        """
+        if not self._pending:
+            return False
+        now = time.monotonic()
+        return now - self._last_event >= self.debounce or now - self._first_event >= self.debounce * 10
+
+    def _apply(self, store):
+        """
+        Applies the pending changes. Changes of a root that could not be written (e.g. because the store is locked by
+        another writer) stay pending.
+        """
+        for root in list(self._pending):
+            pending = self._pending[root]
+            root_id = self._roots.get(root)
+            if root_id is None:
+                self._pending.pop(root)
+                continue
+            try:
+                if pending["rescan"]:
+                    jsonsearch_lib.check_index(self.script_dir, root, {"cur_index": root_id, root: root_id}, store)
+                    if root in self._watched:
+                        self._add_watches(root, sorted(store.dirs(root_id)))
+                else:
+                    self._apply_paths(store, root, root_id, pending["paths"])
+            except sqlite3.OperationalError as err:
+                lg.debug(err)
+                lg.warning("[livewatch_lib.LiveIndexer/WARN]: Index store busy, retrying changes of " + root + ".")
+                continue
+            except OSError as err:  # e.g. the watch limit got reached by new directories
+                lg.warning("[livewatch_lib.LiveIndexer/WARN]: Cannot watch all directories of " + root +
+                           ", polling it instead: " + str(err))
+                self._unwatch(root)
+                self._polled[root] = time.monotonic() + self.poll_interval
+            self._pending.pop(root, None)
+        self._first_event = None if not self._pending else time.monotonic()
+        self._last_event = self._first_event
+
+    def _apply_paths(self, store, root, root_id, paths):
+        """
+        Writes the current state of changed files of a root to the store.
+
+        Args:
+            store (indexstore_lib.IndexStore): the store
+            root (str): the root
+            root_id (int): the number of the root
+            paths (set): the changed files
+        """
+        file_stats = {}
+        removed = []
+        dirs = {}
+        for path in sorted(paths):
+            try:
+                stat = os.stat(path)
+                is_file = os.path.isfile(path)
+            except OSError:
+                stat = None
+                is_file = False
+            if is_file and dirscan_lib.is_included(root, path):
+                file_stats[path] = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            else:
+                removed.append(path)  # removing a file that was never indexed is a no-op
+            dir_path = os.path.dirname(path)
+            if dir_path not in dirs:
+                try:
+                    dirs[dir_path] = os.stat(dir_path).st_mtime_ns
+                except OSError:
+                    pass
+        store.apply_changes(root_id, file_stats, removed, dirs, jsonsearch_lib.extract_values)
+        lg.info("[livewatch_lib.LiveIndexer/INFO]: Updated " + str(len(file_stats)) + " and removed up to " +
+                str(len(removed)) + " files in the index of " + root + ".")
+
+    def _poll(self):
+        """
+        Marks polled roots whose refresh is due.
+        """
+        now = time.monotonic()
+        for root, due in list(self._polled.items()):
+            if now >= due:
+                self._mark(root)
+                self._polled[root] = now + self.poll_interval
+
+    def run(self):
+        """
+        Watches the roots until stop is called.
+        """
+        store = indexstore_lib.IndexStore(self.script_dir)
+        if self.use_inotify:
+            try:
+                self._inotify = Inotify()
+            except (OSError, AttributeError) as err:  # AttributeError: a libc without inotify
+                lg.info("[livewatch_lib.LiveIndexer/INFO]: inotify not available, polling instead: " + str(err))
+        try:
+            while not self._stop_event.is_set():
+                self._sync_roots(store)
+                timeout = min(0.5, self.debounce)
+                if self._inotify is not None:
+                    self._handle_events(self._inotify.read_events(timeout))
+                else:
+                    self._stop_event.wait(timeout)
+                self._poll()
+                if self._due():
+                    self._apply(store)
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+            store.close()
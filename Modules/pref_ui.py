@@ -44,12 +44,16 @@ class ui_preferences(QDialog, Ui_PrefDiag):
                            cls = json.JSONDecoder)
         self.checkBox_verboseLog.setChecked(self.config["verbose_logging"])
         self.checkBox_ShowErrors.setChecked(self.config["show_error_representation"])
+        self.spinBox_watchdogInterval.setValue(self.config.get("watchdog_interval", 30) or 0)
+        self.checkBox_liveIndex.setChecked(self.config.get("live_index", False))
 
         # set signals
         self.pushButton_save.clicked.connect(self.set_prefs)
         self.pushButton_cancel.clicked.connect(self.cancel)
         self.checkBox_verboseLog.stateChanged.connect(self.change_verbose_Log)
         self.checkBox_ShowErrors.stateChanged.connect(self.change_error_represenation)
+        self.spinBox_watchdogInterval.valueChanged.connect(self.change_watchdog_interval)
+        self.checkBox_liveIndex.stateChanged.connect(self.change_live_index)
 
     def change_verbose_Log(self):
         self.config["verbose_logging"] = self.checkBox_verboseLog.isChecked()
@@ -57,6 +61,12 @@ class ui_preferences(QDialog, Ui_PrefDiag):
     def change_error_represenation(self):
         self.config["show_error_representation"] = self.checkBox_ShowErrors.isChecked()
 
+    def change_watchdog_interval(self):
+        self.config["watchdog_interval"] = self.spinBox_watchdogInterval.value()
+
+    def change_live_index(self):
+        self.config["live_index"] = self.checkBox_liveIndex.isChecked()
+
     def set_prefs(self):
         save_config(self.script_dir, self.config)
         self.close()
@@ -0,0 +1,232 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Progress and Cancellation
+# author: N. Plathe
+# ----------------------------------------
+"""
+Reports the progress of long running operations like indexing (files, bytes, elapsed time, throughput and the estimated
+time left) and lets the caller cancel them. Cancellation is cooperative: the operation checks its CancelToken whenever
+it reports progress and stops with Cancelled.
+"""
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+import logging
+import sys
+import threading
+import time
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+lg = logging.getLogger(__name__)
+lg.setLevel("DEBUG")
+
+
+class Cancelled(Exception):
+    """
+    Raised inside an operation whose CancelToken was cancelled.
+    """
+
+
+class CancelToken(object):
+    """
+    A flag shared between an operation and the code that may cancel it, e.g. from another thread.
+    """
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._event = threading.Event()
+
+    def cancel(self):
+        """
+        Requests the operation to stop at its next check.
+        """
+        self._event.set()
+
+    def cancelled(self):
+        """
+        Returns:
+            bool: whetever cancel was called
+        """
+        return self._event.is_set()
+
+    def check(self):
+        """
+        Raises:
+            Cancelled: if cancel was called
+        """
+        if self._event.is_set():
+            raise Cancelled()
+
+
+class IndexProgress(object):
+    """
+    Tracks the progress of indexing a directory. Directories are scanned and their files indexed shard by shard, see
+    jsonsearch_lib.start_index.
+    """
+    def __init__(self, path, callback = None, cancel = None, interval = 0.5):
+        """
+        Constructor
+
+        Args:
+            path (str): the indexed directory
+            callback (function): called with a snapshot (see snapshot) at most every interval seconds and at the end
+            cancel (CancelToken): checked on every update
+            interval (float): the minimum time between two calls of the callback in seconds
+        """
+        self.path = path
+        self.callback = callback
+        self.cancel = cancel
+        self.interval = interval
+        self.phase = "scanning"
+        self.found = 0
+        self.files = 0
+        self.bytes = 0
+        self.expected_files = None
+        self.shards_total = None
+        self.shards_scanned = 0
+        self._found_before = 0
+        self._started = time.perf_counter()
+        self._last_report = None
+
+    def snapshot(self):
+        """
+        Summarizes the progress.
+
+        Returns:
+            dict: the "path", the "phase" ("scanning", "indexing", "done", "cancelled" or "failed"), the amount of files
+                "found" and of indexed "files", their "bytes", the "elapsed" seconds, "files_per_second" and the "eta"
+                in seconds. The eta is None while it cannot be estimated yet.
+        """
+        elapsed = time.perf_counter() - self._started
+        rate = self.files / elapsed if elapsed > 0 else 0.0
+        if self.expected_files is not None:  # known from an earlier index of the directory
+            remaining = max(0, self.expected_files - self.files, self.found - self.files)
+        elif self.shards_total is not None and self.shards_scanned:
+            remaining = self.found - self.files + self.found / self.shards_scanned * (self.shards_total -
+                                                                                       self.shards_scanned)
+        else:
+            remaining = None
+        eta = remaining / rate if remaining is not None and rate > 0 else None
+        if self.phase == "done":
+            eta = 0.0
+        return {"path": self.path, "phase": self.phase, "found": self.found, "files": self.files, "bytes": self.bytes,
+                "elapsed": elapsed, "files_per_second": rate, "eta": eta}
+
+    def report(self, force = False):
+        """
+        Checks for cancellation and calls the callback, if interval passed since its last call.
+
+        Args:
+            force (bool): call the callback regardless of the interval
+
+        Raises:
+            Cancelled: if the operation was cancelled
+        """
+        if self.cancel is not None:
+            self.cancel.check()
+        now = time.perf_counter()
+        if self.callback is not None and (force or self._last_report is None or
+                                          now - self._last_report >= self.interval):
+            self._last_report = now
+            self.callback(self.snapshot())
+
+    def listed(self, scan):
+        """
+        Takes note of the scan of a shard growing, see dirscan_lib.scan_tree.
+
+        Args:
+            scan (dict): the scan result so far
+        """
+        self.phase = "scanning"
+        self.found = self._found_before + len(scan["files"])
+        self.report()
+
+    def scanned(self, scan):
+        """
+        Takes note of a shard being scanned completely, before its files get indexed.
+
+        Args:
+            scan (dict): the scan result of the shard
+        """
+        self.found = self._found_before + len(scan["files"])
+        self._found_before = self.found
+        self.shards_scanned += 1
+        self.phase = "indexing"
+        self.report()
+
+    def indexed(self, size):
+        """
+        Takes note of a file being indexed.
+
+        Args:
+            size (int): the size of the file in bytes
+        """
+        self.files += 1
+        self.bytes += size or 0
+        self.report()
+
+    def finish(self, phase):
+        """
+        Reports the final state, without checking for cancellation.
+
+        Args:
+            phase (str): "done", "cancelled" or "failed"
+
+        Returns:
+            dict: the final snapshot
+        """
+        self.phase = phase
+        snapshot = self.snapshot()
+        if self.callback is not None:
+            self.callback(snapshot)
+        return snapshot
+
+
+def format_progress(snapshot):
+    """
+    Describes a progress snapshot in one line.
+
+    Args:
+        snapshot (dict): see IndexProgress.snapshot
+
+    Returns:
+        str: e.g. "Indexing /data: 1200 of 3400 files, 35.2 MB, 412.5 files/s, 5 s left"
+    """
+    line = snapshot["phase"].capitalize() + " " + snapshot["path"] + ": " + str(snapshot["files"])
+    if snapshot["found"] > snapshot["files"]:
+        line += " of " + str(snapshot["found"])
+    line += " files, " + str(round(snapshot["bytes"] / 1000000, 1)) + " MB, " + \
+        str(round(snapshot["files_per_second"], 1)) + " files/s"
+    if snapshot["phase"] in ("scanning", "indexing"):
+        line += ", " + ("time left unknown" if snapshot["eta"] is None else str(round(snapshot["eta"])) + " s left")
+    else:
+        line += ", " + str(round(snapshot["elapsed"], 1)) + " s"
+    return line
+
+
+def print_progress(interval = 2.0, out = None):
+    """
+    Creates a progress callback printing a line at most every interval seconds, e.g. for the command-line interface.
+
+    Args:
+        interval (float): the minimum time between two lines in seconds
+        out (file): the stream to print to. Defaults to stdout.
+
+    Returns:
+        function: the callback, taking a snapshot
+    """
+    last = [None]
+
+    def callback(snapshot):
+        now = time.perf_counter()
+        if snapshot["phase"] in ("scanning", "indexing") and last[0] is not None and now - last[0] < interval:
+            return
+        last[0] = now
+        print(format_progress(snapshot), file = out or sys.stdout, flush = True)
+
+    return callback
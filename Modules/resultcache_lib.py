@@ -0,0 +1,158 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Validation Result Cache
+# author: N. Plathe
+# ----------------------------------------
+"""
+A persistent cache for validation results. Outcomes are stored per JSON document and schema in a SQLite database next
+to the indexes and are reused as long as neither the document (size, mtime and inode) nor the schema (content hash)
+changed.
+"""
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from Modules.schemaregistry_lib import schema_registry
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+lg = logging.getLogger(__name__)
+lg.setLevel("DEBUG")
+
+# results that depend on the content of a file - IO errors are never cached
+CACHEABLE_STATES = ("valid", "invalid", "decode_error", "json_error")
+
+
+def file_signature(path):
+    """
+    Builds the signature of a file used to detect changes without reading it.
+
+    Args:
+        path (str): path to the file
+
+    Returns:
+        tuple: size, mtime in nanoseconds and inode of the file. None, if the file is not accessible.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def schema_hash(schema_path):
+    """
+    Hashes the content of a schema file together with the stored schemas it references, see
+    schemaregistry_lib.SchemaRegistry.dependencies. Changing a referenced schema changes the hash as well.
+
+    Args:
+        schema_path (str): path to the schema
+
+    Returns:
+        str: the hex digest of the SHA-256 hash. For a schema without references, the hash of the file content.
+
+    Raises:
+        OSError: if the schema or a referenced schema is not accessible
+    """
+    with open(schema_path, "rb") as schema_file:
+        content = schema_file.read()
+    digest = hashlib.sha256(content)
+    try:
+        dependencies = schema_registry.dependencies(json.loads(content))
+    except ValueError:  # not a JSON document, reported when the schema gets loaded
+        dependencies = []
+    for name in dependencies:
+        with open(os.path.join(schema_registry.schema_dir, name), "rb") as dependency:
+            digest.update(b"\0" + name.encode("utf8") + b"\0" + dependency.read())
+    return digest.hexdigest()
+
+
+class ValidationResultCache(object):
+    """
+    The ValidationResultCache stores validation outcomes in Indexes/pyJSON_validation_cache.sqlite. There is one row per
+    document and schema name, so replacing a schema overwrites its rows on the next run. Use invalidate_schema to drop
+    them right away.
+    """
+    def __init__(self, script_dir):
+        """
+        Constructor. Opens or creates the database.
+
+        Args:
+            script_dir (str): The directory in which the tool is executed
+        """
+        os.makedirs(os.path.join(script_dir, "Indexes"), exist_ok = True)
+        self.db_path = os.path.join(script_dir, "Indexes", "pyJSON_validation_cache.sqlite")
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(self.db_path, check_same_thread = False)
+        self._con.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "path TEXT NOT NULL, schema_name TEXT NOT NULL, schema_hash TEXT NOT NULL, "
+            "size INTEGER, mtime_ns INTEGER, inode INTEGER, status TEXT NOT NULL, message TEXT, "
+            "PRIMARY KEY (path, schema_name))"
+        )
+        self._con.commit()
+
+    def lookup(self, schema_name, digest):
+        """
+        Fetches all results stored for a schema, as long as they were computed with the same schema content.
+
+        Args:
+            schema_name (str): the file name of the schema
+            digest (str): the current content hash of the schema, see schema_hash
+
+        Returns:
+            dict: path -> (signature, status, message)
+        """
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT path, size, mtime_ns, inode, status, message FROM results "
+                "WHERE schema_name = ? AND schema_hash = ?", (schema_name, digest)
+            ).fetchall()
+        return {row[0]: ((row[1], row[2], row[3]), row[4], row[5]) for row in rows}
+
+    def store(self, schema_name, digest, entries):
+        """
+        Stores validation results. Results with a status not depending on the file content are skipped.
+
+        Args:
+            schema_name (str): the file name of the schema
+            digest (str): the content hash of the schema the results were computed with
+            entries (iterable): tuples of path, signature (see file_signature), status and message
+        """
+        rows = [(path, schema_name, digest, signature[0], signature[1], signature[2], status, message)
+                for path, signature, status, message in entries
+                if signature is not None and status in CACHEABLE_STATES]
+        if not rows:
+            return
+        with self._lock:
+            self._con.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._con.commit()
+
+    def invalidate_schema(self, schema_name):
+        """
+        Drops all results of a schema, e.g. because it got replaced in the schema storage.
+
+        Args:
+            schema_name (str): the file name of the schema
+        """
+        with self._lock:
+            self._con.execute("DELETE FROM results WHERE schema_name = ?", (schema_name,))
+            self._con.commit()
+        lg.info("[resultcache_lib.ValidationResultCache.invalidate_schema/INFO]: Dropped cached results of " +
+                schema_name + ".")
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._con.close()
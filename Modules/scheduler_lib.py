@@ -0,0 +1,178 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Refresh Scheduler
+# author: N. Plathe
+# ----------------------------------------
+"""
+Runs the refreshes of many indexed directories concurrently. The amount of refreshes running at once is limited in
+total and per storage device, so a single disk is not flooded with requests while directories on other devices (e.g.
+network shares) keep progressing. A slow or failing directory only occupies its own slot.
+"""
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+lg = logging.getLogger(__name__)
+lg.setLevel("DEBUG")
+
+
+def _device(path):
+    """
+    Determines the device a directory is stored on.
+
+    Args:
+        path (str): the directory
+
+    Returns:
+        int: the device number, see os.stat
+    """
+    return os.stat(path).st_dev
+
+
+def _lookup_device(path):
+    """
+    Determines the device of a directory on a daemon thread of its own. A lookup hanging on an unresponsive mount
+    neither occupies a worker of the refreshes nor keeps the interpreter from exiting.
+
+    Args:
+        path (str): the directory
+
+    Returns:
+        concurrent.futures.Future: holds the device number, or the OSError raised by os.stat
+    """
+    future = Future()
+
+    def lookup():
+        try:
+            future.set_result(_device(path))
+        except OSError as err:
+            future.set_exception(err)
+
+    threading.Thread(target = lookup, name = "device lookup " + path, daemon = True).start()
+    return future
+
+
+def _timed(refresh, path):
+    """
+    Runs a refresh and measures it.
+
+    Returns:
+        dict: the "seconds" taken, the "error" raised (None on success) and the "result" of the refresh
+    """
+    start = time.perf_counter()
+    try:
+        result = refresh(path)
+        error = None
+    except Exception as err:  # reported per directory, so one broken directory does not stop the others
+        result = None
+        error = type(err).__name__ + ": " + str(err)
+    return {"seconds": time.perf_counter() - start, "error": error, "result": result}
+
+
+def refresh_all(paths, refresh, workers = 4, per_device = 2, progress = None, stat_timeout = 10.0, timeout = 600.0):
+    """
+    Refreshes directories concurrently. The device of every directory is determined on a thread of its own (see
+    _lookup_device), so an unresponsive mount does not hold up the others. Directories whose device cannot be
+    determined within stat_timeout seconds count as failed, as do refreshes not finished within timeout seconds. Those
+    are not waited for any longer, their worker stays occupied until the end of the run.
+
+    Args:
+        paths (list): the directories to refresh
+        refresh (function): takes a directory and refreshes it. Called on a worker thread.
+        workers (int): the maximum amount of refreshes running at once
+        per_device (int): the maximum amount of refreshes running at once on the same device
+        progress (function): called on the calling thread with the amount of finished refreshes, the total amount and
+            the directory started next. Exceptions raised by it cancel the refreshes not started yet and are passed on,
+            once the running ones are done or out of time.
+        stat_timeout (float): the time in seconds the devices of all directories have to be determined in. None waits
+            as long as it takes.
+        timeout (float): the time in seconds a single refresh may take. None waits as long as it takes.
+
+    Returns:
+        dict: the directories mapped to "seconds", "error" and "result", see _timed. Directories that could not be
+            accessed hold the error of os.stat, those that did not respond in time a TimeoutError. So do directories
+            that could not be started, because all workers were held by refreshes that timed out.
+    """
+    workers = max(1, workers or 1)
+    per_device = max(1, per_device or 1)
+    report = {}
+    queued = {}  # device -> directories waiting for a slot
+    running = {}  # device -> amount of running refreshes
+    futures = {}
+    deadlines = {}  # future -> the time it has to be done by
+    abandoned = 0  # workers held by refreshes that timed out
+    pool = ThreadPoolExecutor(max_workers = workers)
+    try:
+        for path in paths:
+            future = _lookup_device(path)
+            futures[future] = ("stat", path, None)
+            if stat_timeout is not None:
+                deadlines[future] = time.perf_counter() + stat_timeout
+        while futures:
+            wait_for = None
+            if deadlines:
+                wait_for = max(0.0, min(deadlines.values()) - time.perf_counter())
+            done, _ = wait(futures, timeout = wait_for, return_when = FIRST_COMPLETED)
+            now = time.perf_counter()
+            for future in [future for future, deadline in deadlines.items() if future not in done and deadline <= now]:
+                kind, path, device = futures.pop(future)
+                del deadlines[future]
+                if kind == "stat":  # the lookup thread is left behind
+                    report[path] = {"seconds": stat_timeout, "result": None,
+                                    "error": "TimeoutError: the directory did not respond within " +
+                                             str(stat_timeout) + " s"}
+                else:
+                    report[path] = {"seconds": timeout, "result": None,
+                                    "error": "TimeoutError: the refresh did not finish within " + str(timeout) + " s"}
+                    running[device] -= 1
+                    abandoned += 1
+            for future in done:
+                kind, path, device = futures.pop(future)
+                deadlines.pop(future, None)
+                if kind == "stat":
+                    try:
+                        device = future.result()
+                    except OSError as err:
+                        report[path] = {"seconds": 0.0, "error": type(err).__name__ + ": " + str(err), "result": None}
+                        continue
+                    queued.setdefault(device, []).append(path)
+                else:
+                    report[path] = future.result()
+                    running[device] -= 1
+            busy = sum(running.values()) + abandoned
+            for device in sorted(queued, key = lambda dev: running.get(dev, 0)):  # idle devices first
+                while queued[device] and busy < workers and running.get(device, 0) < per_device:
+                    path = queued[device].pop(0)
+                    if progress is not None:
+                        progress(len(report), len(paths), path)
+                    future = pool.submit(_timed, refresh, path)
+                    futures[future] = ("refresh", path, device)
+                    if timeout is not None:
+                        deadlines[future] = time.perf_counter() + timeout
+                    running[device] = running.get(device, 0) + 1
+                    busy += 1
+        for path in [path for waiting in queued.values() for path in waiting]:
+            report[path] = {"seconds": 0.0, "result": None,
+                            "error": "TimeoutError: not started, all workers are held by refreshes that timed out"}
+    except BaseException:  # the running refreshes are finished first, as long as they keep their time limit
+        running_futures = [future for future, (kind, _, _) in futures.items() if kind == "refresh"]
+        wait_for = None
+        if timeout is not None and running_futures:
+            wait_for = max(0.0, max(deadlines[future] for future in running_futures) - time.perf_counter())
+        wait(running_futures, timeout = wait_for)
+        raise
+    finally:
+        pool.shutdown(wait = False, cancel_futures = True)  # refreshes that timed out are not waited for
+    if progress is not None:
+        progress(len(paths), len(paths), "")
+    return report
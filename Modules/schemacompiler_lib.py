@@ -0,0 +1,485 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Schema Compiler
+# author: N. Plathe
+# ----------------------------------------
+"""
+Compiles JSON schemas into straight-line Python validation functions. Only a well known subset of keywords is
+supported - schemas using anything else are not compiled and have to be validated with the jsonschema package instead.
+Generated functions can be stored as sidecar modules, so a schema only gets compiled again if its content changes.
+"""
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+lg = logging.getLogger(__name__)
+lg.setLevel("DEBUG")
+
+# bump this whenever the generated code changes, so outdated sidecar modules get replaced
+COMPILER_VERSION = 1
+
+# keywords without influence on the validation result
+ANNOTATIONS = {"$schema", "$id", "$comment", "$defs", "definitions", "title", "description", "default", "examples",
+               "format", "readOnly", "writeOnly", "deprecated", "contentMediaType", "contentEncoding"}
+
+# keywords the compiler generates code for
+SUPPORTED = {"type", "enum", "const", "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum", "minLength",
+             "maxLength", "pattern", "items", "minItems", "maxItems", "uniqueItems", "properties", "required",
+             "additionalProperties", "minProperties", "maxProperties", "allOf", "anyOf", "oneOf", "not"}
+
+# drafts sharing the semantics of the supported keywords
+SUPPORTED_DRAFTS = ("draft/2020-12", "draft/2019-09", "draft-07", "draft-06")
+
+TYPE_CHECKS = {
+    "null": "data is None",
+    "boolean": "isinstance(data, bool)",
+    "integer": "((isinstance(data, int) and not isinstance(data, bool)) or "
+               "(isinstance(data, float) and data.is_integer()))",
+    "number": "(isinstance(data, (int, float)) and not isinstance(data, bool))",
+    "string": "isinstance(data, str)",
+    "array": "isinstance(data, list)",
+    "object": "isinstance(data, dict)"
+}
+
+
+def json_equal(one, two):
+    """
+    Compares two JSON values the way JSON schema does - booleans never equal numbers, 1 equals 1.0.
+
+    Args:
+        one (object): the first value
+        two (object): the second value
+
+    Returns:
+        bool: whetever both values are equal
+    """
+    if isinstance(one, bool) or isinstance(two, bool):
+        return isinstance(one, bool) and isinstance(two, bool) and one == two
+    if isinstance(one, str) or isinstance(two, str):
+        return one == two
+    if isinstance(one, list) and isinstance(two, list):
+        return len(one) == len(two) and all(json_equal(i, j) for i, j in zip(one, two))
+    if isinstance(one, dict) and isinstance(two, dict):
+        return one.keys() == two.keys() and all(json_equal(one[key], two[key]) for key in one)
+    return one == two
+
+
+def json_in_enum(data, enum):
+    """
+    Checks whetever a value is part of an enum. Mirrors jsonschema, which only keeps booleans apart from 0 and 1 and
+    uses plain Python equality otherwise.
+
+    Args:
+        data (object): the value
+        enum (list): the values of the enum
+
+    Returns:
+        bool: whetever the value is part of the enum
+    """
+    if data == 0 or data == 1:
+        return any(json_equal(data, item) if not isinstance(item, (list, dict)) else False for item in enum)
+    return data in enum
+
+
+def json_unique(data):
+    """
+    Checks the items of an array for uniqueness with the semantics of json_equal.
+
+    Args:
+        data (list): the array
+
+    Returns:
+        bool: True, if no two items are equal
+    """
+    seen = set()
+    complex_items = []
+    for item in data:
+        if isinstance(item, bool):
+            key = ("b", item)
+        elif isinstance(item, (int, float)):
+            key = ("n", item)
+        elif isinstance(item, str) or item is None:
+            key = ("s", item)
+        else:
+            if any(json_equal(item, other) for other in complex_items):
+                return False
+            complex_items.append(item)
+            continue
+        if key in seen:
+            return False
+        seen.add(key)
+    return True
+
+
+def schema_digest(schema):
+    """
+    Hashes a deserialized schema independent of its formatting.
+
+    Args:
+        schema (dict): the JSON schema
+
+    Returns:
+        str: the hex digest of the SHA-256 hash
+    """
+    return hashlib.sha256(json.dumps(schema, sort_keys = True).encode("utf8")).hexdigest()
+
+
+class _SchemaCompiler(object):
+    """
+    Generates one function per subschema. Each function returns None for a valid instance or a tuple holding the
+    error message and the schema path of the failed keyword.
+    """
+    def __init__(self):
+        self.constants = []
+        self.functions = []
+
+    def constant(self, value, literal = None):
+        """
+        Registers a module level constant of the generated code.
+
+        Args:
+            value (object): the value of the constant
+            literal (str): the Python expression for the value. Defaults to its representation.
+
+        Returns:
+            str: the name of the constant
+        """
+        name = "_c" + str(len(self.constants))
+        self.constants.append((name, repr(value) if literal is None else literal))
+        return name
+
+    def error(self, message, data_expr, schema_path, keyword):
+        """
+        Builds the return statement for a failed keyword.
+
+        Args:
+            message (str): a %-format string taking a single value
+            data_expr (str): the expression for the value of the message
+            schema_path (list): the schema path of the subschema
+            keyword (str): the failed keyword
+
+        Returns:
+            str: the return statement
+        """
+        path = self.constant(tuple(schema_path + [keyword]))
+        return "return (" + repr(message) + " % (" + data_expr + ",), list(" + path + "))"
+
+    def compile(self, schema, schema_path):
+        """
+        Compiles a subschema into a function of the generated module.
+
+        Args:
+            schema (dict or bool): the subschema
+            schema_path (list): the keywords and names leading to the subschema
+
+        Returns:
+            str: the name of the generated function
+        """
+        name = "_v" + str(len(self.functions))
+        self.functions.append(None)  # reserve the slot, nested subschemas are compiled in between
+        body = []
+        if schema is True or schema == {}:
+            body.append("return None")
+        elif schema is False:
+            body.append(self.error("False schema does not allow %r", "data", schema_path[:-1], schema_path[-1])
+                        if schema_path else "return ('False schema does not allow %r' % (data,), [])")
+        else:
+            for keyword, value in schema.items():
+                body.extend(self.keyword(keyword, value, schema, schema_path))
+            body.append("return None")
+        self.functions[int(name[2:])] = "def " + name + "(data):\n" + "\n".join("    " + line for line in body) + "\n"
+        return name
+
+    def subschema(self, value, schema_path, call_expr):
+        """
+        Builds the lines validating a value against a nested subschema.
+
+        Args:
+            value (dict or bool): the nested subschema
+            schema_path (list): the schema path of the nested subschema
+            call_expr (str): the expression of the value to be validated
+
+        Returns:
+            list: the generated lines
+        """
+        function = self.compile(value, schema_path)
+        return ["_e = " + function + "(" + call_expr + ")",
+                "if _e is not None:",
+                "    return _e"]
+
+    def keyword(self, keyword, value, schema, schema_path):
+        """
+        Generates the lines for a single keyword of a subschema.
+
+        Args:
+            keyword (str): the keyword
+            value (object): the value of the keyword
+            schema (dict): the subschema holding the keyword
+            schema_path (list): the schema path of the subschema
+
+        Returns:
+            list: the generated lines
+        """
+        lines = []
+        match keyword:
+            case "type":
+                types = [value] if isinstance(value, str) else value
+                check = " or ".join(TYPE_CHECKS[t] for t in types)
+                message = "%r is not of type " + ", ".join(repr(t) for t in types).replace("%", "%%")
+                lines += ["if not (" + check + "):", "    " + self.error(message, "data", schema_path, keyword)]
+            case "enum":
+                enum = self.constant(value)
+                lines += ["if not json_in_enum(data, " + enum + "):",
+                          "    " + self.error("%r is not one of " + repr(value).replace("%", "%%"), "data",
+                                              schema_path, keyword)]
+            case "const":
+                const = self.constant(value)
+                lines += ["if not json_equal(data, " + const + "):",
+                          "    " + self.error("%r was expected", const, schema_path, keyword)]
+            case "minimum" | "maximum" | "exclusiveMinimum" | "exclusiveMaximum":
+                operator, message = {
+                    "minimum": ("<", "%r is less than the minimum of "),
+                    "maximum": (">", "%r is greater than the maximum of "),
+                    "exclusiveMinimum": ("<=", "%r is less than or equal to the minimum of "),
+                    "exclusiveMaximum": (">=", "%r is greater than or equal to the maximum of ")
+                }[keyword]
+                lines += ["if " + TYPE_CHECKS["number"] + " and data " + operator + " " + repr(value) + ":",
+                          "    " + self.error(message + repr(value), "data", schema_path, keyword)]
+            case "minLength" | "maxLength" | "minItems" | "maxItems" | "minProperties" | "maxProperties":
+                check = {"L": "isinstance(data, str)", "I": "isinstance(data, list)",
+                         "P": "isinstance(data, dict)"}[keyword[3]]
+                operator, message = ("<", "%r is too short") if keyword.startswith("min") else (">", "%r is too long")
+                if keyword.endswith("Properties"):
+                    message = "%r does not have enough properties" if keyword.startswith("min") \
+                        else "%r has too many properties"
+                lines += ["if " + check + " and len(data) " + operator + " " + repr(value) + ":",
+                          "    " + self.error(message, "data", schema_path, keyword)]
+            case "pattern":
+                pattern = self.constant(value, "re.compile(" + repr(value) + ")")
+                lines += ["if isinstance(data, str) and " + pattern + ".search(data) is None:",
+                          "    " + self.error("%r does not match " + repr(value).replace("%", "%%"), "data",
+                                              schema_path, keyword)]
+            case "uniqueItems":
+                if value:
+                    lines += ["if isinstance(data, list) and not json_unique(data):",
+                              "    " + self.error("%r has non-unique elements", "data", schema_path, keyword)]
+            case "items":
+                lines += ["if isinstance(data, list):", "    for _i in data:"]
+                lines += ["        " + line for line in self.subschema(value, schema_path + [keyword], "_i")]
+            case "required":
+                required = self.constant(tuple(value))
+                lines += ["if isinstance(data, dict):",
+                          "    for _k in " + required + ":",
+                          "        if _k not in data:",
+                          "            " + self.error("%r is a required property", "_k", schema_path, keyword)]
+            case "properties":
+                lines.append("if isinstance(data, dict):")
+                for name, subschema in value.items():
+                    lines.append("    if " + repr(name) + " in data:")
+                    lines += ["        " + line for line in
+                              self.subschema(subschema, schema_path + [keyword, name], "data[" + repr(name) + "]")]
+                lines.append("    pass")
+            case "additionalProperties":
+                known = self.constant(frozenset(schema.get("properties", {})))
+                if value is False:
+                    lines += ["if isinstance(data, dict):",
+                              "    _x = [_k for _k in data if _k not in " + known + "]",
+                              "    if _x:",
+                              "        " + self.error("Additional properties are not allowed (%s unexpected)",
+                                                      "', '.join(repr(_k) for _k in _x)", schema_path, keyword)]
+                elif value is not True:
+                    lines += ["if isinstance(data, dict):",
+                              "    for _k in data:",
+                              "        if _k not in " + known + ":"]
+                    lines += ["            " + line for line in
+                              self.subschema(value, schema_path + [keyword], "data[_k]")]
+            case "allOf":
+                for i, subschema in enumerate(value):
+                    lines += self.subschema(subschema, schema_path + [keyword, i], "data")
+            case "anyOf" | "oneOf":
+                functions = [self.compile(subschema, schema_path + [keyword, i]) for i, subschema in enumerate(value)]
+                if keyword == "anyOf":
+                    lines += ["if " + " and ".join(f + "(data) is not None" for f in functions) + ":",
+                              "    " + self.error("%r is not valid under any of the given schemas", "data",
+                                                  schema_path, keyword)]
+                else:
+                    lines += ["_n = " + " + ".join("(" + f + "(data) is None)" for f in functions),
+                              "if _n == 0:",
+                              "    " + self.error("%r is not valid under any of the given schemas", "data",
+                                                  schema_path, keyword),
+                              "if _n > 1:",
+                              "    " + self.error("%r is valid under more than one of the given schemas", "data",
+                                                  schema_path, keyword)]
+            case "not":
+                function = self.compile(value, schema_path + [keyword])
+                lines += ["if " + function + "(data) is None:",
+                          "    " + self.error("%r should not be valid under the given schema", "data",
+                                              schema_path, keyword)]
+        return lines
+
+
+def _unsupported(schema, schema_path = ""):
+    """
+    Searches a schema for keywords or keyword forms the compiler does not support.
+
+    Args:
+        schema (dict or bool): the (sub)schema to be checked
+        schema_path (str): the path of the subschema, used for the returned description
+
+    Returns:
+        str: a description of the first unsupported part. None, if the schema can be compiled.
+    """
+    if isinstance(schema, bool):
+        return None
+    if not isinstance(schema, dict):
+        return schema_path + ": not a schema"
+    for keyword, value in schema.items():
+        path = schema_path + "/" + keyword
+        if keyword in ANNOTATIONS:
+            continue
+        if keyword not in SUPPORTED:
+            return path
+        match keyword:
+            case "type":
+                types = [value] if isinstance(value, str) else value
+                if not isinstance(types, list) or any(t not in TYPE_CHECKS for t in types):
+                    return path
+            case "enum" | "required" | "allOf" | "anyOf" | "oneOf":
+                if not isinstance(value, list):
+                    return path
+            case "minimum" | "maximum" | "exclusiveMinimum" | "exclusiveMaximum":
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    return path
+            case "pattern":
+                try:
+                    re.compile(value)
+                except (re.error, TypeError):
+                    return path
+            case "properties":
+                if not isinstance(value, dict):
+                    return path
+                for name, subschema in value.items():
+                    result = _unsupported(subschema, path + "/" + name)
+                    if result is not None:
+                        return result
+            case "items" | "additionalProperties" | "not":
+                result = _unsupported(value, path)
+                if result is not None:
+                    return result
+        if keyword in ("allOf", "anyOf", "oneOf"):
+            for i, subschema in enumerate(value):
+                result = _unsupported(subschema, path + "/" + str(i))
+                if result is not None:
+                    return result
+    return None
+
+
+def generate_source(schema):
+    """
+    Generates the source code of a validation module for a schema.
+
+    Args:
+        schema (dict): the JSON schema, already checked against its meta schema
+
+    Returns:
+        str: the source code of the module, providing validate(data). None, if the schema uses unsupported keywords.
+    """
+    if isinstance(schema, dict) and "$schema" in schema and \
+            not any(draft in str(schema["$schema"]) for draft in SUPPORTED_DRAFTS):
+        lg.debug("[schemacompiler_lib.generate_source/DEBUG]: Draft " + str(schema["$schema"]) + " not supported.")
+        return None
+    reason = _unsupported(schema)
+    if reason is not None:
+        lg.debug("[schemacompiler_lib.generate_source/DEBUG]: Unsupported keyword at " + reason + ".")
+        return None
+    compiler = _SchemaCompiler()
+    entry = compiler.compile(schema, [])
+    header = [
+        "# Generated by pyJSON schemacompiler_lib - do not edit.",
+        "# schema-digest: " + schema_digest(schema),
+        "# compiler-version: " + str(COMPILER_VERSION),
+        "import re",
+        "from Modules.schemacompiler_lib import json_equal, json_in_enum, json_unique",
+        ""
+    ]
+    constants = [name + " = " + literal for name, literal in compiler.constants]
+    return "\n".join(header + constants) + "\n\n\n" + "\n\n".join(compiler.functions) + "\n\nvalidate = " + entry + "\n"
+
+
+def load_source(source, filename = "<compiled schema>"):
+    """
+    Executes the source of a validation module.
+
+    Args:
+        source (str): the source code generated by generate_source
+        filename (str): the file name used for tracebacks
+
+    Returns:
+        function: the validate function of the module
+    """
+    namespace = {}
+    exec(compile(source, filename, "exec"), namespace)
+    return namespace["validate"]
+
+
+def compiled_validator(schema, name = None, sidecar_dir = None):
+    """
+    Compiles a schema, reusing its sidecar module if the schema did not change since it was generated. Sidecar modules
+    that cannot be loaded, e.g. because they were cut short, are generated again. New sidecar modules are written to a
+    temporary file first and then moved into place, so concurrent readers never see a partly written module.
+
+    Args:
+        schema (dict): the JSON schema, already checked against its meta schema
+        name (str): the file name of the schema, used to name the sidecar module
+        sidecar_dir (str): the directory holding the sidecar modules. If None, the schema is compiled in memory only.
+
+    Returns:
+        tuple: the validate function and its source code. (None, None), if the schema cannot be compiled.
+    """
+    digest = schema_digest(schema)
+    sidecar = None
+    if sidecar_dir is not None and name is not None:
+        sidecar = os.path.join(sidecar_dir, os.path.splitext(os.path.basename(name))[0] + ".py")
+        try:
+            with open(sidecar, encoding = "utf8") as sidecar_file:
+                source = sidecar_file.read()
+            if source.splitlines()[1:3] == ["# schema-digest: " + digest,
+                                            "# compiler-version: " + str(COMPILER_VERSION)]:
+                return load_source(source, sidecar), source
+        except OSError:
+            pass
+        except Exception as err:  # a damaged module may fail in any way while it is executed
+            lg.warning("[schemacompiler_lib.compiled_validator/WARN]: Sidecar module " + sidecar +
+                       " cannot be loaded and is generated again.")
+            lg.debug(err)
+    source = generate_source(schema)
+    if source is None:
+        return None, None
+    if sidecar is not None:
+        temp_path = None
+        try:
+            os.makedirs(sidecar_dir, exist_ok = True)
+            handle, temp_path = tempfile.mkstemp(dir = sidecar_dir, prefix = ".sidecar_", suffix = ".tmp")
+            with os.fdopen(handle, "w", encoding = "utf8") as out:
+                out.write(source)
+            os.replace(temp_path, sidecar)
+            temp_path = None
+            lg.info("[schemacompiler_lib.compiled_validator/INFO]: Wrote sidecar module " + sidecar + ".")
+        except OSError as err:
+            lg.warning("[schemacompiler_lib.compiled_validator/WARN]: Could not write sidecar module " + sidecar + ".")
+            lg.debug(err)
+        finally:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+    return load_source(source, sidecar or "<compiled schema>"), source
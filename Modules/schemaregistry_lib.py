@@ -0,0 +1,326 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Offline Schema Registry
+# author: N. Plathe
+# ----------------------------------------
+"""
+A local registry of the schemas in the schema storage. References ($ref) are resolved against the stored schemas only -
+by their $id or by their file name - and never over the network. Resolved schemas are memoized, so references get
+resolved only once per schema version.
+"""
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urldefrag, urljoin
+
+import referencing
+import referencing.exceptions
+import referencing.jsonschema
+
+from Modules.schemacompiler_lib import schema_digest
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+lg = logging.getLogger(__name__)
+lg.setLevel("DEBUG")
+
+
+def _no_retrieve(uri):
+    """
+    Retrieve function of the registry, called for every URI that is not part of the schema storage. Retrieving schemas
+    from anywhere else is not supported.
+
+    Args:
+        uri (str): the URI of the referenced schema
+
+    Raises:
+        referencing.exceptions.NoSuchResource: always
+    """
+    lg.warning("[schemaregistry_lib._no_retrieve/WARNING]: " + uri + " is not part of the schema storage.")
+    raise referencing.exceptions.NoSuchResource(ref = uri)
+
+
+def _external_refs(node, base = ""):
+    """
+    Collects the references of a schema that point outside of the schema itself.
+
+    Args:
+        node (object): the schema node
+        base (str): the base URI of the node
+
+    Returns:
+        set: the absolute URIs of the referenced schemas, without fragments
+    """
+    refs = set()
+    if isinstance(node, list):
+        for item in node:
+            refs |= _external_refs(item, base)
+    elif isinstance(node, dict):
+        if isinstance(node.get("$id"), str):
+            base = urljoin(base, node["$id"])
+        ref = node.get("$ref")
+        if isinstance(ref, str) and not ref.startswith("#"):
+            refs.add(urldefrag(urljoin(base, ref))[0])
+        for key, value in node.items():
+            if key not in ("enum", "const", "default", "examples"):
+                refs |= _external_refs(value, base)
+    return refs
+
+
+def _absolute_ref(base, ref):
+    """
+    Makes a reference absolute.
+
+    Args:
+        base (str): the absolute base URI of the referencing schema node
+        ref (str): the reference
+
+    Returns:
+        str: the absolute reference
+    """
+    if ref.startswith("#"):  # urljoin drops the base of URNs
+        return base + ref
+    return urljoin(base, ref)
+
+
+class SchemaRegistry(object):
+    """
+    The SchemaRegistry holds a referencing.Registry built from all schemas in a directory, keyed by their $id and by
+    their file name. The registry is rebuilt whenever a file in the directory is added, removed or changed. To keep
+    lookups cheap, the directory is checked for changes at most every ttl seconds, unless invalidate is called.
+    """
+    def __init__(self, schema_dir = None, ttl = 2.0):
+        """
+        Constructor
+
+        Args:
+            schema_dir (str): the schema storage. If None, the registry only knows the meta schemas.
+            ttl (float): the time in seconds the schema storage is assumed unchanged after checking it
+        """
+        self.schema_dir = schema_dir
+        self.ttl = ttl
+        self.generation = 0
+        self._signature = None
+        self._checked = None  # schema_dir and time of the last check of the storage
+        self._registry = referencing.Registry(retrieve = _no_retrieve)
+        self._names = {}  # file names and $ids of the stored schemas mapped to their file names
+        self._roots = {}  # resolved schemas that are not part of the schema storage, see _add_root
+        self._digests = {}  # ids of resolved schema objects mapped to the object and its content hash
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def _dir_signature(self):
+        """
+        Builds a signature of the schema storage to detect changes without reading the schemas.
+
+        Returns:
+            tuple: file name, mtime and size of every JSON file in the storage
+        """
+        if self.schema_dir is None or not os.path.isdir(self.schema_dir):
+            return ()
+        with os.scandir(self.schema_dir) as entries:
+            return tuple(sorted((entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                                for entry in entries if entry.is_file() and entry.name.endswith(".json")))
+
+    def invalidate(self):
+        """
+        Makes the next call of registry check the schema storage for changes, e.g. after a schema was stored.
+        """
+        with self._lock:
+            self._checked = None
+
+    def registry(self):
+        """
+        Retrieves the registry, rebuilding it if the schema storage changed. The storage is checked at most every ttl
+        seconds and whenever schema_dir changed.
+
+        Returns:
+            referencing.Registry: the registry holding all stored schemas
+        """
+        schema_dir = self.schema_dir
+        now = time.monotonic()
+        with self._lock:
+            if self._checked is not None and self._checked[0] == schema_dir and now - self._checked[1] < self.ttl:
+                return self._registry
+        signature = (schema_dir, self._dir_signature())
+        with self._lock:
+            self._checked = (schema_dir, now)
+            if signature == self._signature:
+                return self._registry
+            resources = []
+            ids = {}
+            names = {}
+            for name, _, _ in signature[1]:
+                try:
+                    with open(os.path.join(self.schema_dir, name), encoding = "utf8") as schema_file:
+                        contents = json.load(schema_file)
+                except (OSError, UnicodeDecodeError, json.decoder.JSONDecodeError):
+                    lg.warning("[schemaregistry_lib.SchemaRegistry.registry/WARNING]: " + name +
+                               " could not be read and is not registered.")
+                    continue
+                resource = referencing.Resource.from_contents(
+                    contents, default_specification = referencing.jsonschema.DRAFT202012)
+                resources.append((name, resource))
+                names[name] = name
+                schema_id = resource.id()
+                if schema_id is None:
+                    continue
+                schema_id = schema_id.rstrip("#")
+                if schema_id in ids:
+                    lg.warning("[schemaregistry_lib.SchemaRegistry.registry/WARNING]: " + name + " and " +
+                               ids[schema_id] + " share the $id " + schema_id + ", " + ids[schema_id] + " is used.")
+                    continue
+                ids[schema_id] = name
+                names[schema_id] = name
+                resources.append((schema_id, resource))
+            registry = referencing.Registry(retrieve = _no_retrieve).with_resources(resources)
+            self._registry = registry.with_resources(
+                [(uri, resource) for uri, resource in self._roots.items() if uri not in registry]).crawl()
+            self._signature = signature
+            self._names = names
+            self._resolved = {}
+            self.generation += 1
+            lg.debug("[schemaregistry_lib.SchemaRegistry.registry/DEBUG]: Registered " + str(len(signature[1])) +
+                     " schemas.")
+            return self._registry
+
+    def dependencies(self, schema):
+        """
+        Finds the stored schemas a schema references, directly or through other stored schemas.
+
+        Args:
+            schema (dict): the schema
+
+        Returns:
+            list: the file names of the referenced schemas, sorted
+        """
+        registry = self.registry()
+        with self._lock:
+            names = self._names
+        found = set()
+        pending = [schema]
+        while pending:
+            for uri in _external_refs(pending.pop()):
+                name = names.get(uri)
+                if name is not None and name not in found:
+                    found.add(name)
+                    pending.append(registry.contents(name))
+        return sorted(found)
+
+    def _add_root(self, uri, resource):
+        """
+        Registers a schema that is not part of the schema storage, so references into it can be resolved.
+
+        Args:
+            uri (str): the URI to register the schema at
+            resource (referencing.Resource): the schema
+
+        Returns:
+            referencing.Registry: the registry holding the schema
+        """
+        with self._lock:
+            if uri not in self._registry:  # stored schemas take precedence
+                self._roots[uri] = resource
+                self._registry = self._registry.with_resource(uri, resource).crawl()
+            return self._registry
+
+    def resolve(self, schema):
+        """
+        Inlines all references of a schema, e.g. for generating metadata and blank documents from it. Sibling keywords
+        of a reference take precedence over the referenced schema. Recursive references are left in place at the point
+        they recur, rewritten to absolute URIs known to the registry, so they stay resolvable from any fragment of the
+        result. A schema without $id is registered at a URN derived from its content for that. The result is memoized
+        per schema content, the content hash per schema object - schemas are not expected to change once loaded.
+
+        Args:
+            schema (dict): the schema
+
+        Returns:
+            dict: a copy of the schema without references. The schema itself, if it holds no references.
+        """
+        registry = self.registry()
+        with self._lock:
+            cached = self._digests.get(id(schema))
+        if cached is not None and cached[0] is schema:
+            digest = cached[1]
+        else:
+            digest = schema_digest(schema)
+            with self._lock:
+                if len(self._digests) > 256:  # schemas that are not loaded anymore
+                    self._digests.clear()
+                self._digests[id(schema)] = (schema, digest)
+        with self._lock:
+            resolved = self._resolved.get(digest)
+        if resolved is not None:
+            return resolved
+        if '"$ref"' not in json.dumps(schema):
+            resolved = schema
+        else:
+            resource = referencing.Resource.from_contents(
+                schema, default_specification = referencing.jsonschema.DRAFT202012)
+            base = urldefrag(resource.id() or "")[0] or "urn:pyjson:schema:" + digest
+            registry = self._add_root(base, resource)
+            resolved = self._inline(schema, registry.resolver(base), base, ())
+        with self._lock:
+            self._resolved[digest] = resolved
+        return resolved
+
+    def _inline(self, node, resolver, base, stack):
+        """
+        Recursively inlines the references of a schema node.
+
+        Args:
+            node (object): the schema node
+            resolver (referencing._core.Resolver): the resolver for the base URI of the node
+            base (str): the absolute base URI of the node, to rewrite recursive references with
+            stack (tuple): the ids of the referenced schema nodes currently being inlined
+
+        Returns:
+            object: the node without references
+        """
+        if isinstance(node, list):
+            return [self._inline(item, resolver, base, stack) for item in node]
+        if not isinstance(node, dict):
+            return node
+        if isinstance(node.get("$id"), str):
+            resolver = resolver.in_subresource(referencing.jsonschema.DRAFT202012.create_resource(node))
+            base = urldefrag(_absolute_ref(base, node["$id"]))[0]
+        result = {}
+        inlined = False
+        ref = node.get("$ref")
+        if isinstance(ref, str):
+            try:
+                resolved = resolver.lookup(ref)
+            except referencing.exceptions.Unresolvable as err:
+                lg.error("[schemaregistry_lib.SchemaRegistry.resolve/ERROR]: Reference " + ref +
+                         " cannot be resolved: " + str(err))
+                resolved = None
+            if resolved is not None and id(resolved.contents) not in stack:
+                target = self._inline(resolved.contents, resolved.resolver, urldefrag(_absolute_ref(base, ref))[0],
+                                      stack + (id(resolved.contents),))
+                if isinstance(target, dict):
+                    result.update(target)
+                    result.pop("$id", None)
+                    inlined = True
+            elif resolved is not None:  # recurs, the reference has to work without the base of the node
+                result["$ref"] = _absolute_ref(base, ref)
+        for key, value in node.items():
+            if key == "$ref" and (inlined or key in result):
+                continue
+            if key in ("enum", "const", "default", "examples"):
+                result[key] = value
+            else:
+                result[key] = self._inline(value, resolver, base, stack)
+        return result
+
+
+# module wide registry, pointed to the schema storage on start up
+schema_registry = SchemaRegistry()
@@ -0,0 +1,124 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Background Search
+# author: N. Plathe
+# ----------------------------------------
+"""
+Runs a search on a worker thread and hands the results over in small batches as they are found, so the search window
+fills while the search is still running. The worker reads through its own connection to the index store.
+"""
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+import json
+import logging
+import sqlite3
+import time
+
+import jsonschema
+from PySide6.QtCore import QThread, Signal
+
+from Modules import indexstore_lib, jsonsearch_lib, progress_lib
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+lg = logging.getLogger(__name__)
+lg.setLevel("DEBUG")
+
+
+class SearchThread(QThread):
+    """
+    A thread searching an index, see jsonsearch_lib.iter_search. Call cancel to stop it early.
+
+    Signals:
+        found (list): the paths of files found since the last emission
+        searched (int, str, str): the amount of files found, the outcome ("done", "cancelled" or "failed") and a message
+            describing a failure
+    """
+    found = Signal(list)
+    searched = Signal(int, str, str)
+
+    def __init__(self, script_dir, index, schema, root_id, search_dict, parent = None, workers = None,
+                 batch_interval = 0.1):
+        """
+        Constructor
+
+        Args:
+            script_dir (str): The directory in which the tool is executed
+            index (list): the paths of the JSON documents to search. None searches all indexed files of the root.
+            schema (str): the file name of the schema the files have to be valid against
+            root_id (int): the number of the index
+            search_dict (dict): flattened keys mapped to the terms to search for, see jsonsearch_lib.f_search
+            parent (QObject): the parent object
+            workers (int): amount of worker processes validating files, see jsonsearch_lib.iter_validation_results
+            batch_interval (float): the minimum time between two emissions of found in seconds. Matches are handed
+                over once it has passed, even if no further match comes along.
+        """
+        super(SearchThread, self).__init__(parent)
+        self.script_dir = script_dir
+        self.index = index
+        self.schema = schema
+        self.root_id = root_id
+        self.search_dict = search_dict
+        self.workers = workers
+        self.batch_interval = batch_interval
+        self.token = progress_lib.CancelToken()
+
+    def cancel(self):
+        """
+        Stops the search at the next file.
+        """
+        self.token.cancel()
+
+    def run(self):
+        """
+        Searches the index. The first match is handed over right away, later ones at most every batch_interval. The
+        pending matches are checked for after every file, not only when the next match is found.
+        """
+        count = 0
+        outcome = "done"
+        message = ""
+        batch = []
+        last_emit = None
+        store = None
+        timings = {}
+        start = time.perf_counter()
+
+        def flush():
+            nonlocal batch, last_emit
+            if batch and (last_emit is None or time.perf_counter() - last_emit >= self.batch_interval):
+                self.found.emit(batch)
+                batch = []
+                last_emit = time.perf_counter()
+
+        try:
+            store = indexstore_lib.IndexStore(self.script_dir)
+            for path in jsonsearch_lib.iter_search(self.index, self.schema, self.script_dir, self.root_id,
+                                                   self.search_dict, store, self.workers, cancel = self.token,
+                                                   timings = timings, progress = flush):
+                batch.append(path)
+                count += 1
+                flush()
+        except progress_lib.Cancelled:
+            outcome = "cancelled"
+            lg.info("[searchworker_lib.SearchThread.run/INFO]: Search cancelled after " + str(count) + " results.")
+        except jsonschema.SchemaError as err:
+            lg.critical(err)
+            outcome = "failed"
+            message = "The schema does not validate against its metaschema. Please check your selected schema!"
+        except (OSError, json.decoder.JSONDecodeError, sqlite3.Error) as err:
+            lg.critical(err)
+            outcome = "failed"
+            message = "The schema or the index is not accessible: " + str(err)
+        finally:
+            if store is not None:
+                store.close()
+        lg.info("[searchworker_lib.SearchThread.run/INFO]: Found " + str(count) + " files in " +
+                str(round(time.perf_counter() - start, 3)) + " s" +
+                (": " + jsonsearch_lib.format_timings(timings) if timings else "") + ".")
+        if batch:
+            self.found.emit(batch)
+        self.searched.emit(count, outcome, message)
@@ -0,0 +1,150 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Background Index Watchdog
+# author: N. Plathe
+# ----------------------------------------
+"""
+Runs the index watchdog and the indexing of new directories on worker threads, so the user interface stays responsive
+while indexes are checked or built. The workers write through their own connection to the index store, the user
+interface keeps reading the last committed state of every index until the refresh of that index is done.
+"""
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+import logging
+import sqlite3
+
+from PySide6.QtCore import QThread, Signal
+
+from Modules import indexstore_lib, jsonsearch_lib, progress_lib
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+lg = logging.getLogger(__name__)
+lg.setLevel("DEBUG")
+
+
+class _Interrupted(Exception):
+    """
+    Raised from the progress callback to stop a run between two indexes.
+    """
+
+
+class WatchdogThread(QThread):
+    """
+    A thread checking all indexes of a main index snapshot once, see jsonsearch_lib.watchdog. After the run, report
+    holds the time taken and the error of every checked index.
+
+    Signals:
+        progress (int, int, str): the amount of checked indexes, the total amount and the path checked next
+        refreshed (dict): the main index read from the store after the run
+    """
+    progress = Signal(int, int, str)
+    refreshed = Signal(dict)
+
+    def __init__(self, script_dir, index_dict, parent = None, workers = 4, per_device = 2, timeout = 600.0):
+        """
+        Constructor
+
+        Args:
+            script_dir (str): The directory in which the tool is executed
+            index_dict (dict): the main index. The thread works on a copy, the caller may keep using the original.
+            parent (QObject): the parent object
+            workers (int): the maximum amount of indexes checked at once
+            per_device (int): the maximum amount of indexes on the same storage device checked at once
+            timeout (float): the time in seconds a single check may take, see scheduler_lib.refresh_all
+        """
+        super(WatchdogThread, self).__init__(parent)
+        self.script_dir = script_dir
+        self.index_dict = dict(index_dict)
+        self.workers = workers
+        self.per_device = per_device
+        self.timeout = timeout
+        self.report = {}
+
+    def _progress(self, done, total, path):
+        """
+        Forwards the progress of jsonsearch_lib.watchdog and stops the run, if an interruption was requested.
+        """
+        if self.isInterruptionRequested():
+            raise _Interrupted()
+        self.progress.emit(done, total, path)
+
+    def run(self):
+        """
+        Checks the indexes. Always emits refreshed, with the snapshot it started from if the store is not accessible.
+        """
+        main_index = self.index_dict
+        store = None
+        try:
+            store = indexstore_lib.IndexStore(self.script_dir)
+            self.report = jsonsearch_lib.watchdog(self.script_dir, self.index_dict, store, self._progress, self.workers,
+                                                  self.per_device, self.timeout)
+            main_index = store.main_index()
+        except _Interrupted:
+            lg.info("[watchdog_lib.WatchdogThread.run/INFO]: Index check interrupted.")
+        except (sqlite3.Error, OSError) as err:
+            lg.debug(err)
+            lg.error("[watchdog_lib.WatchdogThread.run/ERROR]: Cannot read or access the index store.")
+        finally:
+            if store is not None:
+                store.close()
+        self.refreshed.emit(main_index)
+
+
+class IndexThread(QThread):
+    """
+    A thread indexing a directory, see jsonsearch_lib.start_index. Call cancel to stop it early.
+
+    Signals:
+        progress (dict): the progress of the indexing, see progress_lib.IndexProgress.snapshot
+        indexed (dict, dict): the main index read from the store and the final progress
+    """
+    progress = Signal(dict)
+    indexed = Signal(dict, dict)
+
+    def __init__(self, script_dir, path, index_dict, parent = None):
+        """
+        Constructor
+
+        Args:
+            script_dir (str): The directory in which the tool is executed
+            path (str): the directory to index
+            index_dict (dict): the main index. The thread works on a copy, the caller may keep using the original.
+            parent (QObject): the parent object
+        """
+        super(IndexThread, self).__init__(parent)
+        self.script_dir = script_dir
+        self.path = path
+        self.index_dict = dict(index_dict)
+        self.token = progress_lib.CancelToken()
+
+    def cancel(self):
+        """
+        Stops the indexing at the next file or directory. The shards indexed so far are kept.
+        """
+        self.token.cancel()
+
+    def run(self):
+        """
+        Indexes the directory. Always emits indexed, with the snapshot it started from if the store is not accessible.
+        """
+        main_index = self.index_dict
+        result = {"path": self.path, "phase": "failed", "found": 0, "files": 0, "bytes": 0, "elapsed": 0.0,
+                  "files_per_second": 0.0, "eta": None}
+        store = None
+        try:
+            store = indexstore_lib.IndexStore(self.script_dir)
+            result = jsonsearch_lib.start_index(self.script_dir, self.path, self.index_dict, False, store,
+                                                self.progress.emit, self.token)
+            main_index = store.main_index()
+        except (sqlite3.Error, OSError) as err:
+            lg.debug(err)
+            lg.error("[watchdog_lib.IndexThread.run/ERROR]: Cannot read or access the index store.")
+        finally:
+            if store is not None:
+                store.close()
+        self.indexed.emit(main_index, result)
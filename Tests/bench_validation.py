@@ -0,0 +1,466 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Validation and Search Benchmark
+# author: N. Plathe
+# ----------------------------------------
+"""
+Generates a synthetic corpus of JSON documents from the schemas in Tests/Files and times the stages of validation and
+search on it: parsing, validation (validator_files and schema_matching_search), flattening and value matching
+(f_search, and indexed_search on an index store built from the corpus). The former f_search, which recompiled the
+query per document and matched in quadratic time, is kept here as legacy_f_search and timed on the same search index
+for comparison. A whole search is timed both as schema_matching_search followed by f_search, which parses every file
+twice, and as the single pass of pipeline_search. Results are written as JSON and can be compared against the results of an earlier run.
+
+Run from the repository root:
+
+    python -m Tests.bench_validation --files 2000 --depth 3 --width 4 --array-length 5 --out new.json --compare old.json
+"""
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import jsonschema
+import regex
+from jsonschema.validators import validator_for
+
+from Modules import indexstore_lib, jsonio_lib, jsonsearch_lib
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+WORDS = ["alpha", "beta", "gamma", "delta", "omega", "sigma", "kappa", "lambda", "theta", "zeta"]
+
+
+def synthetic_value(rng, depth, width, array_length):
+    """
+    Builds a free-form JSON value for parts of a document the schema does not describe in detail.
+
+    Args:
+        rng (random.Random): the random generator
+        depth (int): the amount of nested object levels below this value
+        width (int): the amount of keys per object
+        array_length (int): the length of generated arrays
+
+    Returns:
+        dict: the nested value
+    """
+    value = {}
+    for i in range(width):
+        key = "k" + str(i)
+        if depth > 1 and i % 2 == 0:
+            value[key] = synthetic_value(rng, depth - 1, width, array_length)
+        elif i % 3 == 1:
+            value[key] = [rng.choice(WORDS) + str(j) for j in range(array_length)]
+        elif i % 3 == 2:
+            value[key] = rng.randint(0, 10 ** 6)
+        else:
+            value[key] = rng.choice(WORDS) + " " + str(rng.randint(0, 10 ** 6))
+    return value
+
+
+def generate_instance(schema, rng, depth, width, array_length):
+    """
+    Generates a JSON value valid against a schema fragment. Objects without described properties are filled with
+    synthetic content of the configured depth and width.
+
+    Args:
+        schema (dict): the schema fragment
+        rng (random.Random): the random generator
+        depth (int): the depth of synthetic objects
+        width (int): the amount of keys of synthetic objects
+        array_length (int): the length of generated arrays
+
+    Returns:
+        object: the generated value
+    """
+    if not isinstance(schema, dict):
+        return None
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    for combinator in ("anyOf", "oneOf"):
+        if combinator in schema:
+            branches = schema[combinator]
+            objects = [b for b in branches if isinstance(b, dict) and b.get("type") == "object"]
+            return generate_instance(objects[0] if objects else branches[0], rng, depth, width, array_length)
+    schema_type = schema.get("type", "object")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), "null")
+    match schema_type:
+        case "object":
+            properties = schema.get("properties", {})
+            if not properties:
+                return synthetic_value(rng, depth, width, array_length)
+            return {key: generate_instance(sub, rng, depth, width, array_length) for key, sub in properties.items()}
+        case "array":
+            items = [generate_instance(schema.get("items", {}), rng, depth, width, array_length)
+                     for _ in range(array_length)]
+            if schema.get("uniqueItems") and all(isinstance(item, str) for item in items):
+                items = [item + str(i) for i, item in enumerate(items)]
+            return items
+        case "string":
+            match schema.get("format"):
+                case "date":
+                    return "20" + str(rng.randint(10, 29)) + "-0" + str(rng.randint(1, 9)) + "-1" + \
+                           str(rng.randint(0, 9))
+                case "uri":
+                    return "https://example.org/" + rng.choice(WORDS) + "/" + str(rng.randint(0, 10 ** 6))
+                case _:
+                    value = rng.choice(WORDS) + " " + rng.choice(WORDS) + " " + str(rng.randint(0, 10 ** 6))
+                    return value[:schema["maxLength"]] if "maxLength" in schema else value
+        case "integer":
+            return rng.randint(schema.get("minimum", 0), schema.get("maximum", 10 ** 6))
+        case "number":
+            return rng.uniform(schema.get("minimum", 0), schema.get("maximum", 10 ** 6))
+        case "boolean":
+            return rng.random() < 0.5
+        case _:
+            return None
+
+
+def break_instance(instance, schema, rng):
+    """
+    Makes a generated document invalid by removing a required key or by replacing a value with one of a wrong type.
+
+    Args:
+        instance (dict): the generated document
+        schema (dict): the schema of the document
+        rng (random.Random): the random generator
+    """
+    required = [key for key in schema.get("required", []) if key in instance]
+    if required:
+        del instance[rng.choice(required)]
+    elif instance:
+        instance[rng.choice(list(instance))] = []
+
+
+def generate_corpus(target_dir, files, depth, width, array_length, invalid_ratio = 0.1, seed = 0):
+    """
+    Generates a corpus for every valid schema in Tests/Files. The schemas are copied to target_dir/Schemas.
+
+    Args:
+        target_dir (str): the directory the corpus is written to
+        files (int): the amount of documents per schema
+        depth (int): the depth of synthetic objects
+        width (int): the amount of keys of synthetic objects
+        array_length (int): the length of generated arrays
+        invalid_ratio (float): the share of documents made invalid
+        seed (int): the seed of the random generator
+
+    Returns:
+        dict: schema file name -> list of the paths of its documents
+    """
+    rng = random.Random(seed)
+    corpora = {}
+    os.makedirs(os.path.join(target_dir, "Schemas"), exist_ok = True)
+    for schema_path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), "Files", "*.json"))):
+        with open(schema_path, encoding = "utf8") as schema_file:
+            schema = json.load(schema_file)
+        if not isinstance(schema, dict) or "properties" not in schema:
+            continue
+        try:
+            validator_for(schema).check_schema(schema)
+        except jsonschema.SchemaError:
+            continue
+        name = os.path.basename(schema_path)
+        shutil.copy(schema_path, os.path.join(target_dir, "Schemas", name))
+        corpus_dir = os.path.join(target_dir, os.path.splitext(name)[0])
+        os.makedirs(corpus_dir, exist_ok = True)
+        paths = []
+        for i in range(files):
+            instance = generate_instance(schema, rng, depth, width, array_length)
+            if rng.random() < invalid_ratio:
+                break_instance(instance, schema, rng)
+            path = os.path.join(corpus_dir, "doc_" + str(i).zfill(6) + ".json")
+            with open(path, "w", encoding = "utf8") as out:
+                json.dump(instance, out, indent = 4, ensure_ascii = False)
+            paths.append(path)
+        corpora[name] = paths
+    return corpora
+
+
+def search_terms(path):
+    """
+    Picks search terms from a document of the corpus, so the value search has matches.
+
+    Args:
+        path (str): path to a document
+
+    Returns:
+        dict: up to two flat keys with the beginning of their values
+    """
+    with open(path, encoding = "utf8") as json_file:
+        flat = jsonsearch_lib.dict_flatten_dict(json.load(json_file))
+    terms = {}
+    for key, value in flat.items():
+        if isinstance(value, str) and len(value) >= 3:
+            terms[key] = value[:3]
+        if len(terms) == 2:
+            break
+    return terms
+
+
+def legacy_f_search(search_index, search_dict):
+    """
+    The former implementation of jsonsearch_lib.f_search, kept to compare against. It recompiles the search terms for
+    every document and removes documents from a list, which takes quadratic time in the size of the index. Unlike
+    the original, errors are passed on instead of being shown in a message box.
+
+    Args:
+        search_index (list): the paths to search
+        search_dict (dict): flattened keys mapped to the terms to search for
+
+    Returns:
+        list: the retained paths
+    """
+    copy_index = search_index.copy()
+    for i in search_index:
+        try:
+            json_file = json.load(open(i, encoding = "utf8"))
+            if json_file is None:
+                raise json.decoder.JSONDecodeError("Content of JSON file is Null.", i, 0)
+        except (json.decoder.JSONDecodeError, UnicodeDecodeError):
+            json_file = {}
+        check_list = {}
+        check_list = jsonsearch_lib.dict_flatten_dict(json_file, check_list)
+        for j in search_dict.keys():
+            if i not in copy_index:
+                break
+            comp_str = regex.compile(regex.escape(str(search_dict[j])))
+            for k in list(check_list.keys()):
+                if check_list[k] == "":
+                    del check_list[k]
+            for l in list(check_list.keys()):
+                if l == j and not regex.search(comp_str, str(check_list[l])):
+                    copy_index.remove(i)
+            if j not in list(check_list.keys()):
+                copy_index.remove(i)
+    return copy_index
+
+
+def _timed(function, repeat, setup = None):
+    """
+    Runs a stage several times and keeps the fastest run.
+
+    Args:
+        function (function): the stage
+        repeat (int): amount of runs
+        setup (function): called before every run, not part of the timing
+
+    Returns:
+        float: the duration of the fastest run in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def run_benchmark(target_dir, corpora, repeat = 3, workers = 1, search_index_size = None):
+    """
+    Times all stages on every corpus.
+
+    Args:
+        target_dir (str): the directory holding the corpus and the Schemas directory
+        corpora (dict): schema file name -> list of the paths of its documents, see generate_corpus
+        repeat (int): amount of runs per stage, the fastest one is reported
+        workers (int): amount of worker processes of schema_matching_search and pipeline_search
+        search_index_size (int): the length of the search index matched by f_search and legacy_f_search. The corpus
+            is repeated to fill it, which keeps large indexes cheap to generate. Defaults to the corpus.
+
+    Returns:
+        dict: schema file name -> stage -> timings
+    """
+    results = {}
+    store = indexstore_lib.IndexStore(target_dir)
+    for name, paths in corpora.items():
+        schema_path = os.path.join(target_dir, "Schemas", name)
+        total_bytes = sum(os.path.getsize(path) for path in paths)
+        documents = []
+        terms = search_terms(paths[0]) if paths else {}
+        search_index = [paths[i % len(paths)] for i in range(search_index_size)] \
+            if search_index_size and paths else paths
+
+        def parse():
+            documents.clear()
+            for path in paths:
+                with open(path, encoding = "utf8") as json_file:
+                    documents.append(json.load(json_file))
+
+        def flatten():
+            for document in documents:
+                jsonsearch_lib.dict_flatten_dict(document)
+
+        jsonio_lib.validator_cache.get_entry(schema_path)  # building the validator is not part of the stages
+        root_id = store.add_root(os.path.join(target_dir, name))  # neither is building the index
+        store.replace_index(root_id, {"files": {path: (os.path.getsize(path), 0, 0) for path in paths}, "dirs": {}},
+                            jsonsearch_lib.extract_values)
+        stages = {
+            "parse": _timed(parse, repeat),
+            "validate": _timed(lambda: [jsonio_lib.validator_files(path, schema_path) for path in paths], repeat),
+            "schema_match": _timed(lambda: jsonsearch_lib.schema_matching_search(
+                paths, name, target_dir, workers = workers, use_cache = False), repeat),
+            "flatten": _timed(flatten, repeat, setup = parse),  # flattening consumes the parsed documents
+            "match": _timed(lambda: jsonsearch_lib.f_search(search_index, terms), repeat),
+            "match_legacy": _timed(lambda: legacy_f_search(search_index, terms), repeat),
+            "indexed_match": _timed(lambda: jsonsearch_lib.indexed_search(paths, terms, store, root_id), repeat),
+            "two_pass_search": _timed(lambda: jsonsearch_lib.f_search(jsonsearch_lib.schema_matching_search(
+                paths, name, target_dir, workers = workers, use_cache = False), terms), repeat),
+            "pipeline_search": _timed(lambda: jsonsearch_lib.pipeline_search(paths, name, target_dir, terms,
+                                                                             workers = workers), repeat)
+        }
+        scale = len(search_index) / len(paths) if paths else 1  # the match stages read the repeated corpus
+        results[name] = {
+            stage: {
+                "seconds": round(seconds, 6),
+                "files_per_s": round(len(paths) * (scale if stage.startswith("match") else 1) / seconds, 1)
+                if seconds > 0 else None,
+                "mb_per_s": round(total_bytes * (scale if stage.startswith("match") else 1) / 1048576 / seconds, 3)
+                if seconds > 0 else None
+            } for stage, seconds in stages.items()
+        }
+        results[name]["files"] = len(paths)
+        results[name]["bytes"] = total_bytes
+    store.close()
+    return results
+
+
+def _git_revision():
+    """
+    Fetches the current commit, to tell results apart.
+
+    Returns:
+        str: the commit hash. None, if git is not available.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output = True, text = True,
+                              cwd = os.path.dirname(os.path.abspath(__file__)), check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new, threshold = 1.2):
+    """
+    Compares two benchmark results stage by stage.
+
+    Args:
+        old (dict): the earlier results
+        new (dict): the current results
+        threshold (float): the ratio of new to old duration from which on a stage counts as regressed
+
+    Returns:
+        tuple: the report lines and the list of regressed "schema/stage" names
+    """
+    lines = []
+    regressions = []
+    for name, stages in new["results"].items():
+        old_stages = old.get("results", {}).get(name)
+        if old_stages is None:
+            continue
+        for stage, timing in stages.items():
+            if not isinstance(timing, dict) or stage not in old_stages or not old_stages[stage]["seconds"]:
+                continue
+            ratio = timing["seconds"] / old_stages[stage]["seconds"]
+            lines.append(name + "/" + stage + ": " + str(old_stages[stage]["seconds"]) + "s -> " +
+                         str(timing["seconds"]) + "s (x" + str(round(ratio, 2)) + ")")
+            if ratio > threshold:
+                regressions.append(name + "/" + stage)
+    return lines, regressions
+
+
+def main(argv = None):
+    """
+    Command line entry point of the benchmark.
+
+    Args:
+        argv (list): the command line arguments. Defaults to sys.argv.
+
+    Returns:
+        int: 0, or 1 if a stage regressed compared to --compare
+    """
+    parser = argparse.ArgumentParser(description = "Benchmark of the validation and search stages of pyJSON.")
+    parser.add_argument("--files", type = int, default = 1000, help = "documents per schema")
+    parser.add_argument("--depth", type = int, default = 2, help = "depth of synthetic objects")
+    parser.add_argument("--width", type = int, default = 4, help = "keys per synthetic object")
+    parser.add_argument("--array-length", type = int, default = 3, help = "length of generated arrays")
+    parser.add_argument("--invalid-ratio", type = float, default = 0.1, help = "share of invalid documents")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed of the corpus generator")
+    parser.add_argument("--repeat", type = int, default = 3, help = "runs per stage, the fastest is reported")
+    parser.add_argument("--workers", type = int, default = 1, help = "worker processes of the schema matching and the search pipeline")
+    parser.add_argument("--search-index-size", type = int,
+                        help = "length of the search index of the match stages, repeating the corpus")
+    parser.add_argument("--corpus-dir", help = "keep the corpus in this directory instead of a temporary one")
+    parser.add_argument("--out", help = "write the results to this file instead of stdout")
+    parser.add_argument("--compare", help = "results of an earlier run to compare against")
+    parser.add_argument("--threshold", type = float, default = 1.2, help = "slowdown ratio counted as regression")
+    parser.add_argument("--verbose", action = "store_true", help = "keep the log output of the timed functions")
+    args = parser.parse_args(argv)
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    target_dir = args.corpus_dir or tempfile.mkdtemp(prefix = "pyjson_bench_")
+    try:
+        corpora = generate_corpus(target_dir, args.files, args.depth, args.width, args.array_length,
+                                  args.invalid_ratio, args.seed)
+        results = run_benchmark(target_dir, corpora, args.repeat, args.workers, args.search_index_size)
+    finally:
+        logging.disable(logging.NOTSET)
+        if args.corpus_dir is None:
+            shutil.rmtree(target_dir, ignore_errors = True)
+
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": datetime.now().isoformat(timespec = "seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": {key: value for key, value in vars(args).items()
+                           if key not in ("out", "compare", "corpus_dir", "threshold", "verbose")}
+        },
+        "results": results
+    }
+    if args.out:
+        with open(args.out, "w", encoding = "utf8") as out:
+            json.dump(report, out, indent = 4)
+    else:
+        json.dump(report, sys.stdout, indent = 4)
+        sys.stdout.write("\n")
+
+    if args.compare:
+        with open(args.compare, encoding = "utf8") as old_file:
+            old = json.load(old_file)
+        if old.get("meta", {}).get("parameters") != report["meta"]["parameters"]:
+            sys.stderr.write("Warning: the runs used different parameters.\n")
+        lines, regressions = compare(old, report, args.threshold)
+        for line in lines:
+            sys.stderr.write(line + "\n")
+        if regressions:
+            sys.stderr.write("Regressed: " + ", ".join(regressions) + "\n")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
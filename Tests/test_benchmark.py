@@ -0,0 +1,46 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Benchmark Smoke Test Module
+# author: N. Plathe
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+
+import Modules.jsonio_lib, Modules.jsonsearch_lib, Tests.bench_validation
+import glob, json, os
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+class Test_Benchmark:
+    """
+    The benchmark has to keep working, its numbers are not checked.
+    """
+    def test_generated_corpus(self, tmp_path):
+        corpora = Tests.bench_validation.generate_corpus(str(tmp_path), 20, 3, 3, 2, invalid_ratio = 0)
+        assert list(corpora) == ["schema.json"]
+        schema_path = os.path.join(str(tmp_path), "Schemas", "schema.json")
+        assert all(Modules.jsonio_lib.validator_files(path, schema_path) == 0 for path in corpora["schema.json"])
+        results = Tests.bench_validation.run_benchmark(str(tmp_path), corpora, repeat = 1, search_index_size = 50)
+        assert set(results["schema.json"]) == {"parse", "validate", "schema_match", "flatten", "match",
+                                               "match_legacy", "indexed_match", "two_pass_search",
+                                               "pipeline_search", "files", "bytes"}
+
+    def test_legacy_search(self):
+        files = glob.glob("./Tests/Files/*.json")
+        files = files + files[:2]  # duplicates in an index
+        for search_dict in ({}, {"constructor": "Mustermann"}, {"type_of_file": "Inventor"}, {"title": ""},
+                            {"constructor": "Max", "tags1": "Tag2"}, {"title": "missing"}, {"$schema": "http"}):
+            assert Modules.jsonsearch_lib.f_search(files, search_dict) == \
+                   Tests.bench_validation.legacy_f_search(files, search_dict)
+
+    def test_main_and_compare(self, tmp_path):
+        out = str(tmp_path / "results.json")
+        assert Tests.bench_validation.main(["--files", "5", "--repeat", "1", "--out", out]) == 0
+        with open(out, encoding = "utf8") as result_file:
+            report = json.load(result_file)
+        assert report["results"]["schema.json"]["files"] == 5
+        assert Tests.bench_validation.main(["--files", "5", "--repeat", "1", "--out", out, "--compare", out,
+                                            "--threshold", "1000"]) == 0
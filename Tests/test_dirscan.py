@@ -0,0 +1,114 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Directory Scanner Test Module
+# author: N. Plathe
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+
+import Modules.dirscan_lib, Modules.jsonsearch_lib
+import os
+import pytest
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+class Test_Scan_Tree:
+    """
+    The parallel scanner has to find the same files as a walk of the tree.
+    """
+    @pytest.fixture(autouse = True)
+    def tree(self, tmp_path):
+        for rel_path in ["a.json", "b.txt", "sub/c.json", "sub/deeper/d.json", "skip/e.json", "sub/tmp_f.json"]:
+            os.makedirs(os.path.dirname(tmp_path / rel_path), exist_ok = True)
+            with open(tmp_path / rel_path, "w", encoding = "utf8") as out:
+                out.write("{}")
+        self.root = str(tmp_path)
+
+    def rel(self, result):
+        return sorted(os.path.relpath(path, self.root).replace(os.sep, "/") for path in result["files"])
+
+    def test_matches_walk(self):
+        walked = sorted(os.path.normpath(os.path.join(root, name)) for root, _, files in os.walk(self.root)
+                        for name in files if name.endswith(".json"))
+        result = Modules.dirscan_lib.scan_tree(self.root, workers = 4)
+        assert sorted(result["files"]) == walked
+        assert Modules.jsonsearch_lib.collect_json_files(self.root) == walked
+        assert len(result["dirs"]) == 4
+
+    def test_stat_records(self):
+        result = Modules.dirscan_lib.scan_tree(self.root)
+        path = os.path.join(self.root, "a.json")
+        stat = os.stat(path)
+        assert result["files"][path] == (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        assert result["dirs"][self.root] == os.stat(self.root).st_mtime_ns
+
+    def test_include_exclude(self):
+        assert self.rel(Modules.dirscan_lib.scan_tree(self.root, include = ["*.txt"])) == ["b.txt"]
+        assert self.rel(Modules.dirscan_lib.scan_tree(self.root, exclude = ["skip", "tmp_*"])) == \
+               ["a.json", "sub/c.json", "sub/deeper/d.json"]
+        assert self.rel(Modules.dirscan_lib.scan_tree(self.root, exclude = ["sub/deeper"])) == \
+               ["a.json", "skip/e.json", "sub/c.json", "sub/tmp_f.json"]
+
+    def test_max_depth(self):
+        assert self.rel(Modules.dirscan_lib.scan_tree(self.root, max_depth = 0)) == ["a.json"]
+        assert "sub/deeper/d.json" not in self.rel(Modules.dirscan_lib.scan_tree(self.root, max_depth = 1))
+
+    def test_is_included(self):
+        scan = self.rel(Modules.dirscan_lib.scan_tree(self.root, exclude = ["skip", "tmp_*"], max_depth = 1))
+        for rel_path in ["a.json", "b.txt", "skip/e.json", "sub/c.json", "sub/tmp_f.json", "sub/deeper/d.json"]:
+            included = Modules.dirscan_lib.is_included(self.root, os.path.join(self.root, *rel_path.split("/")),
+                                                       exclude = ["skip", "tmp_*"], max_depth = 1)
+            assert included == (rel_path in scan)
+        assert not Modules.dirscan_lib.is_included(self.root, os.path.join(os.path.dirname(self.root), "x.json"))
+
+    def test_list_root(self):
+        result, subdirs = Modules.dirscan_lib.list_root(self.root)
+        assert self.rel(result) == ["a.json"]
+        assert subdirs == sorted(os.path.join(self.root, name) for name in ["skip", "sub"])
+        assert Modules.dirscan_lib.list_root(self.root, max_depth = 0)[1] == []
+        shard = Modules.dirscan_lib.scan_tree(self.root, start = os.path.join(self.root, "sub"), max_depth = 1)
+        assert self.rel(shard) == ["sub/c.json", "sub/tmp_f.json"]
+
+    def test_missing_root(self):
+        with pytest.raises(OSError):
+            Modules.dirscan_lib.scan_tree(os.path.join(self.root, "missing"))
+
+
+class Test_Refresh_Tree:
+    """
+    A refresh has to end up with the same files as a full scan and report what changed.
+    """
+    @pytest.fixture(autouse = True)
+    def tree(self, tmp_path):
+        for rel_path in ["a.json", "sub/b.json", "sub/deeper/c.json", "gone/d.json"]:
+            os.makedirs(os.path.dirname(tmp_path / rel_path), exist_ok = True)
+            with open(tmp_path / rel_path, "w", encoding = "utf8") as out:
+                out.write("{}")
+        self.root = str(tmp_path)
+        self.previous = Modules.dirscan_lib.scan_tree(self.root)
+
+    def test_no_changes(self):
+        scan, delta = Modules.dirscan_lib.refresh_tree(self.root, self.previous)
+        assert delta == {"added": [], "removed": [], "modified": []}
+        assert scan["files"] == self.previous["files"]
+
+    def test_delta(self, tmp_path):
+        with open(tmp_path / "sub" / "deeper" / "c.json", "w", encoding = "utf8") as out:
+            out.write('{"changed": true}')
+        os.makedirs(tmp_path / "new" / "nested")
+        with open(tmp_path / "new" / "nested" / "e.json", "w", encoding = "utf8") as out:
+            out.write("{}")
+        with open(tmp_path / "sub" / "f.json", "w", encoding = "utf8") as out:
+            out.write("{}")
+        os.remove(tmp_path / "gone" / "d.json")
+        os.rmdir(tmp_path / "gone")
+        scan, delta = Modules.dirscan_lib.refresh_tree(self.root, self.previous)
+        assert delta["added"] == sorted([str(tmp_path / "new" / "nested" / "e.json"), str(tmp_path / "sub" / "f.json")])
+        assert delta["removed"] == [str(tmp_path / "gone" / "d.json")]
+        assert delta["modified"] == [str(tmp_path / "sub" / "deeper" / "c.json")]
+        full = Modules.dirscan_lib.scan_tree(self.root)
+        assert scan["files"] == full["files"]
+        assert scan["dirs"] == full["dirs"]
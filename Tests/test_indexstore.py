@@ -0,0 +1,168 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Index Store Test Module
+# author: N. Plathe
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+
+import Modules.indexstore_lib
+import json, os
+import pytest
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+SCAN = {
+    "files": {"/data/a.json": (2, 10, 100), "/data/sub/b.json": (4, 20, 101)},
+    "dirs": {"/data": 5, "/data/sub": 6}
+}
+
+
+def test_key_filter():
+    keys = ["key" + str(i) for i in range(20)]
+    filter_bytes = Modules.indexstore_lib.key_filter(keys, 128)
+    assert len(filter_bytes) == 17
+    assert Modules.indexstore_lib.may_contain(filter_bytes, keys)
+    false_positives = sum(Modules.indexstore_lib.may_contain(filter_bytes, ["other" + str(i)]) for i in range(1000))
+    assert false_positives < 1000 * Modules.indexstore_lib.false_positive_rate(filter_bytes) * 2 + 20
+    empty = Modules.indexstore_lib.key_filter([])
+    assert not Modules.indexstore_lib.may_contain(empty, ["key0"])
+    assert Modules.indexstore_lib.may_contain(empty, [])
+
+
+def test_trigrams():
+    assert Modules.indexstore_lib.trigrams("abcab") == {"abc", "bca", "cab"}
+    assert Modules.indexstore_lib.trigrams("ab") == set()
+
+
+class Test_Index_Store:
+    """
+    Indexes have to survive updates, failed transactions and an export to the JSON layout.
+    """
+    @pytest.fixture(autouse = True)
+    def store(self, tmp_path):
+        self.store = Modules.indexstore_lib.IndexStore(str(tmp_path))
+        self.root_id = self.store.add_root("/data")
+        self.store.replace_index(self.root_id, SCAN, lambda path: {"name": os.path.basename(path)})
+        yield
+        self.store.close()
+
+    def test_load_index(self):
+        index = self.store.load_index(self.root_id)
+        assert index["files"] == ["/data/a.json", "/data/sub/b.json"]
+        assert index["file_stats"]["/data/a.json"] == (2, 10, 100)
+        assert index["dirs"] == SCAN["dirs"]
+        assert self.store.values("/data/sub/b.json") == {"name": "b.json"}
+        assert self.store.load_index(99) is None
+
+    def test_apply_delta(self):
+        scan = {"files": {"/data/a.json": (3, 11, 100), "/data/c.json": (1, 12, 102)}, "dirs": {"/data": 7}}
+        delta = {"added": ["/data/c.json"], "removed": ["/data/sub/b.json"], "modified": ["/data/a.json"]}
+        self.store.apply_delta(self.root_id, scan, delta, lambda path: {"v": "new"})
+        index = self.store.load_index(self.root_id)
+        assert index["file_stats"] == scan["files"]
+        assert index["dirs"] == scan["dirs"]
+        assert self.store.values("/data/a.json") == {"v": "new"}
+
+    def test_shards(self):
+        assert Modules.indexstore_lib.shard_of("/data", "/data/a.json") == ""
+        assert Modules.indexstore_lib.shard_of("/data", "/data/sub", True) == "sub"
+        assert self.store.shards(self.root_id) == {
+            "": {"dirs": 1, "files": 1, "bytes": 2, "max_mtime_ns": 10},
+            "sub": {"dirs": 1, "files": 1, "bytes": 4, "max_mtime_ns": 20}
+        }
+        assert self.store.load_shard(self.root_id, "sub") == {"files": {"/data/sub/b.json": (4, 20, 101)},
+                                                               "dirs": {"/data/sub": 6}}
+        self.store.replace_shard(self.root_id, "sub", {"files": {"/data/sub/x/c.json": (8, 30, 102)},
+                                                       "dirs": {"/data/sub": 7, "/data/sub/x": 8}})
+        assert self.store.files(self.root_id) == ["/data/a.json", "/data/sub/x/c.json"]
+        assert self.store.shards(self.root_id)["sub"] == {"dirs": 2, "files": 1, "bytes": 8, "max_mtime_ns": 30}
+        self.store.remove_shard(self.root_id, "sub")
+        assert list(self.store.shards(self.root_id)) == [""]
+        assert self.store.dirs(self.root_id) == {"/data": 5}
+
+    def test_apply_changes(self):
+        self.store.apply_changes(self.root_id, {"/data/sub/c.json": (1, 30, 103)}, ["/data/a.json"],
+                                 {"/data/sub": 8}, lambda path: {"name": "c"})
+        index = self.store.load_index(self.root_id)
+        assert index["files"] == ["/data/sub/b.json", "/data/sub/c.json"]
+        assert index["dirs"] == {"/data": 5, "/data/sub": 8}
+        ids = self.store.file_ids(self.root_id)
+        assert {row[0] for row in self.store._con.execute("SELECT value FROM terms")} == {"b.json", "c"}
+        assert self.store.match_files("name", "c") == {ids["/data/sub/c.json"][0]}
+
+    def test_match_files(self):
+        ids = self.store.file_ids(self.root_id)
+        assert self.store.match_files("name", ".json") == {ids["/data/a.json"][0], ids["/data/sub/b.json"][0]}
+        assert self.store.match_files("name", "b.") == {ids["/data/sub/b.json"][0]}
+        assert self.store.match_files("other", "b") == set()
+        self.store.remove_root(self.root_id)
+        assert self.store._con.execute("SELECT COUNT(*) FROM terms").fetchone()[0] == 0
+
+    def test_key_filters(self):
+        filters = self.store.key_filters(self.root_id)
+        assert Modules.indexstore_lib.may_contain(filters["/data/a.json"], ["name"])
+        stats = self.store.stats(self.root_id)
+        assert stats["files"] == stats["extracted"] == stats["filtered"] == 2
+        assert stats["key_filter_bytes"] == 2 * (1 + 256 // 8)
+        assert 0 < stats["false_positive_rate"] < 0.01
+        self.store.apply_changes(self.root_id, {"/data/a.json": (3, 40, 100)}, [], {})  # changed, not read again
+        assert list(self.store.key_filters(self.root_id)) == ["/data/sub/b.json"]
+
+    def test_values_not_kept(self, monkeypatch):
+        monkeypatch.setitem(Modules.indexstore_lib.store_defaults, "values", False)
+        self.store.apply_changes(self.root_id, {"/data/a.json": (3, 40, 100)}, [], {}, lambda path: {"id": "1"})
+        assert self.store.values("/data/a.json") is None
+        assert Modules.indexstore_lib.may_contain(self.store.key_filters(self.root_id)["/data/a.json"], ["id"])
+
+    def test_trigrams(self, monkeypatch):
+        ids = self.store.file_ids(self.root_id)
+        self.store.apply_changes(self.root_id, {"/data/c.json": (1, 50, 102)}, [], {},
+                                 lambda path: {"name": "report_2023.json", "id": "ab"})
+        grams = self.store._con.execute("SELECT COUNT(*) FROM trigrams").fetchone()[0]
+        assert grams > 0
+        c_id = self.store.file_ids(self.root_id)["/data/c.json"][0]
+        assert self.store.match_files("name", "_2023") == {c_id}
+        assert self.store.match_files("name", "json") == {ids["/data/a.json"][0], ids["/data/sub/b.json"][0], c_id}
+        assert self.store.match_files("name", "2024") == set()
+        assert self.store.match_files("id", "b") == {c_id}  # shorter than a trigram
+        monkeypatch.setitem(Modules.indexstore_lib.store_defaults, "trigrams", False)
+        assert self.store.match_files("name", "_2023") == {c_id}
+        assert self.store._con.execute("SELECT COUNT(*) FROM trigrams").fetchone()[0] == grams  # searches only read
+        assert not self.store.sync_trigrams()
+        assert self.store._con.execute("SELECT COUNT(*) FROM trigrams").fetchone()[0] == 0
+        monkeypatch.setitem(Modules.indexstore_lib.store_defaults, "trigrams", True)
+        assert self.store.match_files("name", "_2023") == {c_id}  # all values of the key compared
+        assert self.store._con.execute("SELECT COUNT(*) FROM trigrams").fetchone()[0] == 0
+        assert self.store.sync_trigrams()
+        assert self.store._con.execute("SELECT COUNT(*) FROM trigrams").fetchone()[0] == grams
+        self.store.remove_root(self.root_id)
+        assert self.store._con.execute("SELECT COUNT(*) FROM trigrams").fetchone()[0] == 0
+
+    def test_compatibility(self):
+        assert self.store.compatibility(self.root_id, "s.json", "h1") == {"/data/a.json": None, "/data/sub/b.json": None}
+        self.store.set_compatibility(self.root_id, "s.json", "h1", {"/data/a.json": True, "/data/sub/b.json": False})
+        assert self.store.compatibility_counts(self.root_id, {"s.json": "h1", "t.json": "h2"}) == \
+               {"s.json": (1, 2), "t.json": (0, 0)}
+        self.store.apply_changes(self.root_id, {"/data/a.json": (3, 40, 100)}, [], {})  # the file changed
+        assert self.store.compatibility(self.root_id, "s.json", "h1") == {"/data/a.json": None, "/data/sub/b.json": False}
+        assert self.store.compatibility(self.root_id, "s.json", "h2") == {"/data/a.json": None, "/data/sub/b.json": None}
+
+    def test_failed_update_rolls_back(self):
+        def broken(path):
+            raise RuntimeError("extraction failed")
+        with pytest.raises(RuntimeError):
+            self.store.replace_index(self.root_id, {"files": {"/data/x.json": (1, 1, 1)}, "dirs": {}}, broken)
+        assert self.store.files(self.root_id) == ["/data/a.json", "/data/sub/b.json"]
+
+    def test_export_json(self, tmp_path):
+        self.store.export_json(str(tmp_path / "export"))
+        with open(tmp_path / "export" / "Indexes" / "pyJSON_S_index.json", encoding = "utf8") as main_file:
+            assert json.load(main_file) == {"cur_index": 1, "/data": 1}
+        with open(tmp_path / "export" / "Indexes" / "index1.json", encoding = "utf8") as index_file:
+            index = json.load(index_file)
+        assert index["files"] == ["/data/a.json", "/data/sub/b.json"]
+        assert index["file_stats"]["/data/a.json"] == [2, 10, 100]
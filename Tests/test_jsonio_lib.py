@@ -7,7 +7,9 @@
 # Libraries
 # ----------------------------------------
 
-import Modules.jsonio_lib, Modules.ModifiedTreeModel, json
+import Modules.jsonio_lib, Modules.ModifiedTreeModel, Modules.TreeItem, json, os, shutil, tempfile
+import pytest
+from PySide6.QtCore import Qt, QModelIndex
 
 # ----------------------------------------
 # Variables and Functions
@@ -150,4 +152,150 @@ class Test_Py_To_Tree:
         self.tree.root_node.retrieve_child_by_index(2).retrieve_child_by_index(0).set_data(
             "Autodesk Inventor (.ipt, .iam, .ipn, .dwg, .idw)", 2)
         jsonFrame = Modules.jsonio_lib.tree_to_py(self.tree.root_node.childItems)
-        assert Modules.jsonio_lib.validator_vars(json.dumps(jsonFrame), "./Tests/Files/schema.json") == 0
\ No newline at end of file
+        assert Modules.jsonio_lib.validator_vars(json.dumps(jsonFrame), "./Tests/Files/schema.json") == 0
+
+    def test_validate_tree_success(self):
+        # same as above, but without the round trip over a string
+        self.tree.root_node.retrieve_child_by_index(2).retrieve_child_by_index(0).set_data(
+            "Autodesk Inventor (.ipt, .iam, .ipn, .dwg, .idw)", 2)
+        assert Modules.jsonio_lib.validate_tree(self.tree.root_node.childItems, "./Tests/Files/schema.json") == []
+
+class Test_Validator_Cache:
+    """
+    Tests for the LRU cache of compiled schema validators used by the validator functions.
+    """
+    def setup_method(self):
+        self.cache = Modules.jsonio_lib.SchemaValidatorCache(max_size = 2)
+
+    def test_cache_hit_and_miss(self):
+        first = self.cache.get("./Tests/Files/schema.json")
+        second = self.cache.get("./Tests/Files/schema.json")
+        assert first is second
+        assert self.cache.info()["hits"] == 1
+        assert self.cache.info()["misses"] == 1
+
+    def test_cache_lru_eviction(self, tmp_path):
+        for i in range(3):
+            with open(tmp_path / ("schema" + str(i) + ".json"), "w", encoding = "utf8") as out:
+                json.dump({"type": "object"}, out)
+            self.cache.get(str(tmp_path / ("schema" + str(i) + ".json")))
+        assert self.cache.info()["size"] == 2
+        self.cache.get(str(tmp_path / "schema0.json"))
+        assert self.cache.info()["misses"] == 4
+
+    def test_cache_schema_replaced(self, tmp_path):
+        schema_path = tmp_path / "schema.json"
+        with open(schema_path, "w", encoding = "utf8") as out:
+            json.dump({"type": "object"}, out)
+        assert self.cache.get(str(schema_path)).is_valid({})
+        with open(schema_path, "w", encoding = "utf8") as out:
+            json.dump({"type": "string", "description": "a replaced schema"}, out)
+        assert not self.cache.get(str(schema_path)).is_valid({})
+        assert self.cache.info()["size"] == 1
+
+    def test_validator_files_uses_cache(self):
+        Modules.jsonio_lib.validator_cache.clear()
+        Modules.jsonio_lib.validator_files("./Tests/Files/valid.json", "./Tests/Files/schema.json")
+        Modules.jsonio_lib.validator_files("./Tests/Files/invalid.json", "./Tests/Files/schema.json")
+        assert Modules.jsonio_lib.validator_cache.info()["hits"] == 1
+
+
+class Test_Validate_Object:
+    """
+    Tests for the in-memory validation API returning structured errors.
+    """
+    def setup_class(self):
+        self.schema_path = "./Tests/Files/schema.json"
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown_class(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_validate_object_success(self):
+        assert [] == Modules.jsonio_lib.validate_object(
+            Modules.jsonio_lib.decode_function("./Tests/Files/valid.json"), self.schema_path)
+
+    def test_validate_object_errors(self):
+        errors = Modules.jsonio_lib.validate_object(
+            Modules.jsonio_lib.decode_function("./Tests/Files/invalid.json"), self.schema_path)
+        assert errors[0]["kind"] == "validation"
+        assert errors[0]["path"] == ["misc"]
+        assert errors[0]["validator"] == "required"
+
+    def test_validate_object_error_cap(self):
+        schema = {"type": "object", "properties": {"a/b": {"type": "array", "items": {"type": "integer"}}}}
+        schema_path = os.path.join(self.tmp_dir, "capped.json")
+        with open(schema_path, "w", encoding = "utf8") as out:
+            json.dump(schema, out)
+        instance = {"a/b": ["x", "y", "z", 1]}
+        assert len(Modules.jsonio_lib.validate_object(instance, schema_path)) == 3
+        errors = Modules.jsonio_lib.validate_object(instance, schema_path, max_errors = 2)
+        assert [error["pointer"] for error in errors] == ["/a~1b/0", "/a~1b/1"]
+
+    def test_validate_file(self):
+        assert Modules.jsonio_lib.validate_file("./Tests/Files/valid.json", self.schema_path) == []
+        assert Modules.jsonio_lib.validate_file("./Tests/Files/invalid.json", self.schema_path)[0]["pointer"] == "/misc"
+        assert Modules.jsonio_lib.validate_file("./Tests/Files/missing.json", self.schema_path)[0]["kind"] == "io"
+
+    def test_validate_object_schema_errors(self):
+        assert Modules.jsonio_lib.validate_object({}, "./Tests/Files/invalid_schema.json")[0]["kind"] == "schema"
+        assert Modules.jsonio_lib.validate_object({}, "")[0]["kind"] == "io"
+
+
+class Test_Node_Validation:
+    """
+    Tests for the validation of single edited nodes against their schema fragment.
+    """
+    def setup_method(self):
+        self.tree = Modules.ModifiedTreeModel.ModifiedTreeClass(data = ["K", "Ti", "V", "Ty", "D"])
+        self.tree.add_node(self.tree.root_node, ["count", "Count", "", "integer", ""],
+                           metadata = {"type": "integer", "minimum": 0, "maximum": 10})
+        self.tree.add_node(self.tree.root_node, ["code", "Code", "", "string", ""],
+                           metadata = {"type": "string", "pattern": "^[A-Z]+$", "maxLength": 4})
+        self.tree.add_node(self.tree.root_node, ["tags", "Tags", "", "array", ""],
+                           metadata = {"type": "array", "items": {"type": "string", "enum": ["a", "b"]}})
+        self.tree.root_node.last_child().append_child(
+            Modules.TreeItem.TreeItem(parent = self.tree.root_node.last_child(), data = ["", "", "a", "string", ""]))
+
+    def test_validate_node_bounds(self):
+        item = self.tree.root_node.retrieve_child_by_index(0)
+        assert self.tree.validate_node(item, "5") is None
+        assert self.tree.validate_node(item, "11") is not None
+
+    def test_validate_node_type(self):
+        with pytest.raises(ValueError):
+            self.tree.validate_node(self.tree.root_node.retrieve_child_by_index(0), "five")
+
+    def test_validate_node_string(self):
+        item = self.tree.root_node.retrieve_child_by_index(1)
+        assert self.tree.validate_node(item, "ABC") is None
+        assert self.tree.validate_node(item, "abc") is not None
+        assert self.tree.validate_node(item, "ABCDE") is not None
+
+    def test_validate_node_array_item(self):
+        item = self.tree.root_node.retrieve_child_by_index(2).retrieve_child_by_index(0)
+        assert self.tree.validate_node(item, "b") is None
+        assert self.tree.validate_node(item, "c") is not None
+
+    def test_validate_node_draft(self):
+        tree = Modules.ModifiedTreeModel.ModifiedTreeClass(
+            data = ["K", "Ti", "V", "Ty", "D"], root_schema = {"$schema": "http://json-schema.org/draft-04/schema#"})
+        tree.add_node(tree.root_node, ["ratio", "Ratio", "", "number", ""],
+                      metadata = {"type": "number", "maximum": 1, "exclusiveMaximum": True})
+        item = tree.root_node.retrieve_child_by_index(0)
+        assert tree.validate_node(item, "0.5") is None
+        assert tree.validate_node(item, "1") is not None  # draft-04 reads the boolean as an exclusive maximum
+
+    def test_mark_errors(self):
+        self.tree.mark_errors([{"path": ["count"], "message": "too large"},
+                               {"path": ["tags", 0], "message": "not in enum"},
+                               {"path": ["tags", 5, "x"], "message": "missing"}])
+        count = self.tree.index(0, 2, QModelIndex())
+        tags = self.tree.index(2, 2, QModelIndex())
+        assert self.tree.data(count, Qt.BackgroundRole) is not None
+        assert self.tree.data(count, Qt.ToolTipRole) == "too large"
+        assert self.tree.data(self.tree.index(1, 2, QModelIndex()), Qt.BackgroundRole) is None
+        assert self.tree.data(tags, Qt.ToolTipRole) == "missing"
+        assert self.tree.data(self.tree.index(0, 2, self.tree.index(2, 0, QModelIndex())), Qt.ToolTipRole) == "not in enum"
+        self.tree.mark_errors([])
+        assert self.tree.data(count, Qt.BackgroundRole) is None
@@ -7,8 +7,9 @@
 # Libraries
 # ----------------------------------------
 
-import Modules.jsonio_lib, Modules.jsonsearch_lib
-import json
+import Modules.indexstore_lib, Modules.jsonio_lib, Modules.jsonsearch_lib, Modules.progress_lib, Modules.resultcache_lib
+import io, json, os, shutil
+import pytest
 
 # ----------------------------------------
 # Variables and Functions
@@ -29,3 +30,287 @@ class Test_flatten_nested_dicts:
                                        'start_date', 'constructor', 'engineer', 'tags0', 'tags1', 'tags2', 'title',
                                        'department', 'cost_unit', 'revision_number'}
 
+    def test_flatter_keeps_source(self):
+        json_dict = Modules.jsonio_lib.decode_function(self.json_path)
+        flatted_dict = Modules.jsonsearch_lib.dict_flatten_dict(json_dict, consume = False)
+        assert json_dict == Modules.jsonio_lib.decode_function(self.json_path)
+        assert flatted_dict == Modules.jsonsearch_lib.dict_flatten_dict(json_dict)
+
+
+
+class Test_schema_matching_search:
+    def setup_class(self):
+        self.index = ["./Tests/Files/valid.json", "./Tests/Files/invalid.json", "./Tests/Files/valid.json",
+                      "./Tests/Files/invalid_schema.json", "./Tests/Files/missing.json"]
+
+    def test_schema_matching_serial(self, tmp_path):
+        os.mkdir(tmp_path / "Schemas")
+        shutil.copyfile("./Tests/Files/schema.json", tmp_path / "Schemas" / "schema.json")
+        result = Modules.jsonsearch_lib.schema_matching_search(self.index, "schema.json", str(tmp_path), workers = 1)
+        assert result == ["./Tests/Files/valid.json", "./Tests/Files/valid.json"]
+
+    def test_schema_matching_parallel_order(self):
+        results = list(Modules.jsonsearch_lib.iter_validation_results(self.index, "./Tests/Files/schema.json",
+                                                                       workers = 2, chunk_size = 1))
+        assert [r["path"] for r in results] == self.index
+        assert [r["status"] for r in results] == ["valid", "invalid", "valid", "invalid", "io_error"]
+
+
+class Test_batch_validate:
+    def test_batch_validate_lines(self):
+        out = io.StringIO()
+        index = ["./Tests/Files/valid.json", "./Tests/Files/invalid.json"]
+        assert 1 == Modules.jsonsearch_lib.batch_validate(index, "./Tests/Files/schema.json", workers = 1, out = out)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [line["status"] for line in lines[:2]] == ["valid", "invalid"]
+        assert lines[2]["summary"]["files"] == 2
+        assert lines[2]["summary"]["valid"] == 1
+
+    def test_batch_validate_bad_schema(self):
+        assert 2 == Modules.jsonsearch_lib.batch_validate([], "./Tests/Files/missing.json", out = io.StringIO())
+
+
+class Test_check_index:
+    def test_incremental_refresh(self, tmp_path):
+        script_dir = tmp_path / "tool"
+        data_dir = tmp_path / "data"
+        os.makedirs(script_dir / "Indexes")
+        os.makedirs(data_dir / "sub")
+        shutil.copy("./Tests/Files/valid.json", data_dir / "first.json")
+        shutil.copy("./Tests/Files/valid.json", data_dir / "sub" / "second.json")
+        index_dict = {"cur_index": 0}
+        Modules.jsonsearch_lib.start_index(str(script_dir), str(data_dir), index_dict, show_boxes = False)
+        assert index_dict[str(data_dir)] == 1
+        os.remove(data_dir / "first.json")
+        shutil.copy("./Tests/Files/invalid.json", data_dir / "sub" / "third.json")
+        delta = Modules.jsonsearch_lib.check_index(str(script_dir), str(data_dir), index_dict)
+        assert delta["removed"] == [os.path.normpath(str(data_dir / "first.json"))]
+        assert delta["added"] == [os.path.normpath(str(data_dir / "sub" / "third.json"))]
+        store = Modules.indexstore_lib.open_store(str(script_dir))
+        assert store.files(1) == [os.path.normpath(str(data_dir / "sub" / "second.json")),
+                                  os.path.normpath(str(data_dir / "sub" / "third.json"))]
+        assert store.values(os.path.normpath(str(data_dir / "sub" / "third.json")))["constructor"] == "Max Mustermann"
+        shutil.rmtree(data_dir / "sub")
+        delta = Modules.jsonsearch_lib.check_index(str(script_dir), str(data_dir), index_dict)
+        assert len(delta["removed"]) == 2
+        assert store.files(1) == [] and "sub" not in store.shards(1)
+
+    def test_legacy_index_migrated(self, tmp_path):
+        os.makedirs(tmp_path / "Indexes")
+        with open(tmp_path / "Indexes" / "pyJSON_S_index.json", "w", encoding = "utf8") as out:
+            json.dump({"cur_index": 3, "./Tests/Files": 3}, out)
+        with open(tmp_path / "Indexes" / "index3.json", "w", encoding = "utf8") as out:
+            json.dump({"files": ["./Tests/Files/valid.json"]}, out)
+        store = Modules.indexstore_lib.open_store(str(tmp_path))
+        index_dict = store.main_index()
+        assert index_dict == {"cur_index": 3, "./Tests/Files": 3}
+        assert store.files(3) == ["./Tests/Files/valid.json"]
+        assert store.needs_rebuild(3)
+        assert Modules.jsonsearch_lib.check_index(str(tmp_path), "./Tests/Files", index_dict) is None  # rebuilt
+        assert len(store.files(3)) == 4 and not store.needs_rebuild(3)
+        assert store.load_index(3)["dirs"]
+        assert store.add_root("elsewhere") == 4
+
+
+    def test_empty_index_refreshed(self, tmp_path, monkeypatch):
+        data_dir = tmp_path / "data"
+        os.makedirs(data_dir)
+        store = Modules.indexstore_lib.open_store(str(tmp_path / "tool"))
+        index_dict = {"cur_index": 0, str(data_dir): store.add_root(str(data_dir))}
+        store.replace_index(1, {"files": {}, "dirs": {}})  # e.g. the directory was not readable while indexing
+        monkeypatch.setattr(Modules.jsonsearch_lib, "start_index", lambda *args: pytest.fail("index rebuilt"))
+        delta = Modules.jsonsearch_lib.check_index(str(tmp_path / "tool"), str(data_dir), index_dict)
+        assert delta == {"added": [], "removed": [], "modified": []}
+        assert store.shards(1)[""]["dirs"] == 1
+
+
+class Test_indexed_search:
+    def test_matches_f_search(self, tmp_path):
+        script_dir = tmp_path / "tool"
+        data_dir = tmp_path / "data"
+        os.makedirs(data_dir)
+        shutil.copy("./Tests/Files/valid.json", data_dir / "valid.json")
+        shutil.copy("./Tests/Files/invalid.json", data_dir / "invalid.json")
+        index_dict = {"cur_index": 0}
+        Modules.jsonsearch_lib.start_index(str(script_dir), str(data_dir), index_dict, show_boxes = False)
+        store = Modules.indexstore_lib.open_store(str(script_dir))
+        files = store.files(1)
+        for search_dict in ({}, {"constructor": "Mustermann"}, {"type_of_file": "Inventor"},
+                            {"constructor": "Max", "tags1": "Tag2"}, {"title": "missing"}):
+            expected = Modules.jsonsearch_lib.f_search(files, search_dict)
+            assert Modules.jsonsearch_lib.indexed_search(files, search_dict, store, 1) == expected
+
+    def test_unreadable_file_not_extracted(self, tmp_path, monkeypatch):
+        script_dir = tmp_path / "tool"
+        data_dir = tmp_path / "data"
+        os.makedirs(data_dir)
+        shutil.copy("./Tests/Files/valid.json", data_dir / "valid.json")
+
+        def locked(path, *args, **kwargs):
+            raise PermissionError(13, "Permission denied", path)
+
+        monkeypatch.setattr(Modules.jsonsearch_lib, "open", locked, raising = False)  # e.g. locked on a share
+        Modules.jsonsearch_lib.start_index(str(script_dir), str(data_dir), {"cur_index": 0}, show_boxes = False)
+        monkeypatch.undo()
+        store = Modules.indexstore_lib.open_store(str(script_dir))
+        files = store.files(1)
+        assert store.key_filters(1) == {} and store.values(files[0]) is None  # left unextracted
+        assert Modules.jsonsearch_lib.indexed_search(files, {"constructor": "Mustermann"}, store, 1) == files
+
+    def test_unindexed_files_opened(self, tmp_path):
+        store = Modules.indexstore_lib.IndexStore(str(tmp_path))
+        files = ["./Tests/Files/valid.json", "./Tests/Files/invalid.json"]
+        result = Modules.jsonsearch_lib.indexed_search(files, {"type_of_file": "Autodesk"}, store, 1)
+        store.close()
+        assert result == ["./Tests/Files/valid.json"]
+
+    def test_key_filters_prune(self, tmp_path, monkeypatch):
+        data_dir = tmp_path / "data"
+        os.makedirs(data_dir)
+        shutil.copy("./Tests/Files/valid.json", data_dir / "valid.json")
+        with open(data_dir / "other.json", "w", encoding = "utf8") as out:
+            json.dump({"title": "Autodesk"}, out)
+        monkeypatch.setitem(Modules.indexstore_lib.store_defaults, "values", False)
+        index_dict = {"cur_index": 0}
+        Modules.jsonsearch_lib.start_index(str(tmp_path / "tool"), str(data_dir), index_dict, show_boxes = False)
+        store = Modules.indexstore_lib.open_store(str(tmp_path / "tool"))
+        files = store.files(1)
+        opened = []
+        monkeypatch.setattr(Modules.jsonsearch_lib, "f_search",
+                            lambda search_index, search_dict: opened.extend(search_index) or search_index)
+        result = Modules.jsonsearch_lib.indexed_search(files, {"type_of_file": "Autodesk"}, store, 1)
+        assert opened == result == [os.path.normpath(str(data_dir / "valid.json"))]
+
+
+class Test_schema_compatibility:
+    def test_stale_pairs_only(self, tmp_path):
+        script_dir = tmp_path / "tool"
+        data_dir = tmp_path / "data"
+        os.makedirs(script_dir / "Schemas")
+        os.makedirs(data_dir)
+        shutil.copyfile("./Tests/Files/schema.json", script_dir / "Schemas" / "schema.json")
+        shutil.copy("./Tests/Files/valid.json", data_dir / "valid.json")
+        shutil.copy("./Tests/Files/invalid.json", data_dir / "invalid.json")
+        index_dict = {"cur_index": 0}
+        Modules.jsonsearch_lib.start_index(str(script_dir), str(data_dir), index_dict, show_boxes = False)
+        store = Modules.indexstore_lib.open_store(str(script_dir))
+        files = store.files(1)
+        digest = Modules.resultcache_lib.schema_hash(str(script_dir / "Schemas" / "schema.json"))
+        assert store.compatibility_counts(1, {"schema.json": digest}) == {"schema.json": (1, 2)}  # by the indexer
+
+        expected = Modules.jsonsearch_lib.schema_matching_search(files, "schema.json", str(script_dir), workers = 1)
+        validated = []
+        original = Modules.jsonsearch_lib.iter_validation_results
+
+        def counting(index, *args, **kwargs):
+            validated.extend(index)
+            return original(index, *args, **kwargs)
+
+        Modules.jsonsearch_lib.iter_validation_results = counting
+        try:
+            assert Modules.jsonsearch_lib.indexed_schema_match(files, "schema.json", str(script_dir), 1) == expected
+            assert validated == []  # a lookup
+            shutil.copy("./Tests/Files/valid.json", data_dir / "invalid.json")
+            Modules.jsonsearch_lib.check_index(str(script_dir), str(data_dir), index_dict)
+            assert validated == [os.path.normpath(str(data_dir / "invalid.json"))]
+        finally:
+            Modules.jsonsearch_lib.iter_validation_results = original
+        assert len(Modules.jsonsearch_lib.indexed_schema_match(files, "schema.json", str(script_dir), 1)) == 2
+
+
+class Test_iter_search:
+    """
+    The streamed search has to find the same files as the schema match followed by the value search.
+    """
+    @pytest.fixture(autouse = True)
+    def indexed(self, tmp_path):
+        self.script_dir = tmp_path / "tool"
+        self.data_dir = tmp_path / "data"
+        os.makedirs(self.script_dir / "Schemas")
+        os.makedirs(self.data_dir)
+        shutil.copyfile("./Tests/Files/schema.json", self.script_dir / "Schemas" / "schema.json")
+        for name in ["a", "b", "c"]:
+            shutil.copy("./Tests/Files/valid.json", self.data_dir / (name + ".json"))
+        shutil.copy("./Tests/Files/invalid.json", self.data_dir / "invalid.json")
+        Modules.jsonsearch_lib.start_index(str(self.script_dir), str(self.data_dir), {"cur_index": 0},
+                                           show_boxes = False)
+        self.store = Modules.indexstore_lib.open_store(str(self.script_dir))
+        self.files = self.store.files(1)
+
+    def test_matches_batch_search(self):
+        for search_dict in ({}, {"constructor": "Mustermann"}, {"title": "missing"}):
+            expected = Modules.jsonsearch_lib.indexed_search(
+                Modules.jsonsearch_lib.indexed_schema_match(self.files, "schema.json", str(self.script_dir), 1),
+                search_dict, self.store, 1)
+            assert list(Modules.jsonsearch_lib.iter_search(self.files, "schema.json", str(self.script_dir), 1,
+                                                           search_dict, workers = 1)) == expected
+
+    def test_stale_files_validated(self):
+        with self.store._con:  # forget the recorded compatibility
+            self.store._con.execute("DELETE FROM compat")
+        found = list(Modules.jsonsearch_lib.iter_search(self.files, "schema.json", str(self.script_dir), 1, {},
+                                                        workers = 1))
+        assert len(found) == 3
+        digest = Modules.resultcache_lib.schema_hash(str(self.script_dir / "Schemas" / "schema.json"))
+        assert self.store.compatibility_counts(1, {"schema.json": digest}) == {"schema.json": (3, 4)}
+
+    def test_shards_and_pages(self):
+        for shard in ["first", "second"]:
+            os.makedirs(self.data_dir / shard)
+            for name in ["a", "b", "c"]:
+                shutil.copy("./Tests/Files/valid.json", self.data_dir / shard / (name + ".json"))
+        Modules.jsonsearch_lib.check_index(str(self.script_dir), str(self.data_dir), {"cur_index": 1,
+                                                                                    str(self.data_dir): 1})
+        files = self.store.files(1)
+        with self.store._con:  # the new files are validated, the others recorded
+            self.store._con.execute("DELETE FROM compat WHERE file_id IN (SELECT id FROM files WHERE shard != '')")
+        for search_dict in ({}, {"constructor": "Mustermann"}, {"title": "missing"}):
+            expected = Modules.jsonsearch_lib.indexed_search(
+                Modules.jsonsearch_lib.indexed_schema_match(files, "schema.json", str(self.script_dir), 1),
+                search_dict, self.store, 1)
+            with self.store._con:
+                self.store._con.execute("DELETE FROM compat WHERE file_id IN (SELECT id FROM files WHERE shard != '')")
+            found = list(Modules.jsonsearch_lib.iter_search(None, "schema.json", str(self.script_dir), 1, search_dict,
+                                                            workers = 1, page_size = 2))
+            assert sorted(found) == sorted(expected) and len(found) == len(set(found))
+
+    def test_cancel(self):
+        token = Modules.progress_lib.CancelToken()
+        found = []
+        with pytest.raises(Modules.progress_lib.Cancelled):
+            for path in Modules.jsonsearch_lib.iter_search(self.files, "schema.json", str(self.script_dir), 1, {},
+                                                           workers = 1, cancel = token):
+                found.append(path)
+                token.cancel()
+        assert len(found) == 1
+
+
+class Test_pipeline_search:
+    """
+    The single pass search has to find the same files as the schema match followed by the value search, and validate
+    only the files holding the search terms.
+    """
+    def setup_class(self):
+        self.index = ["./Tests/Files/valid.json", "./Tests/Files/invalid.json", "./Tests/Files/valid.json",
+                      "./Tests/Files/invalid_schema.json", "./Tests/Files/missing.json"]
+
+    def test_matches_two_pass_search(self, tmp_path):
+        os.mkdir(tmp_path / "Schemas")
+        shutil.copyfile("./Tests/Files/schema.json", tmp_path / "Schemas" / "schema.json")
+        for search_dict in ({}, {"constructor": "Mustermann"}, {"type_of_file": "Inventor"}, {"title": "missing"}):
+            expected = Modules.jsonsearch_lib.f_search(Modules.jsonsearch_lib.schema_matching_search(
+                self.index, "schema.json", str(tmp_path), workers = 1, use_cache = False), search_dict)
+            for workers in (1, 2):
+                assert Modules.jsonsearch_lib.pipeline_search(self.index, "schema.json", str(tmp_path), search_dict,
+                                                              workers = workers, chunk_size = 1) == expected
+
+    def test_timings(self):
+        timings = {}
+        results = list(Modules.jsonsearch_lib.iter_pipeline(self.index, "./Tests/Files/schema.json",
+                                                            {"title": "missing"}, workers = 2, chunk_size = 2,
+                                                            timings = timings))
+        assert [r["status"] for r in results] == ["unmatched", "unmatched", "unmatched", "unmatched", "io_error"]
+        assert {stage: entry["files"] for stage, entry in timings.items()} == \
+               {"read": 5, "parse": 4, "match": 4, "validate": 0}
+        assert all(entry["seconds"] >= 0 for entry in timings.values())
+        assert Modules.jsonsearch_lib.format_timings(timings).startswith("read 5 files in ")
@@ -0,0 +1,87 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Live Index Maintenance Test Module
+# author: N. Plathe
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+
+import Modules.indexstore_lib, Modules.jsonsearch_lib, Modules.livewatch_lib
+import json, os, shutil, sys, time
+import pytest
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+def wait_for(condition, timeout = 10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class Test_Live_Indexer:
+    """
+    Changes of indexed directories have to reach the index store without a manual check.
+    """
+    @pytest.fixture(autouse = True)
+    def indexed(self, tmp_path):
+        self.script_dir = str(tmp_path / "tool")
+        self.data_dir = tmp_path / "data"
+        os.makedirs(self.data_dir)
+        shutil.copy("./Tests/Files/valid.json", self.data_dir / "first.json")
+        self.index_dict = {"cur_index": 0}
+        Modules.jsonsearch_lib.start_index(self.script_dir, str(self.data_dir), self.index_dict, show_boxes = False)
+        self.store = Modules.indexstore_lib.IndexStore(self.script_dir)
+        yield
+        self.store.close()
+
+    def run_indexer(self, use_inotify, change):
+        indexer = Modules.livewatch_lib.LiveIndexer(self.script_dir, self.index_dict, debounce = 0.1,
+                                                    poll_interval = 0.2, use_inotify = use_inotify)
+        indexer.start()
+        try:
+            time.sleep(0.3)  # let the watches be set up
+            change()
+            return wait_for(lambda: self.store.files(1) == [str(self.data_dir / "second.json")] and
+                            self.store.values(str(self.data_dir / "second.json")) == {"name": "changed"})
+        finally:
+            indexer.stop()
+            indexer.join()
+
+    def change(self):
+        os.remove(self.data_dir / "first.json")
+        with open(self.data_dir / "second.json", "w", encoding = "utf8") as out:
+            json.dump({"name": "initial"}, out)
+        with open(self.data_dir / "second.json", "w", encoding = "utf8") as out:
+            json.dump({"name": "changed"}, out)
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason = "inotify is only available on Linux")
+    def test_inotify(self):
+        assert self.run_indexer(True, self.change)
+
+    def test_polling(self):
+        assert self.run_indexer(False, self.change)
+
+    def test_overflow_rescans(self):
+        indexer = Modules.livewatch_lib.LiveIndexer(self.script_dir, self.index_dict)
+        indexer._watched[str(self.data_dir)] = {str(self.data_dir): 1}
+        shutil.copy("./Tests/Files/valid.json", self.data_dir / "second.json")
+        indexer._handle_events([(None, "", Modules.livewatch_lib.IN_Q_OVERFLOW)])
+        assert indexer._pending[str(self.data_dir)]["rescan"]
+        indexer._apply(self.store)
+        assert len(self.store.files(1)) == 2
+        assert not indexer._pending
+
+    def test_events_coalesced(self):
+        indexer = Modules.livewatch_lib.LiveIndexer(self.script_dir, self.index_dict, debounce = 60)
+        indexer._watched[str(self.data_dir)] = {str(self.data_dir): 1}
+        event = (str(self.data_dir), "first.json", Modules.livewatch_lib.IN_MODIFY)
+        indexer._handle_events([event, event, (str(self.data_dir), "notes.txt", Modules.livewatch_lib.IN_CREATE)])
+        assert indexer._pending[str(self.data_dir)]["paths"] == {str(self.data_dir / "first.json"),
+                                                                 str(self.data_dir / "notes.txt")}
+        assert not indexer._due()
@@ -0,0 +1,108 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Indexing Progress Test Module
+# author: N. Plathe
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+
+import Modules.indexstore_lib, Modules.jsonsearch_lib, Modules.progress_lib, Modules.watchdog_lib
+import io, os, shutil
+import pytest
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for rel_path in ["a.json", "first/b.json", "first/c.json", "second/d.json", "second/deeper/e.json"]:
+        os.makedirs(os.path.dirname(tmp_path / "data" / rel_path), exist_ok = True)
+        shutil.copy("./Tests/Files/valid.json", tmp_path / "data" / rel_path)
+    return tmp_path / "data"
+
+
+class Test_Index_Progress:
+    """
+    Snapshots estimate the time left once the pace is known, and a cancelled token stops the next update.
+    """
+    def test_snapshot(self):
+        tracker = Modules.progress_lib.IndexProgress("/data")
+        assert tracker.snapshot()["eta"] is None
+        tracker.shards_total = 4
+        tracker.scanned({"files": {"/data/a.json": (10, 0, 0), "/data/b.json": (10, 0, 0)}})
+        tracker.indexed(10)
+        snapshot = tracker.snapshot()
+        assert (snapshot["phase"], snapshot["found"], snapshot["files"], snapshot["bytes"]) == ("indexing", 2, 1, 10)
+        assert snapshot["files_per_second"] > 0 and snapshot["eta"] > 0
+        tracker.expected_files = 20
+        assert tracker.snapshot()["eta"] > snapshot["eta"]  # 19 files left instead of 7 estimated from the shards
+        assert tracker.finish("done")["eta"] == 0.0
+
+    def test_cancel(self):
+        token = Modules.progress_lib.CancelToken()
+        tracker = Modules.progress_lib.IndexProgress("/data", cancel = token)
+        tracker.indexed(1)
+        token.cancel()
+        with pytest.raises(Modules.progress_lib.Cancelled):
+            tracker.indexed(1)
+        assert tracker.finish("cancelled")["files"] == 2
+
+    def test_print_progress(self):
+        out = io.StringIO()
+        callback = Modules.progress_lib.print_progress(interval = 60, out = out)
+        snapshot = {"path": "/data", "phase": "indexing", "found": 3400, "files": 1200, "bytes": 35200000,
+                    "elapsed": 3.0, "files_per_second": 400.0, "eta": 5.4}
+        callback(snapshot)
+        callback(snapshot)  # within the interval
+        callback(dict(snapshot, phase = "done"))
+        assert out.getvalue().splitlines() == [
+            "Indexing /data: 1200 of 3400 files, 35.2 MB, 400.0 files/s, 5 s left",
+            "Done /data: 1200 of 3400 files, 35.2 MB, 400.0 files/s, 3.0 s"
+        ]
+
+
+def test_start_index_progress(tmp_path, data_dir):
+    snapshots = []
+    index_dict = {"cur_index": 0}
+    result = Modules.jsonsearch_lib.start_index(str(tmp_path / "tool"), str(data_dir), index_dict, False,
+                                                progress = snapshots.append)
+    assert result["phase"] == "done" and result["files"] == result["found"] == 5
+    assert result["bytes"] == 5 * os.path.getsize("./Tests/Files/valid.json")
+    assert snapshots[-1] == result
+
+
+def test_start_index_cancelled(tmp_path, data_dir, monkeypatch):
+    token = Modules.progress_lib.CancelToken()
+    extract_values = Modules.jsonsearch_lib.extract_values
+    extracted = []
+
+    def cancel_in_second_shard(path):
+        extracted.append(path)
+        if len(extracted) == 2:
+            token.cancel()
+        return extract_values(path)
+
+    monkeypatch.setattr(Modules.jsonsearch_lib, "extract_values", cancel_in_second_shard)
+    index_dict = {"cur_index": 0}
+    script_dir = str(tmp_path / "tool")
+    result = Modules.jsonsearch_lib.start_index(script_dir, str(data_dir), index_dict, False, cancel = token)
+    store = Modules.indexstore_lib.open_store(script_dir)
+    assert result["phase"] == "cancelled"
+    assert index_dict[str(data_dir)] == 1
+    assert store.files(1) == [str(data_dir / "a.json")]  # the shard being indexed is left as it was
+    monkeypatch.undo()
+    Modules.jsonsearch_lib.check_index(script_dir, str(data_dir), index_dict)
+    assert len(store.files(1)) == 5
+
+
+def test_index_thread(tmp_path, data_dir):
+    thread = Modules.watchdog_lib.IndexThread(str(tmp_path / "tool"), str(data_dir), {"cur_index": 0})
+    progress = []
+    indexed = []
+    thread.progress.connect(progress.append)
+    thread.indexed.connect(lambda main_index, result: indexed.append((main_index, result["phase"])))
+    thread.run()  # synchronously, the signals are delivered directly
+    assert progress[-1]["phase"] == "done"
+    assert indexed == [({"cur_index": 1, str(data_dir): 1}, "done")]
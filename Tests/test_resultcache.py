@@ -0,0 +1,61 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Validation Result Cache Test Module
+# author: N. Plathe
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+
+import Modules.jsonio_lib, Modules.jsonsearch_lib, Modules.resultcache_lib
+import json, os, shutil
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+class Test_Result_Cache:
+    """
+    Tests for the persistent validation result cache and its use by the validation engine.
+    """
+    def setup_method(self, method):
+        self.files = []
+
+    def _prepare(self, tmp_path):
+        for name in ("valid.json", "invalid.json"):
+            shutil.copyfile("./Tests/Files/" + name, tmp_path / name)
+            self.files.append(str(tmp_path / name))
+        os.mkdir(tmp_path / "Schemas")
+        shutil.copyfile("./Tests/Files/schema.json", tmp_path / "Schemas" / "schema.json")
+        return str(tmp_path / "Schemas" / "schema.json")
+
+    def test_results_reused(self, tmp_path):
+        schema_path = self._prepare(tmp_path)
+        cache = Modules.resultcache_lib.ValidationResultCache(str(tmp_path))
+        first = list(Modules.jsonsearch_lib.iter_validation_results(self.files, schema_path, workers = 1,
+                                                                     result_cache = cache))
+        second = list(Modules.jsonsearch_lib.iter_validation_results(self.files, schema_path, workers = 1,
+                                                                      result_cache = cache))
+        assert [r["cached"] for r in first] == [False, False]
+        assert [r["cached"] for r in second] == [True, True]
+        assert [r["status"] for r in second] == ["valid", "invalid"]
+
+    def test_changed_file_revalidated(self, tmp_path):
+        schema_path = self._prepare(tmp_path)
+        cache = Modules.resultcache_lib.ValidationResultCache(str(tmp_path))
+        list(Modules.jsonsearch_lib.iter_validation_results(self.files, schema_path, workers = 1, result_cache = cache))
+        with open(self.files[1], "w", encoding = "utf8") as out:
+            json.dump(Modules.jsonio_lib.decode_function(self.files[0]), out)
+        results = list(Modules.jsonsearch_lib.iter_validation_results(self.files, schema_path, workers = 1,
+                                                                       result_cache = cache))
+        assert [r["cached"] for r in results] == [True, False]
+        assert [r["status"] for r in results] == ["valid", "valid"]
+
+    def test_invalidate_schema(self, tmp_path):
+        schema_path = self._prepare(tmp_path)
+        cache = Modules.resultcache_lib.ValidationResultCache(str(tmp_path))
+        list(Modules.jsonsearch_lib.iter_validation_results(self.files, schema_path, workers = 1, result_cache = cache))
+        digest = Modules.resultcache_lib.schema_hash(schema_path)
+        assert len(cache.lookup("schema.json", digest)) == 2
+        cache.invalidate_schema("schema.json")
+        assert len(cache.lookup("schema.json", digest)) == 0
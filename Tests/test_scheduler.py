@@ -0,0 +1,118 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Refresh Scheduler Test Module
+# author: N. Plathe
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+
+import Modules.jsonsearch_lib, Modules.scheduler_lib
+import os, shutil, threading, time
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+class Test_Refresh_All:
+    """
+    Refreshes run concurrently within the limits, and a failing directory only affects its own report.
+    """
+    def test_limits(self, monkeypatch):
+        devices = {"a1": 1, "a2": 1, "a3": 1, "b1": 2, "b2": 2, "c1": 3}
+        monkeypatch.setattr(Modules.scheduler_lib, "_device", devices.__getitem__)
+        lock = threading.Lock()
+        running = []
+        peaks = {"all": 0, 1: 0, 2: 0, 3: 0}
+
+        def refresh(path):
+            with lock:
+                running.append(devices[path])
+                peaks["all"] = max(peaks["all"], len(running))
+                peaks[devices[path]] = max(peaks[devices[path]], running.count(devices[path]))
+            time.sleep(0.05)
+            with lock:
+                running.remove(devices[path])
+            if path == "b1":
+                raise OSError("share is gone")
+            return path.upper()
+
+        report = Modules.scheduler_lib.refresh_all(list(devices), refresh, workers = 3, per_device = 1)
+        assert peaks == {"all": 3, 1: 1, 2: 1, 3: 1}
+        assert report["a3"]["result"] == "A3" and report["a3"]["error"] is None
+        assert report["b1"]["error"] == "OSError: share is gone"
+        assert report["b2"]["result"] == "B2"
+        assert all(entry["seconds"] >= 0.05 for entry in report.values())
+
+    def test_missing_directory(self, tmp_path):
+        progress = []
+        report = Modules.scheduler_lib.refresh_all([str(tmp_path), str(tmp_path / "missing")], lambda path: True,
+                                                   progress = lambda *args: progress.append(args))
+        assert report[str(tmp_path)]["result"] is True
+        assert report[str(tmp_path / "missing")]["error"].startswith("FileNotFoundError")
+        assert progress == [(0, 2, str(tmp_path)), (2, 2, "")] or progress == [(1, 2, str(tmp_path)), (2, 2, "")]
+
+
+    def test_hanging_device_lookup(self, monkeypatch):
+        release = threading.Event()
+        device = Modules.scheduler_lib._device
+
+        def hanging_device(path):
+            if path.startswith("hung"):
+                release.wait()
+            return 1 if path.startswith("hung") else device(path)
+
+        monkeypatch.setattr(Modules.scheduler_lib, "_device", hanging_device)
+        try:
+            report = Modules.scheduler_lib.refresh_all(["hung1", "hung2", "."], lambda path: True, workers = 2,
+                                                       stat_timeout = 0.2)
+        finally:
+            release.set()
+        assert report["."]["result"] is True
+        assert all(report[path]["error"].startswith("TimeoutError") for path in ("hung1", "hung2"))
+
+
+    def test_hanging_refresh(self, tmp_path):
+        release = threading.Event()
+        hung = str(tmp_path / "hung")
+        paths = [hung] + [str(tmp_path / name) for name in ("a", "b", "c")]
+        for path in paths:
+            os.makedirs(path)
+
+        def refresh(path):
+            if path == hung:
+                release.wait()  # a dead mount, never returns on its own
+            return True
+
+        start = time.perf_counter()
+        try:
+            report = Modules.scheduler_lib.refresh_all(paths, refresh, workers = 2, per_device = 2, timeout = 0.2)
+        finally:
+            release.set()
+        assert time.perf_counter() - start < 5
+        assert report[hung]["error"].startswith("TimeoutError")
+        assert all(report[path]["result"] is True for path in paths[1:])
+
+    def test_all_workers_hanging(self, tmp_path):
+        release = threading.Event()
+        paths = [str(tmp_path / name) for name in ("a", "b")]
+        for path in paths:
+            os.makedirs(path)
+        try:
+            report = Modules.scheduler_lib.refresh_all(paths, lambda path: release.wait(), workers = 1,
+                                                       timeout = 0.1)
+        finally:
+            release.set()
+        assert all(report[path]["error"].startswith("TimeoutError") for path in paths)
+
+def test_watchdog_report(tmp_path):
+    script_dir = str(tmp_path / "tool")
+    index_dict = {"cur_index": 0}
+    for name in ["first", "second"]:
+        os.makedirs(tmp_path / name)
+        shutil.copy("./Tests/Files/valid.json", tmp_path / name / "valid.json")
+        Modules.jsonsearch_lib.start_index(script_dir, str(tmp_path / name), index_dict, show_boxes = False)
+    shutil.rmtree(tmp_path / "second")
+    report = Modules.jsonsearch_lib.watchdog(script_dir, index_dict)
+    assert report[str(tmp_path / "first")]["error"] is None
+    assert report[str(tmp_path / "second")]["error"].startswith("FileNotFoundError")
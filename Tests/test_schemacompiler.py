@@ -0,0 +1,152 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Schema Compiler Test Module
+# author: N. Plathe
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+
+import Modules.schemacompiler_lib
+import copy, glob, json, os
+import jsonschema
+import pytest
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+# the schemas among the test files, the other files are the documents they are checked with
+SCHEMA_FILES = ["./Tests/Files/schema.json"]
+
+# values every leaf of a document gets replaced with
+REPLACEMENTS = [None, True, False, 0, 1, 1.0, 1.5, -3, "", "x", "Tag1", [], ["Tag1", "Tag1"], ["Tag1", 1], {}, {"a": 1}]
+
+# small schemas covering the supported keywords, together with instances to check them with
+KEYWORD_CASES = [
+    ({"type": "integer", "minimum": 0, "exclusiveMaximum": 10}, [0, -1, 9, 10, 9.0, 9.5, True, "1", None]),
+    ({"type": ["number", "null"], "maximum": 2.5, "exclusiveMinimum": -1}, [2.5, 2.6, -1, -0.5, None, False, "x"]),
+    ({"type": "string", "minLength": 2, "maxLength": 4, "pattern": "^[a-z]+$"}, ["ab", "a", "abcde", "AB", 12, "ä"]),
+    ({"enum": [1, "a", None, [1, 2], {"b": True}]}, [1, 1.0, True, "a", None, [1, 2], [1, True], {"b": True}, {"b": 1}]),
+    ({"const": False}, [False, 0, None, "False"]),
+    ({"type": "array", "items": {"type": "string"}, "minItems": 1, "maxItems": 3, "uniqueItems": True},
+     [[], ["a"], ["a", "a"], ["a", 1], ["a", "b", "c", "d"], [1, True], "abc"]),
+    ({"uniqueItems": True}, [[1, True], [1, 1.0], [[1], [True]], [{"a": 1}, {"a": 1.0}], [0, False, None], ["1", 1]]),
+    ({"type": "object", "properties": {"a": {"type": "integer"}}, "required": ["a"], "additionalProperties": False},
+     [{"a": 1}, {}, {"a": "1"}, {"a": 1, "b": 2}, [], "a"]),
+    ({"properties": {"a": {"type": "string"}}, "additionalProperties": {"type": "integer"}, "minProperties": 1,
+      "maxProperties": 2}, [{"a": "x"}, {"a": "x", "b": 1}, {"a": "x", "b": "y"}, {}, {"a": "x", "b": 1, "c": 2}, 5]),
+    ({"anyOf": [{"type": "string"}, {"type": "integer", "minimum": 5}]}, ["x", 5, 4, None]),
+    ({"oneOf": [{"type": "integer"}, {"type": "number", "minimum": 2}]}, [1, 3, 2.5, 0.5, "x"]),
+    ({"allOf": [{"type": "number"}, {"maximum": 3}], "not": {"const": 2}}, [1, 2, 4, "x"]),
+    ({"items": False}, [[], [1], "x"]),
+    ({"properties": {"a": False, "b": True}}, [{}, {"a": 1}, {"b": 1}]),
+]
+
+
+def leaf_mutations(document):
+    """
+    Generates variants of a document by replacing every value with other JSON values and by removing every key.
+
+    Args:
+        document (dict): the document to be mutated
+
+    Returns:
+        generator: the mutated documents
+    """
+    def paths(value, prefix):
+        if isinstance(value, dict):
+            for key in value:
+                yield prefix + [key]
+                yield from paths(value[key], prefix + [key])
+        elif isinstance(value, list):
+            for i in range(len(value)):
+                yield prefix + [i]
+                yield from paths(value[i], prefix + [i])
+
+    for path in list(paths(document, [])):
+        for replacement in REPLACEMENTS + ["__delete__"]:
+            mutated = copy.deepcopy(document)
+            parent = mutated
+            for key in path[:-1]:
+                parent = parent[key]
+            if replacement == "__delete__":
+                del parent[path[-1]]
+            else:
+                parent[path[-1]] = copy.deepcopy(replacement)
+            yield mutated
+
+
+class Test_Compiler_Equivalence:
+    """
+    The generated validation functions have to agree with jsonschema on every instance.
+    """
+    def setup_class(self):
+        self.documents = []
+        for path in sorted(glob.glob("./Tests/Files/*.json")):
+            if os.path.normpath(path) not in [os.path.normpath(schema_path) for schema_path in SCHEMA_FILES]:
+                with open(path, encoding = "utf8") as json_file:
+                    self.documents.append(json.load(json_file))
+
+    @pytest.mark.parametrize("schema_path", SCHEMA_FILES)
+    def test_files_equivalence(self, schema_path):
+        with open(schema_path, encoding = "utf8") as schema_file:
+            schema = json.load(schema_file)
+        validator_class = jsonschema.validators.validator_for(schema)
+        validator_class.check_schema(schema)
+        source = Modules.schemacompiler_lib.generate_source(schema)
+        if source is None:
+            pytest.skip("schema uses keywords the compiler does not support")
+        validate = Modules.schemacompiler_lib.load_source(source)
+        validator = validator_class(schema)
+        for document in self.documents:
+            for instance in [document] + list(leaf_mutations(document)):
+                assert (validate(instance) is None) == validator.is_valid(instance), instance
+
+    @pytest.mark.parametrize("schema, instances", KEYWORD_CASES)
+    def test_keyword_equivalence(self, schema, instances):
+        source = Modules.schemacompiler_lib.generate_source(schema)
+        assert source is not None
+        validate = Modules.schemacompiler_lib.load_source(source)
+        validator = jsonschema.Draft202012Validator(schema)
+        for instance in instances:
+            assert (validate(instance) is None) == validator.is_valid(instance), instance
+
+    def test_schema_path_reported(self):
+        validate = Modules.schemacompiler_lib.load_source(
+            Modules.schemacompiler_lib.generate_source(KEYWORD_CASES[7][0]))
+        assert validate({"a": "1"})[1] == ["properties", "a", "type"]
+
+
+class Test_Compiler_Fallback:
+    """
+    Schemas with unsupported keywords are not compiled, sidecar modules are reused while the schema does not change.
+    """
+    def test_unsupported_keywords(self):
+        assert Modules.schemacompiler_lib.generate_source({"$ref": "#/$defs/a", "$defs": {"a": {}}}) is None
+        assert Modules.schemacompiler_lib.generate_source({"properties": {"a": {"if": {}}}}) is None
+        assert Modules.schemacompiler_lib.generate_source({"$schema": "http://json-schema.org/draft-04/schema#"}) is None
+        assert Modules.schemacompiler_lib.generate_source({"exclusiveMinimum": True}) is None
+
+    def test_sidecar_module(self, tmp_path):
+        schema = {"type": "object", "required": ["a"]}
+        validate, source = Modules.schemacompiler_lib.compiled_validator(schema, "s.json", str(tmp_path))
+        assert os.path.isfile(tmp_path / "s.py")
+        assert validate({}) is not None
+        os.utime(tmp_path / "s.py", (0, 0))
+        Modules.schemacompiler_lib.compiled_validator(schema, "s.json", str(tmp_path))
+        assert os.path.getmtime(tmp_path / "s.py") == 0
+        Modules.schemacompiler_lib.compiled_validator({"type": "array"}, "s.json", str(tmp_path))
+        assert os.path.getmtime(tmp_path / "s.py") != 0
+        assert os.listdir(tmp_path) == ["s.py"]  # no temporary files left behind
+
+    def test_truncated_sidecar_module(self, tmp_path):
+        schema = {"type": "object", "required": ["a"]}
+        _, source = Modules.schemacompiler_lib.compiled_validator(schema, "s.json", str(tmp_path))
+        for length in (len(source) // 2, source.index("def ") + 8):  # without validate, and cut mid-statement
+            with open(tmp_path / "s.py", "w", encoding = "utf8") as out:
+                out.write(source[:length])
+            validate, reloaded = Modules.schemacompiler_lib.compiled_validator(schema, "s.json", str(tmp_path))
+            assert reloaded == source and validate({}) is not None
+            with open(tmp_path / "s.py", encoding = "utf8") as sidecar_file:
+                assert sidecar_file.read() == source
@@ -0,0 +1,118 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Schema Registry Test Module
+# author: N. Plathe
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+
+import Modules.jsonio_lib, Modules.resultcache_lib, Modules.schemaregistry_lib, hashlib, json, os
+import pytest
+import referencing.exceptions
+from jsonschema import Draft202012Validator
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+BASE = {
+    "$schema": "https://json-schema.org/draft/2020-12/schema",
+    "$id": "https://example.org/schemas/base.json",
+    "$defs": {
+        "name": {"type": "string", "title": "Name", "description": "A name", "maxLength": 5},
+        "node": {"type": "object", "properties": {"child": {"$ref": "#/$defs/node"}}}
+    }
+}
+
+MAIN = {
+    "$schema": "https://json-schema.org/draft/2020-12/schema",
+    "$id": "https://example.org/schemas/main.json",
+    "type": "object",
+    "properties": {
+        "name": {"$ref": "base.json#/$defs/name", "title": "Main Name"},
+        "count": {"$ref": "#/$defs/count"},
+        "tree": {"$ref": "base.json#/$defs/node"}
+    },
+    "$defs": {"count": {"type": "integer", "title": "Count", "description": "A count", "minimum": 0}}
+}
+
+
+class Test_Schema_Registry:
+    """
+    References between stored schemas are resolved locally, never over the network.
+    """
+    def setup_method(self):
+        self.registry = Modules.schemaregistry_lib.schema_registry
+
+    @pytest.fixture(autouse = True)
+    def storage(self, tmp_path):
+        for name, schema in (("base.json", BASE), ("main.json", MAIN)):
+            with open(tmp_path / name, "w", encoding = "utf8") as out:
+                json.dump(schema, out)
+        self.schema_dir = str(tmp_path)
+        self.registry.schema_dir = self.schema_dir
+        yield
+        self.registry.schema_dir = None
+
+    def test_validation_across_files(self):
+        schema_path = os.path.join(self.schema_dir, "main.json")
+        assert Modules.jsonio_lib.validate_object({"name": "abc", "count": 1}, schema_path) == []
+        errors = Modules.jsonio_lib.validate_object({"name": "abcdef", "count": -1}, schema_path)
+        assert sorted(error["pointer"] for error in errors) == ["/count", "/name"]
+
+    def test_metadata_generation(self):
+        meta = Modules.jsonio_lib.schema_to_py_gen(MAIN, mode = "meta")
+        assert meta["name"]["title"] == "Main Name"
+        assert meta["name"]["maxLength"] == 5
+        assert meta["count"]["minimum"] == 0
+        resolved = self.registry.resolve(MAIN)
+        assert resolved is self.registry.resolve(MAIN)
+        assert resolved["properties"]["tree"]["properties"]["child"]["$ref"] == \
+               "https://example.org/schemas/base.json#/$defs/node"  # recursion stops
+
+    def test_recursive_fragment(self):
+        schema = {"type": "object", "properties": {"tree": {"$ref": "#/$defs/node"}},
+                  "$defs": {"node": {"type": "object", "properties": {"child": {"$ref": "#/$defs/node"},
+                                                                      "size": {"maximum": 3}}}}}
+        fragment = self.registry.resolve(schema)["properties"]["tree"]["properties"]["child"]
+        assert fragment["$ref"].startswith("urn:pyjson:schema:")
+        validator = Draft202012Validator(fragment, registry = self.registry.registry())
+        assert [error.message for error in validator.iter_errors({"size": 5})] == ["5 is greater than the maximum of 3"]
+
+    def test_no_network(self):
+        resolver = self.registry.registry().resolver()
+        with pytest.raises(referencing.exceptions.Unresolvable):
+            resolver.lookup("https://example.com/remote.json")
+
+    def test_storage_changes(self):
+        generation = self.registry.registry() and self.registry.generation
+        with open(os.path.join(self.schema_dir, "other.json"), "w", encoding = "utf8") as out:
+            json.dump({"$id": "https://example.org/schemas/other.json"}, out)
+        self.registry.invalidate()
+        self.registry.registry()
+        assert self.registry.generation == generation + 1
+
+    def test_storage_checked_once_per_ttl(self, monkeypatch):
+        self.registry.registry()
+        checks = []
+        dir_signature = self.registry._dir_signature
+        monkeypatch.setattr(self.registry, "_dir_signature", lambda: checks.append(1) or dir_signature())
+        for _ in range(100):
+            self.registry.registry()
+        assert checks == []
+        monkeypatch.setattr(self.registry, "ttl", 0)
+        self.registry.registry()
+        assert checks == [1]
+
+    def test_schema_hash_covers_references(self):
+        main_path = os.path.join(self.schema_dir, "main.json")
+        base_path = os.path.join(self.schema_dir, "base.json")
+        assert self.registry.dependencies(MAIN) == ["base.json"]
+        with open(base_path, "rb") as base_file:
+            assert Modules.resultcache_lib.schema_hash(base_path) == hashlib.sha256(base_file.read()).hexdigest()
+        main_hash = Modules.resultcache_lib.schema_hash(main_path)
+        with open(base_path, "w", encoding = "utf8") as out:
+            json.dump(dict(BASE, title = "changed"), out)
+        self.registry.invalidate()
+        assert Modules.resultcache_lib.schema_hash(main_path) != main_hash
@@ -0,0 +1,67 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Background Search Test Module
+# author: N. Plathe
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+
+import Modules.indexstore_lib, Modules.jsonsearch_lib, Modules.searchworker_lib
+import os, shutil, time
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+class Test_Search_Thread:
+    """
+    The thread hands the results over in batches and reports the outcome once.
+    """
+    def test_batches(self, tmp_path):
+        script_dir = tmp_path / "tool"
+        data_dir = tmp_path / "data"
+        os.makedirs(script_dir / "Schemas")
+        os.makedirs(data_dir)
+        shutil.copyfile("./Tests/Files/schema.json", script_dir / "Schemas" / "schema.json")
+        for i in range(5):
+            shutil.copy("./Tests/Files/valid.json", data_dir / (str(i) + ".json"))
+        Modules.jsonsearch_lib.start_index(str(script_dir), str(data_dir), {"cur_index": 0}, show_boxes = False)
+        files = Modules.indexstore_lib.open_store(str(script_dir)).files(1)
+
+        thread = Modules.searchworker_lib.SearchThread(str(script_dir), files, "schema.json", 1,
+                                                       {"constructor": "Max"}, workers = 1, batch_interval = 60)
+        found = []
+        searched = []
+        thread.found.connect(found.append)
+        thread.searched.connect(lambda *args: searched.append(args))
+        thread.run()  # synchronously, the signals are delivered directly
+        assert found == [files[:1], files[1:]]  # the first match right away, the rest after the interval
+        assert searched == [(5, "done", "")]
+
+    def test_flushed_without_further_matches(self, tmp_path, monkeypatch):
+        found = []
+        pending = []
+
+        def iter_search(*args, progress = None, **kwargs):
+            yield "first"
+            yield "second"  # within the interval, kept back
+            time.sleep(0.05)
+            progress()  # a file that does not match
+            pending.append(len(found))
+            for _ in range(3):
+                progress()
+
+        monkeypatch.setattr(Modules.jsonsearch_lib, "iter_search", iter_search)
+        thread = Modules.searchworker_lib.SearchThread(str(tmp_path), None, "schema.json", 1, {}, batch_interval = 0.02)
+        thread.found.connect(found.append)
+        thread.run()
+        assert pending == [2]
+        assert found == [["first"], ["second"]]
+
+    def test_missing_schema(self, tmp_path):
+        thread = Modules.searchworker_lib.SearchThread(str(tmp_path), ["/nowhere.json"], "missing.json", 1, {})
+        searched = []
+        thread.searched.connect(lambda *args: searched.append(args))
+        thread.run()
+        assert searched[0][:2] == (0, "failed")
@@ -0,0 +1,58 @@
+# ----------------------------------------
+# pyJSON Schema Loader and JSON Editor - Background Watchdog Test Module
+# author: N. Plathe
+# ----------------------------------------
+# Music recommendation (albums):
+# ----------------------------------------
+# Libraries
+# ----------------------------------------
+
+import Modules.indexstore_lib, Modules.jsonsearch_lib, Modules.watchdog_lib
+import os, shutil
+from PySide6.QtCore import Qt
+
+# ----------------------------------------
+# Variables and Functions
+# ----------------------------------------
+
+class Test_Watchdog_Thread:
+    """
+    The thread refreshes the indexes on its own connection and hands the new main index over when it is done.
+    """
+    def test_refresh_snapshot(self, tmp_path):
+        script_dir = str(tmp_path / "tool")
+        data_dir = tmp_path / "data"
+        os.makedirs(data_dir)
+        shutil.copy("./Tests/Files/valid.json", data_dir / "first.json")
+        index_dict = {"cur_index": 0}
+        Modules.jsonsearch_lib.start_index(script_dir, str(data_dir), index_dict, show_boxes = False)
+        shutil.copy("./Tests/Files/valid.json", data_dir / "second.json")
+
+        thread = Modules.watchdog_lib.WatchdogThread(script_dir, index_dict)
+        progress = []
+        refreshed = []
+        thread.progress.connect(lambda done, total, path: progress.append((done, total, path)))
+        thread.refreshed.connect(refreshed.append)
+        thread.run()  # synchronously, the signals are delivered directly
+        assert progress == [(0, 1, str(data_dir)), (1, 1, "")]
+        assert refreshed == [index_dict]
+        assert len(Modules.indexstore_lib.open_store(script_dir).files(1)) == 2  # committed for other connections
+
+    def test_interrupted(self, tmp_path):
+        os.makedirs(tmp_path / "a")
+        os.makedirs(tmp_path / "b")
+        index_dict = {"cur_index": 2, str(tmp_path / "a"): 1, str(tmp_path / "b"): 2}
+        thread = Modules.watchdog_lib.WatchdogThread(str(tmp_path), index_dict)
+        progress = []
+        refreshed = []
+
+        def interrupt(done, total, path):
+            progress.append(path)
+            thread.requestInterruption()
+
+        thread.progress.connect(interrupt, Qt.DirectConnection)  # called on the running thread
+        thread.refreshed.connect(refreshed.append, Qt.DirectConnection)
+        thread.start()
+        thread.wait()
+        assert len(progress) == 1 and progress[0] in index_dict
+        assert refreshed == [index_dict]
@@ -17,7 +17,8 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QPalette, QPixmap, QRadialGradient, QTransform)
 from PySide6.QtWidgets import (QApplication, QCheckBox, QDialog, QGroupBox,
     QHBoxLayout, QLabel, QLayout, QPushButton,
-    QSizePolicy, QSpacerItem, QVBoxLayout, QWidget)
+    QSizePolicy, QSpacerItem, QSpinBox, QVBoxLayout,
+    QWidget)
 
 class Ui_PrefDiag(object):
     def setupUi(self, PrefDiag):
@@ -66,6 +67,31 @@ class Ui_PrefDiag(object):
 
         self.verticalLayout.addWidget(self.groupBox_2)
 
+        self.groupBox_3 = QGroupBox(PrefDiag)
+        self.groupBox_3.setObjectName(u"groupBox_3")
+        self.verticalLayout_5 = QVBoxLayout(self.groupBox_3)
+        self.verticalLayout_5.setObjectName(u"verticalLayout_5")
+        self.label_3 = QLabel(self.groupBox_3)
+        self.label_3.setObjectName(u"label_3")
+        self.label_3.setWordWrap(True)
+
+        self.verticalLayout_5.addWidget(self.label_3)
+
+        self.spinBox_watchdogInterval = QSpinBox(self.groupBox_3)
+        self.spinBox_watchdogInterval.setObjectName(u"spinBox_watchdogInterval")
+        self.spinBox_watchdogInterval.setMaximum(1440)
+        self.spinBox_watchdogInterval.setValue(30)
+
+        self.verticalLayout_5.addWidget(self.spinBox_watchdogInterval)
+
+        self.checkBox_liveIndex = QCheckBox(self.groupBox_3)
+        self.checkBox_liveIndex.setObjectName(u"checkBox_liveIndex")
+
+        self.verticalLayout_5.addWidget(self.checkBox_liveIndex)
+
+
+        self.verticalLayout.addWidget(self.groupBox_3)
+
 
         self.verticalLayout_2.addLayout(self.verticalLayout)
 
@@ -103,6 +129,10 @@ class Ui_PrefDiag(object):
         self.groupBox_2.setTitle(QCoreApplication.translate("PrefDiag", u"Error Representation", None))
         self.label_2.setText(QCoreApplication.translate("PrefDiag", u"If this box is checked, structural mismatches and errors in the tabular view are shown. Otherwise, a blank description is set.", None))
         self.checkBox_ShowErrors.setText(QCoreApplication.translate("PrefDiag", u"Show Errors in Table", None))
+        self.groupBox_3.setTitle(QCoreApplication.translate("PrefDiag", u"Index Checks", None))
+        self.label_3.setText(QCoreApplication.translate("PrefDiag", u"Indexed directories are checked in the background on start up and then periodically. Set the interval to 0 to check them on start up and on demand only. Alternatively, changes can be applied as they happen.", None))
+        self.spinBox_watchdogInterval.setSuffix(QCoreApplication.translate("PrefDiag", u" min", None))
+        self.checkBox_liveIndex.setText(QCoreApplication.translate("PrefDiag", u"Keep Indexes up to Date while Running", None))
         self.pushButton_save.setText(QCoreApplication.translate("PrefDiag", u"Save", None))
         self.pushButton_cancel.setText(QCoreApplication.translate("PrefDiag", u"Cancel", None))
     # retranslateUi
@@ -24,20 +24,27 @@ import os
 import platform
 import regex as re
 import shutil
+import sqlite3
 import subprocess
 from datetime import datetime
 
 # import PySide libraries
 from PySide6 import QtCore, QtWidgets, QtGui
-from PySide6.QtCore import QModelIndex, Qt, QPoint
+from PySide6.QtCore import QModelIndex, Qt, QPoint, QTimer
 from PySide6.QtGui import QBrush, QColor, QGuiApplication, QStandardItemModel, QStandardItem, QIcon
 from PySide6.QtWidgets import QMainWindow, QStyledItemDelegate, QStyle, QWidget, QVBoxLayout, \
-    QFileDialog, QMessageBox, QStyleOptionViewItem
+    QFileDialog, QMessageBox, QStyleOptionViewItem, QProgressBar, QPushButton, QLabel, QHBoxLayout
 
 # import of modules
-from Modules import jsonio_lib, jsonsearch_lib
-from Modules.deploy_files import deploy_schema, deploy_config, save_config, save_main_index
+from Modules import dirscan_lib, indexstore_lib, jsonio_lib, jsonsearch_lib, progress_lib
+from Modules.deploy_files import deploy_schema, deploy_config, save_config
+from Modules.indexstore_lib import open_store
+from Modules.livewatch_lib import LiveIndexer
 from Modules.ModifiedTreeModel import ModifiedTreeClass as TreeClass
+from Modules.resultcache_lib import ValidationResultCache, schema_hash
+from Modules.schemaregistry_lib import schema_registry
+from Modules.searchworker_lib import SearchThread
+from Modules.watchdog_lib import IndexThread, WatchdogThread
 
 # import the converted user interface
 from UserInterfaces.pyJSON_interface import Ui_MainWindow
@@ -207,12 +214,14 @@ class BackgroundBrushDelegate(QStyledItemDelegate):
             index (QModelIndex): the QModelIndex to be modified
         """
         super(BackgroundBrushDelegate, self).initStyleOption(option, index)
-        option.backgroundBrush = self.brush
+        if index.data(Qt.BackgroundRole) is None:  # keep the highlight of items flagged by a validation
+            option.backgroundBrush = self.brush
 
 # class for a small additional window showing search results.
 class SearchWindow(QWidget):
     """
-    The SearchWindow Class is a simple QWidget for showing search results in a list-view.
+    The SearchWindow Class is a simple QWidget for showing search results in a list-view. Results are appended to its
+    model while the search is running.
     """
     def __init__(self):
         """
@@ -230,9 +239,47 @@ class SearchWindow(QWidget):
         self.searchListView.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.searchListView.setContextMenuPolicy(Qt.CustomContextMenu)
         self.searchListView.customContextMenuRequested.connect(self.on_custom_context_menu)
+        self.result_model = QStandardItemModel()
+        self.searchListView.setModel(self.result_model)
+        self.status_label = QLabel()
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.hide()
 
         # Add Widgets to layout
         layout.addWidget(self.searchListView)
+        status_layout = QHBoxLayout()
+        status_layout.addWidget(self.status_label, 1)
+        status_layout.addWidget(self.cancel_button)
+        layout.addLayout(status_layout)
+
+    def start_results(self):
+        """
+        Empties the result list for a new search.
+        """
+        self.result_model.removeRows(0, self.result_model.rowCount())
+        self.status_label.setText("Searching...")
+        self.cancel_button.show()
+
+    def add_results(self, paths):
+        """
+        Appends results of the running search.
+
+        Args:
+            paths (list): the paths of the found files
+        """
+        for path in paths:
+            self.result_model.appendRow(QStandardItem(path))
+        self.status_label.setText("Searching... " + str(self.result_model.rowCount()) + " results")
+
+    def finish_results(self, text):
+        """
+        Shows the outcome of the search.
+
+        Args:
+            text (str): the text of the status line
+        """
+        self.cancel_button.hide()
+        self.status_label.setText(text)
 
     def on_custom_context_menu(self, index):
         """
@@ -310,7 +357,23 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
                 "last_schema": "default.json",
                 "last_JSON": None,
                 "verbose_logging": False,
-                "show_error_representation": True
+                "show_error_representation": True,
+                "search_workers": None,
+                "max_validation_errors": 100,
+                "index_include": ["*.json"],
+                "index_exclude": [],
+                "index_max_depth": None,
+                "scan_workers": None,
+                "watchdog_interval": 30,
+                "watchdog_workers": 4,
+                "watchdog_per_device": 2,
+                "watchdog_timeout": 600,
+                "live_index": False,
+                "live_index_debounce": 2.0,
+                "live_index_poll_interval": 60,
+                "index_values": True,
+                "index_key_filter_bits": 256,
+                "index_trigrams": True
             }
         else:
             self.config = config
@@ -392,8 +455,31 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
         self.current_schema_combo_box.currentTextChanged.connect(self.combobox_selected)
 
         self.searchList = None
+        self.search_thread = None
         self.prefdiag = None
 
+        # the watchdog checks the indexes in the background, on start up and then periodically
+        self.watchdog_thread = None
+        self.watchdog_notify = False
+        self.watchdog_timer = QTimer(self)
+        self.watchdog_timer.timeout.connect(self.call_watchdog)
+        self.set_watchdog_interval()
+
+        # new directories are indexed in the background, with the progress shown in the status bar
+        self.index_thread = None
+        self.index_progress = QProgressBar(self)
+        self.index_progress.setMaximumWidth(200)
+        self.index_progress.hide()
+        self.index_cancel_button = QPushButton("Cancel Indexing", self)
+        self.index_cancel_button.clicked.connect(self.cancel_indexing)
+        self.index_cancel_button.hide()
+        self.statusbar.addPermanentWidget(self.index_progress)
+        self.statusbar.addPermanentWidget(self.index_cancel_button)
+
+        # optionally, changes of indexed directories are applied while running
+        self.live_indexer = None
+        self.set_live_indexer()
+
         # set the delegate for the view
         self.delegate = EnumDropDownDelegate()
         self.TreeView.setItemDelegateForColumn(2, self.delegate)
@@ -466,7 +552,7 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
                 raise OSError("[pyJSON.diropener/WARN]: Directory selection aborted!")
             config["last_dir"] = dir_path
             save_config(self.script_dir, self.config)
-            jsonsearch_lib.start_index(self.script_dir, dir_path, self.index_dict)
+            self.call_indexer(dir_path)
         except (FileNotFoundError, OSError) as err:
             lg.error(err)
             if isinstance(err, FileNotFoundError):
@@ -505,7 +591,8 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
             schema_read = jsonio_lib.decode_function(os.path.join(self.script_dir, "Schemas", self.config["last_schema"]))
             schema_meta = jsonio_lib.schema_to_py_gen(schema_read, mode = "meta")
             new_tree = jsonio_lib.py_to_tree(read_frame, schema_meta,
-                                             TreeClass(data=["JSON Structure", "Title", "Value", "Type", "Description"]),
+                                             TreeClass(data=["JSON Structure", "Title", "Value", "Type", "Description"],
+                                                       root_schema = schema_read),
                                              self.config["show_error_representation"])
             self.TreeView.reset()
             self.TreeView.setModel(new_tree)
@@ -551,8 +638,11 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
             self.curr_dir_comboBox.clear()
         self.curr_dir_comboBox.addItem("  (none)")
         if selection_list is not None and type(selection_list) is list:
+            schema_hashes = self.schema_hashes()
             for i in selection_list:
                 self.curr_dir_comboBox.addItem(i)
+                self.curr_dir_comboBox.setItemData(self.curr_dir_comboBox.count() - 1,
+                                                   self.compatibility_summary(i, schema_hashes), Qt.ToolTipRole)
         else:
             if selection_list is not None:
                 self.curr_dir_comboBox.addItem(selection_list)
@@ -563,6 +653,52 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
         self.curr_dir_comboBox.blockSignals(False)
 
 
+    def schema_hashes(self):
+        """
+        Hashes the content of all stored schemas, see resultcache_lib.schema_hash.
+
+        Returns:
+            dict: the file names of the schemas mapped to their hashes
+        """
+        schema_hashes = {}
+        for schema_name in os.listdir(os.path.join(self.script_dir, "Schemas")):
+            try:
+                schema_hashes[schema_name] = schema_hash(os.path.join(self.script_dir, "Schemas", schema_name))
+            except OSError as err:
+                lg.debug(err)
+        return schema_hashes
+
+
+    def compatibility_summary(self, path, schema_hashes):
+        """
+        Builds a text listing the amount of files of an indexed directory valid against each stored schema.
+
+        Args:
+            path (str): the indexed directory
+            schema_hashes (dict): the current hashes of the schemas, see schema_hashes
+
+        Returns:
+            str: one line per schema
+        """
+        try:
+            store = open_store(self.script_dir)
+            total = len(store.files(self.index_dict[path]))
+            counts = store.compatibility_counts(self.index_dict[path], schema_hashes)
+            stats = store.stats(self.index_dict[path])
+        except (sqlite3.Error, KeyError) as err:
+            lg.debug(err)
+            return path
+        lines = [path, str(total) + " JSON documents"]
+        if stats["filtered"]:
+            lines.append("Key filters: " + str(round(stats["false_positive_rate"] * 100, 2)) + " % false positives")
+        for schema_name, (valid, checked) in sorted(counts.items()):
+            line = schema_name + ": " + str(valid) + " valid"
+            if checked < total:
+                line += " (" + str(total - checked) + " not checked yet)"
+            lines.append(line)
+        return "\n".join(lines)
+
+
     def combobox_selected(self):
         """
         A slot that gets triggered when the QComboBox emits a changed-Signal. Sets the new schema and reconstructs
@@ -580,7 +716,8 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
             if not self.config["last_JSON"] is None:
                 read_frame = jsonio_lib.decode_function(self.config["last_JSON"])
                 new_tree = jsonio_lib.py_to_tree(read_frame, schema_meta,
-                                                 TreeClass(data=["JSON Structure", "Title", "Value", "Type", "Description"]),
+                                                 TreeClass(data=["JSON Structure", "Title", "Value", "Type", "Description"],
+                                                           root_schema = schema),
                                                  self.config["show_error_representation"])
                 self.TreeView.reset()
                 self.TreeView.setModel(new_tree)
@@ -624,7 +761,13 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
                     "Source schema seems to be already in the schema  folder. It will not be copied."
                 )
             else:
+                if os.path.isfile(os.path.join(self.script_dir, "Schemas", os.path.basename(filepath))):
+                    # a stored schema gets replaced - cached validation results are outdated
+                    result_cache = ValidationResultCache(self.script_dir)
+                    result_cache.invalidate_schema(os.path.basename(filepath))
+                    result_cache.close()
                 shutil.copyfile(filepath, os.path.join(self.script_dir, "Schemas", os.path.basename(filepath)))
+                schema_registry.invalidate()
             self.combobox_repopulate()
         except (FileNotFoundError, OSError) as err:
             lg.error(err)
@@ -712,7 +855,8 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
             pre_json = jsonio_lib.schema_to_py_gen(curr_schem)
             pre_meta = jsonio_lib.schema_to_py_gen(curr_schem, mode = "meta")
             new_tree = jsonio_lib.py_to_tree(pre_json, pre_meta,
-                                             TreeClass(data=["JSON Structure", "Title", "Value", "Type", "Description"]),
+                                             TreeClass(data=["JSON Structure", "Title", "Value", "Type", "Description"],
+                                                       root_schema = curr_schem),
                                              self.config["show_error_representation"])
 
             self.TreeView.reset()
@@ -771,7 +915,8 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
             schema_read = jsonio_lib.decode_function(os.path.join(self.script_dir, "Schemas", self.config["last_schema"]))
             schema_meta = jsonio_lib.schema_to_py_gen(schema_read, mode = "meta")
             new_tree = jsonio_lib.py_to_tree(default_values, schema_meta,
-                                             TreeClass(data=["JSON Structure", "Title", "Value", "Type", "Description"]),
+                                             TreeClass(data=["JSON Structure", "Title", "Value", "Type", "Description"],
+                                                       root_schema = schema_read),
                                              self.config["show_error_representation"])
 
             self.TreeView.reset()
@@ -815,7 +960,8 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
                     schema_meta = jsonio_lib.schema_to_py_gen(schema_read, mode = "meta")
 
                     new_tree = jsonio_lib.py_to_tree(values, schema_meta,
-                        TreeClass(data=["JSON Structure", "Title", "Value", "Type", "Description"]),
+                        TreeClass(data=["JSON Structure", "Title", "Value", "Type", "Description"],
+                                  root_schema = schema_read),
                         self.config["show_error_representation"])
 
                     self.TreeView.reset()
@@ -835,37 +981,41 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
 
     def validate_function(self):
         """
-        converts the tree keys and values to JSON and validates the JSON document agains the selected schema
+        validates the keys and values of the tree against the selected schema, without serializing them in between
         """
         tree = self.TreeView.model()
-        curr_json_py = jsonio_lib.tree_to_py(tree.root_node.childItems)
-        curr_json = json.dumps(curr_json_py)
-        result = jsonio_lib.validator_vars(curr_json, os.path.join(self.script_dir, "Schemas", self.config["last_schema"]))
-        match result:
-            case 0:
-                QMessageBox.information(
-                    self,
-                    "[pyJSON.validate_function/INFO]",
-                    "The JSON is valid against the schema!"
-                )
-            case 1:
-                QMessageBox.warning(
-                    self,
-                    "[pyJSON.validate_Function/ERROR]",
-                    "The JSON is not valid against the schema!"
-                )
-            case 2:
-                QMessageBox.warning(
-                    self,
-                    "[pyJSON.validate_Function/ERROR]",
-                    "The schema is not valid against its meta schema!"
-                )
-            case -999:
-                QMessageBox.critical(
-                    self,
-                    "[pyJSON.validate_Function/ERROR]",
-                    "The schema is not accessible!"
-                )
+        errors = jsonio_lib.validate_tree(tree.root_node.childItems,
+                                          os.path.join(self.script_dir, "Schemas", self.config["last_schema"]),
+                                          self.config.get("max_validation_errors", 100))
+        tree.mark_errors([error for error in errors if error["kind"] == "validation"])
+        lg.debug("[pyJSON.validate_function/DEBUG]: Validator cache: " + str(jsonio_lib.validator_cache.info()))
+        if len(errors) == 0:
+            QMessageBox.information(
+                self,
+                "[pyJSON.validate_function/INFO]",
+                "The JSON is valid against the schema!"
+            )
+        elif errors[0]["kind"] == "schema":
+            QMessageBox.warning(
+                self,
+                "[pyJSON.validate_Function/ERROR]",
+                "The schema is not valid against its meta schema!"
+            )
+        elif errors[0]["kind"] == "io":
+            QMessageBox.critical(
+                self,
+                "[pyJSON.validate_Function/ERROR]",
+                "The schema is not accessible!"
+            )
+        else:
+            for error in errors:
+                lg.error((error["pointer"] or "/") + ": " + error["message"])
+            details = "\n".join("- " + (error["pointer"] or "/") + ": " + error["message"] for error in errors[:10])
+            QMessageBox.warning(
+                self,
+                "[pyJSON.validate_Function/ERROR]",
+                "The JSON is not valid against the schema!\n\n" + details
+            )
 
     # SEARCH RELATED FUNCTIONS
 
@@ -878,6 +1028,7 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
         """
         if self.searchList is None:
             self.searchList = SearchWindow()
+            self.searchList.cancel_button.clicked.connect(self.cancel_search)
 
         if not self.searchList.isVisible():
             # get geometries
@@ -903,10 +1054,7 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
             path = self.curr_dir_comboBox.currentText()
             curr_schem = self.current_schema_combo_box.currentText()
             if self.index_dict[path] and os.path.exists(path):
-                index_json_file = os.path.join(self.script_dir, "Indexes", "index" + str(self.index_dict[path]) + ".json")
-                file_index = json.load(open(index_json_file, encoding = "utf8"))
-                lg.info("[pyJSON.search_Dirs/INFO]: Retrieved index of " + path + ".")
-                result_index = jsonsearch_lib.schema_matching_search(file_index["files"], curr_schem, self.script_dir)
+                self.cancel_search()
                 tree = self.TreeView.model()
                 json_frame = jsonio_lib.tree_to_py(tree.root_node.childItems)
                 flattened_frame = {}
@@ -914,22 +1062,15 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
                 for i in list(flattened_frame.keys()):
                     if flattened_frame[i] == "":
                         del flattened_frame[i]
-                if len(flattened_frame) > 0:
-                    result_index = jsonsearch_lib.f_search(result_index, flattened_frame)
-                if len(result_index) != 0:
-                    result_model = QStandardItemModel()
-                    for i in result_index:
-                        item = QStandardItem(i)
-                        result_model.appendRow(item)
-                        self.searchList.searchListView.setModel(result_model)
-                        self.searchList.searchListView.activateWindow() # set focus on this widget
-                else:
-                    lg.warning("[pyJSON.search_Dirs/WARN]: No results found!")
-                    QMessageBox.warning(
-                        self,
-                        "[pyJSON.search_Dirs/WARN]",
-                        "No results found! Search result list is not updated."
-                    )
+                # the results are streamed into the search window, see on_search_found. The thread reads the index
+                # shard by shard itself.
+                lg.info("[pyJSON.search_Dirs/INFO]: Searching the index of " + path + ".")
+                self.search_thread = SearchThread(self.script_dir, None, curr_schem, self.index_dict[path],
+                                                  flattened_frame, self, self.config.get("search_workers"))
+                self.search_thread.found.connect(self.on_search_found)
+                self.search_thread.searched.connect(self.on_searched)
+                self.searchList.start_results()
+                self.search_thread.start()
         else:
             lg.warning("[pyJSON.search_Dirs/WARN]: No directory for search selected!")
             QMessageBox.warning(
@@ -938,19 +1079,239 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
                 "No directory for search selected!"
             )
 
+    def cancel_search(self):
+        """
+        Cancels the running search and waits for it to stop. The results found so far stay in the search window.
+        """
+        if self.search_thread is not None and self.search_thread.isRunning():
+            self.search_thread.cancel()
+            self.search_thread.wait()
+
+
+    def on_search_found(self, paths):
+        """
+        Appends results of the running search to the search window.
+
+        Args:
+            paths (list): the paths of the found files
+        """
+        if self.sender() is not self.search_thread:  # a batch of a cancelled search, delivered late
+            return
+        first = self.searchList.result_model.rowCount() == 0
+        self.searchList.add_results(paths)
+        if first:
+            self.searchList.searchListView.activateWindow() # set focus on this widget
+
+
+    def on_searched(self, count, outcome, message):
+        """
+        Reports the outcome of a search.
+
+        Args:
+            count (int): the amount of files found
+            outcome (str): "done", "cancelled" or "failed"
+            message (str): the description of a failure
+        """
+        if self.sender() is not self.search_thread:
+            return
+        if outcome == "failed":
+            self.searchList.finish_results("Search failed.")
+            QMessageBox.critical(
+                self,
+                "[pyJSON.search_Dirs/CRITICAL]",
+                message
+            )
+        elif outcome == "cancelled":
+            self.searchList.finish_results("Search cancelled, " + str(count) + " results.")
+        elif count == 0:
+            self.searchList.finish_results("No results found.")
+            lg.warning("[pyJSON.search_Dirs/WARN]: No results found!")
+            QMessageBox.warning(
+                self,
+                "[pyJSON.search_Dirs/WARN]",
+                "No results found!"
+            )
+        else:
+            self.searchList.finish_results(str(count) + " results.")
+
+
+    def call_indexer(self, path):
+        """
+        Starts indexing a directory in the background, unless another directory is being indexed already.
+
+        Args:
+            path (str): the directory to index
+        """
+        if self.index_thread is not None and self.index_thread.isRunning():
+            QMessageBox.information(
+                self,
+                "[pyJSON.call_indexer/INFO]",
+                "Another directory is being indexed. Please wait until it is finished or cancel it."
+            )
+            return
+        self.index_thread = IndexThread(self.script_dir, path, self.index_dict, self)
+        self.index_thread.progress.connect(self.on_index_progress)
+        self.index_thread.indexed.connect(self.on_indexed)
+        self.index_progress.setRange(0, 0)  # busy until an estimate is available
+        self.index_progress.show()
+        self.index_cancel_button.show()
+        self.statusbar.showMessage("Start indexing " + path + "...")
+        self.index_thread.start()
+
+
+    def cancel_indexing(self):
+        """
+        Cancels the running indexing. The files indexed so far are kept, the next index check completes the index.
+        """
+        if self.index_thread is not None and self.index_thread.isRunning():
+            self.index_thread.cancel()
+            self.statusbar.showMessage("Cancelling indexing...")
+
+
+    def on_index_progress(self, snapshot):
+        """
+        Shows the progress of the indexing in the status bar.
+
+        Args:
+            snapshot (dict): the progress, see progress_lib.IndexProgress.snapshot
+        """
+        if snapshot["eta"] is None:
+            self.index_progress.setRange(0, 0)
+        else:
+            self.index_progress.setRange(0, 100)
+            self.index_progress.setValue(int(100 * snapshot["elapsed"] / max(snapshot["elapsed"] + snapshot["eta"],
+                                                                            1e-9)))
+        self.statusbar.showMessage(progress_lib.format_progress(snapshot))
+
+
+    def on_indexed(self, main_index, result):
+        """
+        Swaps in the main index after indexing a directory and reports the outcome.
+
+        Args:
+            main_index (dict): the main index read from the index store
+            result (dict): the final progress, see progress_lib.IndexProgress.snapshot
+        """
+        self.index_progress.hide()
+        self.index_cancel_button.hide()
+        selected = self.curr_dir_comboBox.currentText()
+        self.index_dict = main_index
+        if self.live_indexer is not None:
+            self.live_indexer.set_roots(self.index_dict)
+        self.dirselect_repopulate()
+        if selected in self.index_dict:
+            self.curr_dir_comboBox.setCurrentText(selected)
+        if result["phase"] == "failed":
+            QMessageBox.critical(
+                self,
+                "[pyJSON.call_indexer/ERROR]",
+                "Directory (or one of its subdirectories) is not accessible!"
+            )
+        elif result["phase"] == "done" and result["found"] == 0:
+            QMessageBox.information(
+                self,
+                "[pyJSON.call_indexer/INFO]",
+                "No JSON files found. Index is empty."
+            )
+        elif result["phase"] == "cancelled":
+            self.statusbar.showMessage("Indexing cancelled after " + str(result["files"]) +
+                                       " files. The next index check completes the index.", 10000)
+        else:
+            self.statusbar.showMessage(progress_lib.format_progress(result), 10000)
+
+
     def call_watchdog(self):
         """
-        function responsible for executing the re-indexing on a regular basis
+        Starts a background check of all indexes, unless one is running already. The combo boxes and the search keep
+        using the current index snapshot until the check is done, see on_watchdog_refreshed.
         """
-        jsonsearch_lib.watchdog(self.script_dir, self.index_dict)
-        if self.sender() and isinstance(self.sender(), QtGui.QAction):
+        notify = bool(self.sender() and isinstance(self.sender(), QtGui.QAction))
+        if self.watchdog_thread is not None and self.watchdog_thread.isRunning():
+            lg.info("[pyJSON.call_watchdog/INFO]: Indexes are being checked already.")
+            self.watchdog_notify = self.watchdog_notify or notify
+            return
+        self.watchdog_notify = notify
+        self.watchdog_thread = WatchdogThread(self.script_dir, self.index_dict, self,
+                                              self.config.get("watchdog_workers", 4),
+                                              self.config.get("watchdog_per_device", 2),
+                                              self.config.get("watchdog_timeout", 600))
+        self.watchdog_thread.progress.connect(self.on_watchdog_progress)
+        self.watchdog_thread.refreshed.connect(self.on_watchdog_refreshed)
+        self.watchdog_thread.start()
+
+
+    def on_watchdog_progress(self, done, total, path):
+        """
+        Shows the progress of the index check in the status bar.
+
+        Args:
+            done (int): the amount of checked indexes
+            total (int): the total amount of indexes
+            path (str): the directory checked next
+        """
+        if done < total:
+            self.statusbar.showMessage("Checking index " + str(done + 1) + " of " + str(total) + ": " + path)
+
+
+    def on_watchdog_refreshed(self, main_index):
+        """
+        Swaps in the main index after a background check and updates the directory selection, keeping the selected
+        directory.
+
+        Args:
+            main_index (dict): the main index read from the index store
+        """
+        selected = self.curr_dir_comboBox.currentText()
+        self.index_dict = main_index
+        if self.live_indexer is not None:
+            self.live_indexer.set_roots(self.index_dict)
+        self.dirselect_repopulate()
+        if selected in self.index_dict:
+            self.curr_dir_comboBox.setCurrentText(selected)
+        failed = sorted(path for path, entry in self.sender().report.items() if entry["error"]) \
+            if isinstance(self.sender(), WatchdogThread) else []
+        if failed:
+            self.statusbar.showMessage("Checked indexed directories, " + str(len(failed)) + " could not be checked.",
+                                       5000)
+        else:
+            self.statusbar.showMessage("Checked indexed directories.", 5000)
+        if self.watchdog_notify:
+            self.watchdog_notify = False
             QMessageBox.information(
                 self,
                 "[pyJSON.call_watchdog/INFO]",
-                "Checked indexed directories and reindexed, if needed."
+                "Checked indexed directories and reindexed, if needed." +
+                ("\nCould not be checked:\n" + "\n".join(failed) if failed else "")
             )
 
 
+    def set_watchdog_interval(self):
+        """
+        (Re)starts the timer of the periodic index check from the config key "watchdog_interval" in minutes. 0 or None
+        disables the periodic check.
+        """
+        interval = self.config.get("watchdog_interval", 30)
+        if interval:
+            self.watchdog_timer.start(int(interval * 60000))
+        else:
+            self.watchdog_timer.stop()
+
+
+    def set_live_indexer(self):
+        """
+        Starts or stops the live maintenance of the indexes according to the config key "live_index".
+        """
+        if self.config.get("live_index", False) and self.live_indexer is None:
+            self.live_indexer = LiveIndexer(self.script_dir, self.index_dict,
+                                            debounce = self.config.get("live_index_debounce", 2.0),
+                                            poll_interval = self.config.get("live_index_poll_interval", 60))
+            self.live_indexer.start()
+        elif not self.config.get("live_index", False) and self.live_indexer is not None:
+            self.live_indexer.stop()
+            self.live_indexer.join()
+            self.live_indexer = None
+
+
     def call_prefdiag(self):
         if self.prefdiag is None:
             self.prefdiag = ui_preferences(self.script_dir)
@@ -959,6 +1320,8 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
         self.prefdiag.exec()
         self.config = json.load(open(os.path.join(self.script_dir, "pyJSON_conf.json"), encoding = "utf8"),
                   cls = json.JSONDecoder)
+        self.set_watchdog_interval()
+        self.set_live_indexer()
 
 
     def closeEvent(self, event):
@@ -969,8 +1332,39 @@ class UiRunnerInstance(QMainWindow, Ui_MainWindow):
         Args:
             event (QCloseEvent): the close event to be processed
         """
+        self.cancel_search()
         if self.searchList:
             self.searchList.close()
+        if self.watchdog_thread is not None and self.watchdog_thread.isRunning():
+            # the index being refreshed is finished, the remaining ones are left for the next start
+            self.watchdog_thread.requestInterruption()
+            self.watchdog_thread.wait()
+        if self.index_thread is not None and self.index_thread.isRunning():
+            self.index_thread.cancel()
+            self.index_thread.wait()
+        if self.live_indexer is not None:
+            self.live_indexer.stop()
+            self.live_indexer.join()
+
+
+def apply_config_defaults(config):
+    """
+    Passes the options of the directory scanner and of the index store from the config to their modules.
+
+    Args:
+        config (dict): the config dictionary
+    """
+    dirscan_lib.scan_defaults.update({
+        "include": config.get("index_include", ["*.json"]),
+        "exclude": config.get("index_exclude", []),
+        "max_depth": config.get("index_max_depth"),
+        "workers": config.get("scan_workers")
+    })
+    indexstore_lib.store_defaults.update({
+        "values": config.get("index_values", True),
+        "key_filter_bits": config.get("index_key_filter_bits", 256),
+        "trigrams": config.get("index_trigrams", True)
+    })
 
 
 # ----------------------------------------
@@ -982,9 +1376,10 @@ if __name__ == "__main__":
     import sys
     import argparse
     import inspect
+    import multiprocessing
 
-    # initialize the QtWidget
-    app = QtWidgets.QApplication(sys.argv)
+    # needed for the validation process pool in frozen environments
+    multiprocessing.freeze_support()
 
     # parser arguments
     parser = argparse.ArgumentParser(
@@ -1006,6 +1401,23 @@ if __name__ == "__main__":
     parser.add_argument('-ewd', '--enforce-working-directory',
                         dest = "working_dir",
                         help = "Enforces the location of the working directory to be set to the provided value.")
+    parser.add_argument('--validate',
+                        dest = "validate",
+                        help = "Headless batch validation of a directory or an existing index number against the schema " +
+                               "provided with -s. Prints one JSON line per file and a summary, then exits without " +
+                               "starting the user interface.")
+    parser.add_argument('--workers',
+                        dest = "workers",
+                        type = int,
+                        help = "Amount of worker processes used for --validate. Defaults to the CPU count.")
+    parser.add_argument('--no-cache',
+                        dest = "no_cache",
+                        action = "store_true",
+                        help = "Validate every file with --validate, ignoring the persistent result cache.")
+    parser.add_argument('--export-indexes',
+                        dest = "export_indexes",
+                        help = "Writes all indexes in the JSON layout (pyJSON_S_index.json and indexN.json) to the " +
+                               "Indexes directory below the provided directory, then exits.")
     args = parser.parse_args()
 
     # set Script Directory
@@ -1016,6 +1428,48 @@ if __name__ == "__main__":
         os.chdir(os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe()))))
         script_dir = os.getcwd()
 
+    # compiled schemas are kept as sidecar modules, references are resolved against the schema storage
+    jsonio_lib.validator_cache.compiled_dir = os.path.join(script_dir, "Compiled")
+    schema_registry.schema_dir = os.path.join(script_dir, "Schemas")
+
+    # export of the index store in the JSON layout
+    if args.export_indexes:
+        open_store(script_dir).export_json(os.path.join(invoked_from, args.export_indexes))
+        sys.exit(0)
+
+    # headless batch validation - runs without any Qt object and exits afterwards
+    if args.validate:
+        lg = logging.getLogger()
+        lg.setLevel("INFO")
+        stream_handler = logging.StreamHandler(stream = sys.stderr)  # stdout is reserved for the JSON lines
+        stream_handler.setFormatter(logging.Formatter(fmt = u'%(asctime)s: %(message)s'))
+        lg.addHandler(stream_handler)
+        if not args.schema or not os.path.isfile(os.path.join(script_dir, "Schemas", args.schema + ".json")):
+            lg.critical("[pyJSON.main/FATAL]: --validate needs a schema present in the tool storage, provided with -s.")
+            sys.exit(2)
+        if os.path.isfile(os.path.join(script_dir, "pyJSON_conf.json")):  # scanner options for directory targets
+            apply_config_defaults(json.load(open(os.path.join(script_dir, "pyJSON_conf.json"), encoding = "utf8"),
+                                            cls = json.JSONDecoder))
+        if re.match(r"^\d+$", args.validate):
+            if int(args.validate) not in open_store(script_dir).main_index().values():
+                lg.critical("[pyJSON.main/FATAL]: There is no index number " + args.validate + ".")
+                sys.exit(2)
+            batch_files = open_store(script_dir).files(int(args.validate))
+        else:
+            batch_dir = os.path.join(invoked_from, args.validate)
+            if not os.path.isdir(batch_dir):
+                lg.critical("[pyJSON.main/FATAL]: Provided target for --validate is neither a directory nor an index.")
+                sys.exit(2)
+            batch_files = jsonsearch_lib.collect_json_files(batch_dir)
+        batch_cache = None if args.no_cache else ValidationResultCache(script_dir)
+        sys.exit(jsonsearch_lib.batch_validate(batch_files,
+                                               os.path.join(script_dir, "Schemas", args.schema + ".json"),
+                                               workers = args.workers,
+                                               result_cache = batch_cache))
+
+    # initialize the QtWidget
+    app = QtWidgets.QApplication(sys.argv)
+
     # initialize logging
     now = datetime.now()
     lg = logging.getLogger()
@@ -1042,6 +1496,9 @@ if __name__ == "__main__":
     else:
         config = json.load(open(os.path.join(script_dir, "pyJSON_conf.json"), encoding = "utf8"), cls = json.JSONDecoder)
 
+    # options of the directory scanner used for indexing
+    apply_config_defaults(config)
+
     # If logging is set to be in file, checkups have to be done
     if config["verbose_logging"]:
         if not os.path.isdir(os.path.join(script_dir, "Logs")):
@@ -1119,27 +1576,15 @@ if __name__ == "__main__":
             )
             sys.exit(1)
 
-# Load or create and save the main index file
-    index_dict = {
-        "cur_index": 0
-    }
-    if not (os.path.isfile(os.path.join(script_dir, "Indexes/pyJSON_S_index.json"))):
-        lg.warning("[pyJSON.main/WARN]: Index file is missing. Create index from scratch.")
-        try:
-            os.mkdir(os.path.join(script_dir, "Indexes"))
-        except FileExistsError as err:
-            pass
-        save_main_index(script_dir, index_dict)
-    else:
-        try:
-            index_dict = json.load(open(
-                os.path.join(script_dir, "Indexes/pyJSON_S_index.json"),
-                encoding = "utf8"),
-                cls = json.JSONDecoder
-            )
-        except OSError as err:
-            lg.error(err)
-            lg.error("[pyJSON.main/ERROR]: Cannot read or access Index file. Defaulting to blank Index.")
+# Load the main index from the index store, indexes of the JSON layout get migrated on first start
+    try:
+        index_dict = open_store(script_dir).main_index()
+    except (sqlite3.Error, OSError) as err:
+        lg.error(err)
+        lg.error("[pyJSON.main/ERROR]: Cannot read or access the index store. Defaulting to blank Index.")
+        index_dict = {
+            "cur_index": 0
+        }
 
     # overwrites config with command line parameters
     if args.path:
@@ -1147,12 +1592,8 @@ if __name__ == "__main__":
             config["last_dir"] = args.path
             if config["last_dir"] not in index_dict and os.path.isdir(config["last_dir"]):
                 lg.info("[pyJSON.main/INFO]: Last directory currently not indexed - indexing now.")
-                jsonsearch_lib.start_index(script_dir, config["last_dir"], index_dict, show_boxes = False)
-                index_dict = json.load(open(
-                    os.path.join(script_dir, "Indexes/pyJSON_S_index.json"),
-                    encoding = "utf8"),
-                    cls = json.JSONDecoder
-                )
+                jsonsearch_lib.start_index(script_dir, config["last_dir"], index_dict, show_boxes = False,
+                                           progress = progress_lib.print_progress())
         else:
             lg.error("[pyJSON.main/ERROR]: Provided path is erroneous. Omitted parameter -d.")
 
@@ -1192,7 +1633,8 @@ if __name__ == "__main__":
     MainWindow = QtWidgets.QMainWindow()
     ui = UiRunnerInstance(config = config, index_dict = index_dict, script_dir = script_dir)
 
-    jsonsearch_lib.watchdog(script_dir, index_dict)
+    # check the indexes in the background, the window is usable on the current state meanwhile
+    ui.call_watchdog()
 
     # enter main loop
     sys.exit(app.exec())
\ No newline at end of file